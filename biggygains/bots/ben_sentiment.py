@@ -2,6 +2,7 @@ import logging
 
 from .interface import Bot
 from biggygains.environment.interface import Environment
+from biggygains.environment.events import OrderFilled, SentimentChanged
 
 logger = logging.getLogger('BenSentimentBot')
 
@@ -9,10 +10,17 @@ logger = logging.getLogger('BenSentimentBot')
 class BenSentimentBot(Bot):
     def initialize(self, env: Environment):
         logger.info('Initializing the bot')
+        env.subscribe([OrderFilled, SentimentChanged], self.on_event)
         return True
 
+    def on_event(self, event):
+        if isinstance(event, OrderFilled):
+            logger.info(f'Filled {event.fill.quantity} {event.fill.ticker} at {event.fill.avg_price}')
+        elif isinstance(event, SentimentChanged):
+            logger.debug(f'Sentiment changed for {len(event.tickers)} tickers')
+
     def update(self, env: Environment):
-        logger.info('Updating the bot')
+        logger.debug('Updating the bot')
 
     def shutdown(self, env: Environment):
         logger.info('Bot is shutting down')
@@ -0,0 +1,78 @@
+import json
+import logging
+import typing
+
+import msgpack
+
+logger = logging.getLogger('codec')
+
+"""
+Versioned binary codec for persisted state. Values are msgpack encoded behind a
+short header holding the kind of value and its schema version. Components own the
+schema for their kinds, and should flatten objects into rows of fields rather than
+dicts keyed by field name, which is most of the size and time saved over JSON.
+
+Version 1 of every kind is the JSON format used before this codec existed. Values in
+that format are recognized and migrated on decode, so existing datastores keep
+loading. Migrations are registered per kind and version with register_migration()
+and run in order up to the version the caller expects.
+
+msgpack is only faster than JSON with its C extension. Without it values are written
+as the same header and payload encoded as JSON, which every version of this codec
+reads, so installing the extension later needs no migration
+"""
+
+_MAGIC = b'BG'
+_JSON_MAGIC = b'BJ'
+_migrations = {}
+
+# The pure Python msgpack fallback is several times slower than the json module
+BINARY = msgpack.Packer.__module__ != 'msgpack.fallback'
+if not BINARY:
+    logger.warning('msgpack C extension unavailable, persisting state as JSON')
+
+
+class CodecError(ValueError):
+    pass
+
+
+def register_migration(kind: str, version: int, migrate: typing.Callable[[typing.Any], typing.Any]):
+    """
+    Registers a function that converts a payload of the given kind from version to
+    version + 1
+    """
+
+    _migrations[(kind, version)] = migrate
+
+
+def pack(kind: str, version: int, payload) -> bytes:
+    if not BINARY:
+        return _JSON_MAGIC + json.dumps([kind, version, payload], separators=(',', ':')).encode()
+    return _MAGIC + msgpack.packb([kind, version, payload], use_bin_type=True)
+
+
+def unpack(kind: str, version: int, data: typing.Union[str, bytes]):
+    """
+    Returns the payload of a value written by pack(), or in the legacy JSON format,
+    migrated to the given version
+    """
+
+    if isinstance(data, str):
+        stored_kind, stored_version, payload = kind, 1, json.loads(data)
+    elif data.startswith(_MAGIC):
+        stored_kind, stored_version, payload = msgpack.unpackb(data[len(_MAGIC):], raw=False)
+    elif data.startswith(_JSON_MAGIC):
+        stored_kind, stored_version, payload = json.loads(data[len(_JSON_MAGIC):])
+    else:
+        stored_kind, stored_version, payload = kind, 1, json.loads(data)
+    if stored_kind != kind:
+        raise CodecError(f'Expected a {kind} value, found {stored_kind}')
+    if stored_version > version:
+        raise CodecError(f'{kind} was written with newer schema version {stored_version}')
+    while stored_version < version:
+        migrate = _migrations.get((kind, stored_version))
+        if migrate is None:
+            raise CodecError(f'No migration for {kind} from version {stored_version}')
+        payload = migrate(payload)
+        stored_version += 1
+    return payload
@@ -0,0 +1,69 @@
+import collections
+import hashlib
+import re
+import threading
+
+from biggygains.metrics.registry import NullRegistry
+
+repeated_symbol = re.compile(r'([^\w\s])(?=\1)')
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizes text so trivially different copies of a comment share a cache entry.
+    Whitespace is collapsed and runs of the same symbol or emoji are shortened to
+    one. Case is preserved since ticker extraction depends on it
+    """
+
+    return repeated_symbol.sub('', ' '.join(text.split()))
+
+
+"""
+Bounded LRU cache of analysis results keyed on a hash of the normalized comment
+text. Results are stored as (ticker, sentiment) pairs. Safe to share between
+analysis workers
+"""
+class AnalysisCache:
+    MISSING = object()
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bind_metrics(NullRegistry(), None)
+
+    def bind_metrics(self, metrics, source):
+        self._hits = metrics.counter('sentiment_cache_hits_total', 'Comments whose analysis was served from cache', source=source)
+        self._misses = metrics.counter('sentiment_cache_misses_total', 'Comments that had to be analyzed', source=source)
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(normalize(text).encode(), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        """
+        Returns the cached result or AnalysisCache.MISSING
+        """
+
+        with self.lock:
+            result = self.entries.get(key, AnalysisCache.MISSING)
+            if result is AnalysisCache.MISSING:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        (self._misses if result is AnalysisCache.MISSING else self._hits).inc()
+        return result
+
+    def put(self, key: bytes, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import time
+import typing
+
+from .interface import SentimentAnalyzer
+from .stream import StreamingSentimentSource, Post
+
+logger = logging.getLogger('FileSentimentSource')
+
+
+def read_posts(path: str) -> typing.Iterator[Post]:
+    """
+    Reads posts from a file or a directory of files. Supports the JSON object format
+    written by early versions of the comment collector ({id: {body, ...}}) and JSON
+    lines files with one {id, body, created_utc} object per line. Records without a
+    timestamp are treated as created now
+    """
+
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.jsonl') or (name.endswith('.json') and name != 'index.json'):
+                yield from read_posts(os.path.join(path, name))
+        return
+
+    with open(path, 'r') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if not line.endswith('\n'):
+                    break # Partially written line
+                if line.strip():
+                    yield _to_post(json.loads(line))
+        else:
+            for cid, record in json.loads(f.read()).items():
+                yield _to_post(record, cid)
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _to_post(record: dict, cid=None) -> Post:
+    return Post(
+        record.get('id', cid),
+        record['body'],
+        record.get('created_utc') or time.time()
+    )
+
+
+"""
+Sentiment source that reads posts from local files. The path may be a single file
+or a directory that files are dropped into. When follow is set, new files in the
+directory (or new lines appended to a .jsonl file) are streamed as they appear.
+Useful for offline testing and for feeds that are delivered as file drops
+"""
+class FileSentimentSource(StreamingSentimentSource):
+    _DATA_PERSIST_KEY = 'FileSentimentSource_persistence_v1'
+
+    def __init__(self, analyzer: SentimentAnalyzer, path: str, follow: bool = False, poll_seconds: float = 1, **kwargs):
+        super().__init__(analyzer, **kwargs)
+        self.path = path
+        self.follow = follow
+        self.poll_seconds = poll_seconds
+        self.seen_files = set()
+        self.failed_files = set()
+        self.offset = 0
+
+    def _connect(self):
+        if not os.path.exists(self.path):
+            logger.error(f'Path does not exist: {self.path}')
+            return False
+        return True
+
+    def _backfill(self):
+        if os.path.isdir(self.path):
+            yield from self._read_new_files()
+        else:
+            yield from self._read_appended()
+
+    def _stream(self):
+        while self.follow and self.running:
+            if os.path.isdir(self.path):
+                yield from self._read_new_files()
+            elif self.path.endswith('.jsonl'):
+                yield from self._read_appended()
+            yield None
+            time.sleep(self.poll_seconds)
+
+    def _read_new_files(self):
+        """
+        Yields the posts in files not read yet. A file is only marked as read once
+        it parses in full, so one still being written is tried again next poll
+        """
+
+        files = sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.endswith('.jsonl') or (name.endswith('.json') and name != 'index.json')
+        )
+        for path in files:
+            if path in self.seen_files:
+                continue
+            try:
+                posts = list(read_posts(path))
+                if path.endswith('.jsonl') and not _ends_with_newline(path):
+                    raise ValueError('last line is incomplete')
+            except (OSError, ValueError, KeyError) as e:
+                if path not in self.failed_files:
+                    logger.warning(f'Could not read {path} yet, will retry: {e}')
+                    self.failed_files.add(path)
+                continue
+            self.seen_files.add(path)
+            self.failed_files.discard(path)
+            yield from posts
+
+    def _read_appended(self):
+        if not self.path.endswith('.jsonl'):
+            if self.offset == 0:
+                self.offset = 1
+                yield from read_posts(self.path)
+            return
+
+        with open(self.path, 'r') as f:
+            f.seek(self.offset)
+            while True:
+                line = f.readline()
+                if not line.endswith('\n'):
+                    break # Partially written line, pick it up next time
+                self.offset = f.tell()
+                if line.strip():
+                    try:
+                        yield _to_post(json.loads(line))
+                    except (ValueError, KeyError):
+                        logger.warning(f'Skipping malformed line in {self.path}: {line.strip()}')
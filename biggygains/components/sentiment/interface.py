@@ -1,6 +1,7 @@
 from __future__ import annotations # Non runtime type checking
 
 import typing
+import types
 import logging
 
 if typing.TYPE_CHECKING:
@@ -17,6 +18,8 @@ to indicate confidence, so long as all confidence values are computed
 in the same way
 """
 class Sentiment:
+    __slots__ = ('ticker', 'value', 'confidence')
+
     def __init__(self, ticker, value, confidence):
         self.ticker = ticker
         self.value = value
@@ -38,13 +41,53 @@ class Sentiment:
 
 
 """
-Base class for sentiment sources (reddit, etc). Current sentiment is stored in
-self.sentiment. Derived classes may store sentiment however necessary but must
-ensure that self.sentiment remains up to date
+Immutable view of a source's sentiment at one point in time, mapping ticker to a
+tuple of Sentiment with today first. Snapshots are never modified once built, so
+they can be shared with any number of readers without locking. version increases
+by one with each snapshot a source publishes
+"""
+class SentimentSnapshot:
+    __slots__ = ('data', 'version')
+
+    def __init__(self, data: typing.Mapping[str, typing.Iterable[Sentiment]] = None, version: int = 0):
+        self.data = types.MappingProxyType({
+            ticker: tuple(values)
+            for ticker, values in (data or {}).items()
+        })
+        self.version = version
+
+    def get(self, ticker) -> typing.Optional[typing.Tuple[Sentiment, ...]]:
+        return self.data.get(ticker)
+
+
+"""
+Base class for sentiment sources (reddit, etc). Current sentiment is published as a
+SentimentSnapshot in self.snapshot. Derived classes may store sentiment however
+necessary but must publish a new snapshot whenever it changes, either through
+_publish() or by assigning a dict to self.sentiment. Publishing only swaps the
+reference, so readers never take a lock and never see a half built update
 """
 class SentimentSource:
     def __init__(self):
-        self.sentiment = {}
+        self.snapshot = SentimentSnapshot()
+
+    @property
+    def sentiment(self) -> typing.Mapping[str, typing.Tuple[Sentiment, ...]]:
+        return self.snapshot.data
+
+    @sentiment.setter
+    def sentiment(self, sentiment: typing.Dict[str, typing.List[Sentiment]]):
+        self._publish(sentiment)
+
+    def _publish(self, sentiment: typing.Dict[str, typing.List[Sentiment]]) -> SentimentSnapshot:
+        """
+        Builds a snapshot from a map of ticker to sentiment, today first, and makes
+        it current. Sources should publish from a single thread
+        """
+
+        snapshot = SentimentSnapshot(sentiment, self.snapshot.version + 1)
+        self.snapshot = snapshot
+        return snapshot
 
     def initialize(self, environment: Environment) -> bool:
         """
@@ -62,6 +105,15 @@ class SentimentSource:
         """
         logger.warning(f'shutdown() is unimplemented in {type(self).__name__}')
 
+    def checkpoint(self, environment: Environment):
+        """
+        Persists the same data as shutdown() without stopping the source, so a crash
+        only loses what arrived since the last checkpoint. Sources with nothing to
+        persist can leave this as is
+        """
+
+        pass
+
     def update(self, environment: Environment):
         """
         Update sentiment based on new data. This is called by the environment and
@@ -71,23 +123,22 @@ class SentimentSource:
         logger.warning(f'update() is unimplemented in {type(self).__name__}')
         pass
 
-    def get_sentiment(self, ticker) -> typing.List[Sentiment]:
+    def get_sentiment(self, ticker) -> typing.Optional[typing.Tuple[Sentiment, ...]]:
         """
-        Returns sentiment for a given ticker, or None if no data. Entries in list represent
+        Returns sentiment for a given ticker, or None if no data. Entries represent
         past dates of data. Item 0 is today and each subsequent item is further in the past.
         Indices do not necessarily correspond to days
         """
 
-        if ticker in self.sentiment:
-            return self.sentiment[ticker]
-        return None
+        return self.snapshot.get(ticker)
 
-    def get_all_sentiment(self) -> typing.Dict[str, typing.List[Sentiment]]:
+    def get_all_sentiment(self) -> typing.Mapping[str, typing.Tuple[Sentiment, ...]]:
         """
-        Returns a map of all sentiment data over time
+        Returns a read only map of all sentiment data over time. The map is a
+        snapshot and does not change as new data arrives
         """
 
-        return self.sentiment
+        return self.snapshot.data
 
 
 """
@@ -101,3 +152,28 @@ class SentimentAnalyzer:
 
         logger.warning(f'analyze is unimplemented in {type(self).__name__}')
         return 0
+
+    def analyze_batch(self, messages: typing.List[str]) -> typing.List[int]:
+        """
+        Analyzes many messages at once. Override when the engine can do this faster
+        than one message at a time
+        """
+
+        return [self.analyze(message) for message in messages]
+
+    def uncertainty(self, messages: typing.List[str]) -> typing.List[float]:
+        """
+        Returns how unsure the engine is about each message, from 0 (certain) to 1.
+        Engines that cannot tell are always uncertain
+        """
+
+        return [1.0 for _ in messages]
+
+    def learn(self, message: str, label: int):
+        """
+        Incrementally updates the engine with a labeled message. Label is in the
+        range [-2, 2] as produced by the labeling tool. Engines that cannot learn
+        ignore this
+        """
+
+        pass
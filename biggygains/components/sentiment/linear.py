@@ -0,0 +1,154 @@
+import logging
+import random
+import re
+import typing
+import zlib
+
+import numpy as np
+
+from .interface import SentimentAnalyzer
+
+logger = logging.getLogger('LinearSentimentAnalyzer')
+MODEL_FORMAT_VERSION = 1
+token = re.compile(r'\w+|[^\w\s]')
+
+
+def hashed_features(message: str, bits: int) -> np.ndarray:
+    """
+    Returns the hashed unigram and bigram feature indices for a message. crc32 is
+    used rather than hash() so indices are stable across processes
+    """
+
+    mask = (1 << bits) - 1
+    tokens = token.findall(message.lower())
+    grams = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter((zlib.crc32(g.encode()) & mask for g in grams), dtype=np.int64, count=len(grams))
+
+
+"""
+Multinomial logistic regression over hashed unigram and bigram features. Scoring
+is a handful of row lookups per message, and the model can be updated one labeled
+message at a time, which makes it suitable for both live scoring and active learning
+"""
+class LinearSentimentAnalyzer(SentimentAnalyzer):
+    CLASSES = (-1, 0, 1)
+
+    def __init__(self, bits: int = 18, learning_rate: float = 0.1, l2: float = 1e-6):
+        self.bits = bits
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights = np.zeros((1 << bits, len(LinearSentimentAnalyzer.CLASSES)), dtype=np.float32)
+        self.bias = np.zeros(len(LinearSentimentAnalyzer.CLASSES), dtype=np.float32)
+
+    @staticmethod
+    def load(path: str) -> 'LinearSentimentAnalyzer':
+        """
+        Loads a model written by save()
+        """
+
+        with np.load(path) as data:
+            version = int(data['version'])
+            if version != MODEL_FORMAT_VERSION:
+                raise ValueError(f'Unsupported model format version {version} in {path}')
+            model = LinearSentimentAnalyzer(int(data['bits']))
+            model.weights[data['rows']] = data['values']
+            model.bias[:] = data['bias']
+        return model
+
+    def save(self, path: str):
+        """
+        Writes the model to an .npz file. Only rows with non zero weights are stored,
+        which keeps models trained on small corpora to a few hundred kilobytes
+        """
+
+        rows = np.flatnonzero(self.weights.any(axis=1)).astype(np.int32)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                version=MODEL_FORMAT_VERSION,
+                bits=self.bits,
+                rows=rows,
+                values=self.weights[rows],
+                bias=self.bias
+            )
+
+    def features(self, message: str) -> np.ndarray:
+        return hashed_features(message, self.bits)
+
+    def predict_proba(self, messages: typing.List[str]) -> np.ndarray:
+        """
+        Returns an (n, 3) array of class probabilities for negative, neutral, and
+        positive sentiment
+        """
+
+        if not messages:
+            return np.zeros((0, len(LinearSentimentAnalyzer.CLASSES)), dtype=np.float32)
+        feats = [self.features(m) for m in messages]
+        lengths = np.array([len(f) for f in feats])
+        indices = np.concatenate(feats) if lengths.sum() else np.zeros(0, dtype=np.int64)
+
+        scores = np.tile(self.bias, (len(messages), 1))
+        if len(indices):
+            rows = self.weights[indices]
+            nonempty = lengths > 0
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+            scores[nonempty] += np.add.reduceat(rows, starts, axis=0)
+        return _softmax(scores)
+
+    def analyze(self, message: str) -> int:
+        return self.analyze_batch([message])[0]
+
+    def analyze_batch(self, messages):
+        proba = self.predict_proba(messages)
+        return [LinearSentimentAnalyzer.CLASSES[i] for i in proba.argmax(axis=1)]
+
+    def uncertainty(self, messages):
+        """
+        Normalized entropy of the predicted class distribution
+        """
+
+        proba = self.predict_proba(messages)
+        entropy = -(proba * np.log(np.clip(proba, 1e-12, 1))).sum(axis=1)
+        return list(entropy / np.log(len(LinearSentimentAnalyzer.CLASSES)))
+
+    def learn(self, message, label):
+        self._step(self.features(message), LinearSentimentAnalyzer.class_index(label), self.learning_rate)
+
+    def fit(self, messages: typing.List[str], labels: typing.List[int], epochs: int = 5, seed: int = 0):
+        """
+        Trains with stochastic gradient descent over shuffled passes of the data. May
+        be called on an already trained model to continue training
+        """
+
+        feats = [self.features(m) for m in messages]
+        targets = [LinearSentimentAnalyzer.class_index(label) for label in labels]
+        order = list(range(len(messages)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = self.learning_rate / (1 + epoch)
+            for i in order:
+                self._step(feats[i], targets[i], rate)
+
+    def _step(self, indices: np.ndarray, target: int, rate: float):
+        scores = self.bias + self.weights[indices].sum(axis=0)
+        grad = _softmax(scores[np.newaxis, :])[0]
+        grad[target] -= 1
+
+        if self.l2:
+            self.weights[indices] *= (1 - rate * self.l2)
+        np.add.at(self.weights, indices, -rate * grad)
+        self.bias -= rate * grad
+
+    @staticmethod
+    def class_index(label: int) -> int:
+        """
+        Maps a label in [-2, 2] to the index of its class
+        """
+
+        return LinearSentimentAnalyzer.CLASSES.index((label > 0) - (label < 0))
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -0,0 +1,411 @@
+from __future__ import annotations # Non runtime type checking
+
+import logging
+import multiprocessing
+import threading
+import time
+import typing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from biggygains.environment.events import EventBus, SentimentChanged
+from biggygains.metrics.registry import NullRegistry
+from .interface import Sentiment, SentimentSource
+
+if typing.TYPE_CHECKING:
+    from biggygains.environment.interface import Environment
+
+logger = logging.getLogger('ProcessSentimentSource')
+
+HEADER_DTYPE = np.dtype([
+    ('sequence', '<u8'), # Odd while a write is in progress
+    ('version', '<u8'), # Incremented by every write
+    ('count', '<u8'), # Rows in use
+    ('heartbeat', '<f8'), # Epoch time the worker last reported in
+    ('state', '<i8'),
+    ('stop', '<i8'), # Set by the reader to ask the worker to exit
+    ('pid', '<i8')
+])
+ROW_DTYPE = np.dtype([
+    ('ticker', 'S16'),
+    ('day', '<u2'), # 0 is today, then further in the past
+    ('value', '<f8'),
+    ('confidence', '<f8')
+])
+
+STARTING = 0
+RUNNING = 1
+FAILED = 2
+
+# Times a reader retries while a write is in progress before giving up for now
+READ_ATTEMPTS = 1000
+
+
+"""
+Per ticker sentiment laid out in a block of shared memory so one process can publish
+it and another read it without pickling or pipes. The block is a header followed
+by up to capacity (ticker, day, value, confidence) rows, both exposed as numpy views
+onto the shared buffer.
+
+Writes are guarded by a sequence number in the header that is odd while a write is
+in progress. Readers check it before and after copying the rows and retry if it
+moved, so a reader never sees half of one write and half of another and the writer
+never waits on a reader. There must only be one writer. Readers only retry a bounded
+number of times, so a writer killed part way through a write can't leave them stuck.
+Whoever starts the next writer must call reset() first
+"""
+class SentimentTable:
+    def __init__(self, memory: shared_memory.SharedMemory, capacity: int, owner: bool):
+        self.memory = memory
+        self.capacity = capacity
+        self.owner = owner
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=memory.buf)
+        self.rows = np.ndarray((capacity,), dtype=ROW_DTYPE, buffer=memory.buf, offset=HEADER_DTYPE.itemsize)
+
+    @staticmethod
+    def create(capacity: int) -> SentimentTable:
+        memory = shared_memory.SharedMemory(create=True, size=HEADER_DTYPE.itemsize + capacity * ROW_DTYPE.itemsize)
+        table = SentimentTable(memory, capacity, True)
+        table.header[()] = (0, 0, 0, 0.0, STARTING, 0, 0)
+        return table
+
+    @staticmethod
+    def attach(name: str, capacity: int) -> SentimentTable:
+        return SentimentTable(shared_memory.SharedMemory(name=name), capacity, False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def version(self) -> int:
+        return int(self.header['version'])
+
+    @property
+    def state(self) -> int:
+        return int(self.header['state'])
+
+    @state.setter
+    def state(self, state: int):
+        self.header['state'] = state
+
+    @property
+    def heartbeat(self) -> float:
+        return float(self.header['heartbeat'])
+
+    def beat(self):
+        self.header['heartbeat'] = time.time()
+
+    def write(self, sentiment: typing.Mapping[str, typing.Sequence[Sentiment]]):
+        """
+        Replaces the table's contents. When there are more rows than fit, the
+        tickers with the most confidence today are kept
+        """
+
+        tickers = list(sentiment)
+        if sum(len(days) for days in sentiment.values()) > self.capacity:
+            logger.warning(f'Sentiment for {len(tickers)} tickers does not fit in {self.capacity} rows, dropping the least confident')
+            tickers.sort(key=lambda ticker: sentiment[ticker][0].confidence, reverse=True)
+
+        rows = []
+        for ticker in tickers:
+            days = sentiment[ticker]
+            if len(rows) + len(days) > self.capacity:
+                break
+            rows.extend((ticker.encode(), day, s.value, s.confidence) for day, s in enumerate(days))
+
+        rows = np.array(rows, dtype=ROW_DTYPE)
+        self.header['sequence'] += 1
+        try:
+            self.rows[:len(rows)] = rows
+            self.header['count'] = len(rows)
+            self.header['version'] += 1
+        finally:
+            self.header['sequence'] += 1
+
+    def reset(self):
+        """
+        Evens out the sequence number after a writer died mid write
+        """
+
+        self.header['sequence'] += self.header['sequence'] % 2
+
+    def read(self, since: int = None) -> typing.Optional[typing.Tuple[int, np.ndarray]]:
+        """
+        Returns (version, rows) with a copy of the rows in use, or None if the
+        version is still since or no consistent copy could be made. Only the header
+        is read when nothing has changed
+        """
+
+        for _ in range(READ_ATTEMPTS):
+            sequence = int(self.header['sequence'])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            version = int(self.header['version'])
+            if version == since:
+                return None
+            rows = self.rows[:int(self.header['count'])].copy()
+            if int(self.header['sequence']) == sequence:
+                return version, rows
+        return None
+
+    def close(self):
+        # Views must be released before the buffer can be
+        self.header = self.rows = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+"""
+Datastore handed to the hosted source. Every call is forwarded to the parent
+process's datastore
+"""
+class _RemoteDatastore:
+    def __init__(self, env: _WorkerEnvironment):
+        self.env = env
+
+    def __getattr__(self, method):
+        return lambda *args: self.env._call('datastore', method, *args)
+
+
+"""
+Stand in for the Environment inside a worker process. Ticker lookups and datastore
+calls are answered by the parent over a pipe, and ticker lookups are cached since
+extraction makes many of them. Events stay inside the worker and metrics are not
+collected
+"""
+class _WorkerEnvironment:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.tickers = {}
+        self.datastore = _RemoteDatastore(self)
+        self.metrics = NullRegistry()
+        self.events = EventBus()
+
+    def _call(self, target, method, *args):
+        with self.lock:
+            self.conn.send((target, method, args))
+            ok, result = self.conn.recv()
+        if not ok:
+            raise RuntimeError(f'{target}.{method} failed in parent: {result}')
+        return result
+
+    def ticker_exists(self, ticker) -> bool:
+        exists = self.tickers.get(ticker)
+        if exists is None:
+            exists = self.tickers[ticker] = self._call('env', 'ticker_exists', ticker)
+        return exists
+
+
+def _run_worker(factory, table_name: str, capacity: int, conn, update_seconds: float, checkpoint_seconds: float, log_level: int):
+    """
+    Entry point of a worker process. Runs the source until the table's stop flag is
+    set, writing its sentiment to the table whenever it changes and checkpointing it
+    at most every checkpoint_seconds
+    """
+
+    logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s: %(message)s', level=log_level)
+    table = SentimentTable.attach(table_name, capacity)
+    table.header['pid'] = multiprocessing.current_process().pid
+    env = _WorkerEnvironment(conn)
+    try:
+        source = factory()
+        if not source.initialize(env):
+            table.state = FAILED
+            return
+
+        written = None
+        checkpointed = source.snapshot.version
+        last_checkpoint = time.monotonic()
+        while True:
+            source.update(env)
+            if source.snapshot.version != written:
+                table.write(source.snapshot.data)
+                written = source.snapshot.version
+            if written != checkpointed and time.monotonic() - last_checkpoint >= checkpoint_seconds:
+                try:
+                    source.checkpoint(env)
+                except Exception:
+                    logger.exception('Sentiment worker failed to checkpoint')
+                checkpointed = written
+                last_checkpoint = time.monotonic()
+            table.beat()
+            if table.state != RUNNING:
+                table.state = RUNNING
+            if table.header['stop']:
+                break
+            time.sleep(update_seconds)
+        source.shutdown(env)
+    except Exception:
+        logger.exception('Sentiment worker failed')
+        table.state = FAILED
+    finally:
+        conn.close()
+        table.close()
+
+
+"""
+Hosts another sentiment source in its own process so comment ingestion and scoring
+never compete with the bots for the GIL. factory builds the source inside the
+worker and must be picklable, e.g. functools.partial(RedditSentimentSource, ...).
+
+The worker writes aggregated sentiment to a SentimentTable in shared memory and
+update() only reads its header unless the version moved, so a tick costs the same
+however many comments are arriving. Lookups the source makes against the
+Environment (ticker_exists and the datastore) are answered by a thread in this
+process.
+
+The worker reports a heartbeat every update_seconds. If it exits or stops reporting
+for heartbeat_timeout seconds it is killed and started again after restart_delay,
+and the last sentiment it published is served in the meantime. The worker
+checkpoints the source whenever its sentiment changes, at most every
+checkpoint_seconds, so the replacement resumes from there rather than from the last
+clean shutdown
+"""
+class ProcessSentimentSource(SentimentSource):
+    def __init__(self, factory: typing.Callable[[], SentimentSource], update_seconds: float = 1, heartbeat_timeout: float = 30, checkpoint_seconds: float = 60, startup_timeout: float = 600, restart_delay: float = 5, capacity: int = 16384, start_method: str = 'spawn'):
+        super().__init__()
+        self.factory = factory
+        self.name = getattr(factory, 'func', factory).__name__
+        self.update_seconds = update_seconds
+        self.heartbeat_timeout = heartbeat_timeout
+        self.checkpoint_seconds = checkpoint_seconds
+        self.startup_timeout = startup_timeout
+        self.restart_delay = restart_delay
+        self.capacity = capacity
+        self.context = multiprocessing.get_context(start_method)
+        self.table = None
+        self.version = None
+        self.rows = {}
+        self.process = None
+        self.server = None
+        self.started = 0.0
+        self.restart_at = None
+        self.restarts = None
+
+    def initialize(self, env: Environment) -> bool:
+        self.restarts = env.metrics.counter('sentiment_process_restarts_total', 'Times a sentiment worker process was restarted', source=self.name)
+        self.table = SentimentTable.create(self.capacity)
+        self._start(env)
+        while self.table.state == STARTING and self.process.is_alive():
+            if time.time() - self.started > self.startup_timeout:
+                logger.error(f'{self.name} worker did not start within {self.startup_timeout}s')
+                break
+            time.sleep(0.05)
+
+        if self.table.state != RUNNING:
+            logger.error(f'{self.name} worker failed to start')
+            self._stop_worker(timeout=0)
+            self.table.close()
+            self.table = None
+            return False
+        self._read(env)
+        return True
+
+    def update(self, env: Environment):
+        self._check_health(env)
+        self._read(env)
+
+    def shutdown(self, env: Environment):
+        if self.table is None:
+            return
+        self._stop_worker(timeout=30)
+        self.table.close()
+        self.table = None
+
+    def _start(self, env: Environment):
+        parent, child = self.context.Pipe()
+        self.table.reset()
+        self.table.header['stop'] = 0
+        self.table.state = STARTING
+        self.started = time.time()
+        self.process = self.context.Process(
+            target=_run_worker,
+            args=(self.factory, self.table.name, self.capacity, child, self.update_seconds, self.checkpoint_seconds, logging.getLogger().getEffectiveLevel()),
+            name=f'{self.name}-worker',
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.server = threading.Thread(target=self._serve, args=(env, parent), daemon=True)
+        self.server.start()
+        logger.info(f'Started {self.name} in process {self.process.pid}')
+
+    def _stop_worker(self, timeout: float):
+        self.table.header['stop'] = 1
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f'{self.name} worker did not exit, killing it')
+            self.process.kill()
+            self.process.join()
+        self.server.join()
+
+    def _serve(self, env: Environment, conn):
+        """
+        Answers the worker's calls until its end of the pipe closes
+        """
+
+        targets = {'env': env, 'datastore': env.datastore}
+        with conn:
+            while True:
+                try:
+                    target, method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = (True, getattr(targets[target], method)(*args))
+                except Exception as e:
+                    logger.exception(f'{self.name} worker call {target}.{method} failed')
+                    result = (False, repr(e))
+                try:
+                    conn.send(result)
+                except (BrokenPipeError, OSError):
+                    return
+
+    def _check_health(self, env: Environment):
+        now = time.time()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.restart_at = None
+                self.restarts.inc()
+                self._start(env)
+            return
+
+        if not self.process.is_alive():
+            logger.error(f'{self.name} worker exited with code {self.process.exitcode}, restarting in {self.restart_delay}s')
+        elif self.table.state == FAILED:
+            logger.error(f'{self.name} worker failed, restarting in {self.restart_delay}s')
+        elif self.table.state == STARTING:
+            if now - self.started < self.startup_timeout:
+                return
+            logger.error(f'{self.name} worker did not start within {self.startup_timeout}s, restarting in {self.restart_delay}s')
+        elif now - self.table.heartbeat < self.heartbeat_timeout:
+            return
+        else:
+            logger.error(f'{self.name} worker unresponsive for {now - self.table.heartbeat:.0f}s, restarting in {self.restart_delay}s')
+
+        self._stop_worker(timeout=0)
+        self.restart_at = now + self.restart_delay
+
+    def _read(self, env: Environment):
+        read = self.table.read(self.version)
+        if read is None:
+            return
+        self.version, table = read
+
+        rows = {}
+        for ticker, _, value, confidence in table.tolist():
+            rows.setdefault(ticker.decode(), []).append((value, confidence))
+        changed = {ticker for ticker in rows.keys() | self.rows.keys() if rows.get(ticker) != self.rows.get(ticker)}
+        self.rows = rows
+
+        self._publish({
+            ticker: [Sentiment(ticker, value, confidence) for value, confidence in days]
+            for ticker, days in rows.items()
+        })
+        if changed:
+            env.events.publish(SentimentChanged(changed))
@@ -0,0 +1,126 @@
+import logging
+import time
+import typing
+
+from .stream import Post
+
+logger = logging.getLogger('RedditReplay')
+
+
+"""
+Stand in for praw.models.Comment. Only the attributes used by the sentiment
+pipeline are provided
+"""
+class ReplayComment:
+    def __init__(self, id, body, created_utc):
+        self.id = id
+        self.body = body
+        self.created_utc = created_utc
+
+
+"""
+Stand in for the comment forest of a praw Submission
+"""
+class _ReplayCommentForest:
+    def __init__(self, comments):
+        self.comments = comments
+
+    def list(self):
+        return list(self.comments)
+
+
+"""
+Stand in for praw.models.Submission
+"""
+class ReplaySubmission:
+    def __init__(self, comments: typing.List[ReplayComment]):
+        self.comments = _ReplayCommentForest(comments)
+
+
+"""
+Stand in for praw.models.util.SubredditStream. Emits recorded comments paced by
+the parent ReplaySubreddit
+"""
+class ReplayStream:
+    def __init__(self, subreddit):
+        self.subreddit = subreddit
+
+    def comments(self, pause_after=None, skip_existing=False):
+        return self.subreddit._replay(pause_after)
+
+
+"""
+Stand in for praw.models.Subreddit that serves recorded posts. The first backfill
+posts are returned by new() as a single submission, the rest are streamed.
+
+Pacing is controlled by either speed or rate:
+    speed: Replay at the recorded timestamps, sped up speed times. 1 is realtime
+    rate: Replay at a fixed number of comments per second
+    Neither: Replay as fast as the consumer will take comments
+
+Comment timestamps are shifted so the replay appears to happen now. When loop is
+set the recording repeats forever with new ids on each pass
+"""
+class ReplaySubreddit:
+    def __init__(self, posts: typing.List[Post], speed: float = None, rate: float = None, backfill: int = 0, loop: bool = False):
+        self.posts = list(posts)
+        self.speed = speed
+        self.rate = rate
+        self.backfill = min(backfill, len(self.posts))
+        self.loop = loop
+        self.stream = ReplayStream(self)
+        self.emitted = 0
+
+    def new(self, limit=None):
+        if self.backfill == 0:
+            return []
+        now = time.time()
+        return [ReplaySubmission([
+            ReplayComment(post.id, post.body, now)
+            for post in self.posts[0:self.backfill]
+        ])]
+
+    def _replay(self, pause_after):
+        posts = self.posts[self.backfill:]
+        if not posts:
+            return
+        first = posts[0].created_utc
+        start = time.time()
+        replay_pass = 0
+
+        while True:
+            suffix = f'_{replay_pass}' if replay_pass else ''
+            pass_start = time.time()
+            for i, post in enumerate(posts):
+                if self.speed:
+                    offset = max(0, post.created_utc - first) / self.speed
+                elif self.rate:
+                    offset = i / self.rate
+                else:
+                    offset = 0
+
+                due = pass_start + offset
+                delay = due - time.time()
+                if delay > 0:
+                    if pause_after is not None:
+                        yield None # Lets the consumer check for shutdown
+                    time.sleep(delay)
+
+                self.emitted += 1
+                yield ReplayComment(f'{post.id}{suffix}', post.body, max(start, due))
+
+            if not self.loop:
+                return
+            replay_pass += 1
+
+
+"""
+Stand in for praw.Reddit. Pass to RedditSentimentSource as api to run the real
+ingestion pipeline against recorded comments without network access
+"""
+class ReplayReddit:
+    def __init__(self, posts: typing.List[Post], **kwargs):
+        self.sub = ReplaySubreddit(posts, **kwargs)
+
+    def subreddit(self, name):
+        return self.sub
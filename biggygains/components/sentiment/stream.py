@@ -0,0 +1,462 @@
+from __future__ import annotations # Non runtime type checking
+
+import datetime
+import logging
+import queue
+import re
+import threading
+import time
+import typing
+
+from biggygains import codec
+from biggygains.metrics.registry import NullRegistry
+from biggygains.environment.events import SentimentChanged
+from .cache import AnalysisCache
+from .interface import Sentiment, SentimentSource, SentimentAnalyzer
+
+if typing.TYPE_CHECKING:
+    from biggygains.environment.interface import Environment
+
+logger = logging.getLogger('StreamingSentimentSource')
+alnum = re.compile(r'[^a-zA-Z\d\s]+')
+
+VALID_TICKER_LENGTHS = [2, 3, 4]
+
+# Persisted state holds past days as flat [ticker, value, confidence, ...] rows and
+# today as [date, [id, body, ticker, sentiment, ...]]
+STATE_KIND = 'sentiment_state'
+STATE_VERSION = 2
+
+
+def _migrate_state_v1(data: dict) -> dict:
+    # v1 was JSON with past days as {ticker: Sentiment.to_dict()} and today as DayComments.to_dict()
+    past = [
+        [field for s in day.values() for field in (s['ticker'], s['value'], s['confidence'])]
+        for day in data.get('past', [])
+    ]
+    today = None
+    if 'today' in data:
+        comments = data['today']['data'].values()
+        today = [
+            data['today']['date'],
+            [field for c in comments for field in (c['id'], c['comment'], c['ticker'], c['sentiment'])]
+        ]
+    return {'past': past, 'today': today}
+
+
+codec.register_migration(STATE_KIND, 1, _migrate_state_v1)
+
+
+def extract_ticker(comment: str, ticker_exists: typing.Callable[[str], bool]) -> str:
+    """
+    Returns the single ticker referenced by the given text, or None if no ticker or
+    more than one ticker is referenced. ticker_exists is used to validate candidates
+    """
+
+    words = alnum.sub('', comment).split()
+    possible = [word for word in words if word.isupper() and len(word) in VALID_TICKER_LENGTHS]
+
+    tickers = [ticker for ticker in possible if ticker_exists(ticker)]
+    tickers = list(set(tickers))
+    if len(tickers) == 1:
+        return tickers[0]
+    if len(tickers) > 1:
+        return None # No sense identifying lowercase tickers when many real uppercase
+
+    # See if maybe they included a ticker not capitalized
+    maybe = [word for word in words if len(word) in VALID_TICKER_LENGTHS]
+    tickers = [ticker for ticker in maybe if ticker_exists(ticker.upper())]
+    tickers = list(set(tickers))
+    if len(tickers) == 1:
+        return tickers[0].upper()
+
+    # TODO - maybe consider searching for company names
+    return None
+
+
+"""
+Platform independent representation of a single comment or post pulled from a
+feed. Adapters convert whatever their platform emits into Posts before they are
+queued for analysis
+"""
+class Post:
+    def __init__(self, id, body, created_utc):
+        self.id = id
+        self.body = body
+        self.created_utc = created_utc
+
+
+"""
+Storage class for a comment and its sentiment. Ids are stored to prevent
+duplication of comments
+"""
+class Comment:
+    __slots__ = ('id', 'comment', 'ticker', 'sentiment')
+
+    def __init__(self, id, comment, ticker, sentiment):
+        self.id = id
+        self.comment = comment
+        self.ticker = ticker
+        self.sentiment = sentiment
+
+    @staticmethod
+    def from_dict(d):
+        return Comment(d['id'], d['comment'], d['ticker'], d['sentiment'])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'comment': self.comment,
+            'ticker': self.ticker,
+            'sentiment': self.sentiment
+        }
+
+
+"""
+Container class for a days worth of comments. Comments for the active day are
+used to evaluate current sentiment. Past days of sentiment only stored
+aggregated. Today's comments are individually stored, with running per ticker
+totals kept alongside so aggregating doesn't have to walk them
+"""
+class DayComments:
+    def __init__(self, date: datetime.date, data: typing.Dict[str, Comment] = None):
+        self.date = date
+        self.data = {}
+        self.totals = {}
+        for comment in (data or {}).values():
+            self._add(comment)
+
+    @staticmethod
+    def from_dict(d):
+        data = {
+            cid: Comment.from_dict(comment)
+            for cid, comment in d['data'].items()
+        }
+        return DayComments(datetime.date.fromisoformat(d['date']), data)
+
+    def to_dict(self):
+        data = {
+            cid: comment.to_dict()
+            for cid, comment in self.data.items()
+        }
+        return {
+            'date': self.date.isoformat(),
+            'data': data
+        }
+
+    def add_comment(self, date: datetime.date, comment: Comment) -> typing.Dict[str, Sentiment]:
+        """
+        Adds a comment to todays set. If the comment is from a future date the internal
+        data is reset and the aggregated data for the day is returned
+        """
+
+        if date == self.date:
+            self._add(comment)
+            return None
+        elif self.date < date:
+            logger.info(f'Comment from future date ({date}), clearing stored comments')
+            aggregate = self.aggregate()
+            self.date = date
+            self.data = {}
+            self.totals = {}
+            self._add(comment)
+            return aggregate
+
+    def _add(self, comment: Comment):
+        previous = self.data.get(comment.id)
+        if previous is not None:
+            total = self.totals[previous.ticker]
+            total[0] -= previous.sentiment
+            total[1] -= 1
+            if not total[1]:
+                del self.totals[previous.ticker]
+        self.data[comment.id] = comment
+        total = self.totals.setdefault(comment.ticker, [0, 0])
+        total[0] += comment.sentiment
+        total[1] += 1
+
+    def aggregate(self) -> typing.Dict[str, Sentiment]:
+        """
+        Returns a minified aggregation of comment data into sentiment data. This is
+        O(tickers) rather than O(comments)
+        """
+
+        return {
+            ticker: Sentiment(ticker, value / count, count)
+            for ticker, (value, count) in self.totals.items()
+        }
+
+
+"""
+Base class for sentiment sources that ingest a stream of comments. The base class
+owns the work queue, the pool of analysis workers, daily aggregation, and
+persistence. Platform adapters only need to implement _connect(), _backfill(), and
+_stream(), each of which deal in Post objects. Derived classes must set
+_DATA_PERSIST_KEY to a key unique to the source. Extraction and analysis results
+are cached by normalized comment text, cache_size of 0 disables the cache. Comment
+bodies are only needed for scoring, so keep_bodies=False drops them once scored
+"""
+class StreamingSentimentSource(SentimentSource):
+    _DATA_PERSIST_KEY = None
+    _LOOKBACK_DAYS = 5 # Includes the current day
+    _VALID_TICKER_LENGTHS = VALID_TICKER_LENGTHS
+
+    def __init__(self, analyzer: SentimentAnalyzer, workers: int = 2, queue_size: int = 10000, cache_size: int = 10000, keep_bodies: bool = True):
+        super().__init__()
+        self.analyzer = analyzer
+        self.keep_bodies = keep_bodies
+        self.cache = AnalysisCache(cache_size) if cache_size > 0 else None
+        self.worker_count = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.comments = DayComments(datetime.date.today())
+        self.past_days = []
+        self.env = None
+        self.changed = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.listener = None
+        self.workers = []
+        self._last_rate_sample = (time.monotonic(), 0)
+        self._init_metrics(NullRegistry())
+
+    ##################################################################
+    #              Methods to be implemented by adapters             #
+    ##################################################################
+
+    def _connect(self) -> bool:
+        """
+        Connect to the underlying platform. Return False on error
+        """
+
+        return True
+
+    def _backfill(self) -> typing.Iterable[Post]:
+        """
+        Returns recent posts to process before streaming begins. Backfilled posts are
+        fully processed before initialize() returns
+        """
+
+        return []
+
+    def _stream(self) -> typing.Iterable[Post]:
+        """
+        Yields new posts as they arrive. This runs on the listener thread and may
+        block. Yielding None is allowed and gives the listener a chance to check for
+        shutdown when the platform is quiet
+        """
+
+        return []
+
+    ##################################################################
+    #                      SentimentSource methods                   #
+    ##################################################################
+
+    def initialize(self, env: Environment) -> bool:
+        logger.info(f'Initializing {type(self).__name__}')
+        self.env = env
+        self._init_metrics(env.metrics)
+
+        try:
+            if not self._connect():
+                logger.error(f'{type(self).__name__} failed to connect')
+                return False
+
+            logger.info('Loading stored comments')
+            stored = env.datastore.retrieve_data(self._DATA_PERSIST_KEY)
+            if stored:
+                self._load_from_store(stored)
+
+            self.running = True
+            self._start_workers()
+
+            logger.info('Loading recent posts')
+            for post in self._backfill():
+                self._enqueue(post)
+            self.queue.join()
+
+            self.update(env)
+            self.listener = threading.Thread(target=self._background_listener, daemon=True)
+            self.listener.start()
+            logger.info('Started background listener for new posts')
+
+        except Exception:
+            logger.exception(f'Failed to initialize {type(self).__name__}')
+            self.running = False
+            return False
+        return True
+
+    def update(self, env: Environment):
+        self._update_metrics()
+        # Only the running totals are copied under the lock. The snapshot is built
+        # outside it so workers keep ingesting while it's assembled
+        with self.lock:
+            days = [self.comments.aggregate()] + self.past_days
+            changed, self.changed = self.changed, set()
+        if not changed and self.snapshot.version:
+            return
+
+        sentiment = {}
+        for day_data in days:
+            for ticker, s in day_data.items():
+                if ticker in sentiment:
+                    sentiment[ticker].append(s)
+                else:
+                    sentiment[ticker] = [s]
+        self._publish(sentiment)
+        if changed:
+            env.events.publish(SentimentChanged(changed))
+
+    def shutdown(self, env: Environment):
+        try:
+            self.running = False
+            if self.listener:
+                self.listener.join(timeout=5)
+            for _ in self.workers:
+                self.queue.put(None)
+            for worker in self.workers:
+                worker.join()
+            self.workers = []
+
+            self.checkpoint(env)
+        except Exception:
+            logger.exception(f'Error cleaning up {type(self).__name__}')
+
+    def checkpoint(self, env: Environment):
+        env.datastore.store_data(self._DATA_PERSIST_KEY, self._serialize())
+
+    ##################################################################
+    #                         Internal methods                       #
+    ##################################################################
+
+    def _init_metrics(self, metrics):
+        name = type(self).__name__
+        self.metrics = metrics
+        self._processed = metrics.counter('sentiment_comments_total', 'Comments processed by sentiment sources', source=name)
+        self._matched = metrics.counter('sentiment_comments_matched_total', 'Comments that referenced a ticker', source=name)
+        self._analyze_time = metrics.histogram('sentiment_analyze_seconds', 'Time to extract and analyze one comment', source=name)
+        self._lock_wait = metrics.histogram('sentiment_lock_wait_seconds', 'Time workers spend waiting for the sentiment lock', source=name)
+        self._queue_depth = metrics.gauge('sentiment_queue_depth', 'Comments waiting to be analyzed', source=name)
+        self._rate = metrics.gauge('sentiment_comments_per_second', 'Comments processed per second since the last update', source=name)
+        self._cache_hit_rate = metrics.gauge('sentiment_cache_hit_rate', 'Fraction of comments served from the analysis cache', source=name)
+        if self.cache:
+            self.cache.bind_metrics(metrics, name)
+
+    def _update_metrics(self):
+        if not self.metrics.enabled:
+            return
+        now = time.monotonic()
+        processed = self._processed.value
+        last_time, last_processed = self._last_rate_sample
+        if now > last_time:
+            self._rate.set((processed - last_processed) / (now - last_time))
+        self._last_rate_sample = (now, processed)
+        self._queue_depth.set(self.queue.qsize())
+        if self.cache:
+            self._cache_hit_rate.set(self.cache.hit_rate())
+
+    def _extract_ticker(self, comment: str):
+        return extract_ticker(comment, self.env.ticker_exists)
+
+    def _analyze_text(self, text: str):
+        """
+        Returns (ticker, sentiment) for the text. Sentiment is None when no ticker
+        is found since there is no need to analyze it
+        """
+
+        ticker = self._extract_ticker(text)
+        return ticker, self.analyzer.analyze(text) if ticker else None
+
+    def _analyze_post(self, post: Post):
+        if self.cache:
+            key = AnalysisCache.key(post.body)
+            result = self.cache.get(key)
+            if result is AnalysisCache.MISSING:
+                result = self._analyze_text(post.body)
+                self.cache.put(key, result)
+            ticker, sentiment = result
+        else:
+            ticker, sentiment = self._analyze_text(post.body)
+
+        if ticker:
+            self._matched.inc()
+            comment = Comment(post.id, post.body if self.keep_bodies else None, ticker, sentiment)
+            with self._lock_wait.time():
+                self.lock.acquire()
+            try:
+                self._add_comment(datetime.date.fromtimestamp(post.created_utc), comment)
+            finally:
+                self.lock.release()
+
+    def _add_comment(self, date: datetime.date, comment: Comment):
+        self.changed.add(comment.ticker)
+        agg = self.comments.add_comment(date, comment)
+        if agg is not None: # new day
+            self.past_days.insert(0, agg)
+            self.past_days = self.past_days[0:self._LOOKBACK_DAYS - 1]
+
+    def _enqueue(self, post: Post):
+        while self.running:
+            try:
+                self.queue.put(post, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _start_workers(self):
+        self.workers = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(self.worker_count)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def _worker(self):
+        while True:
+            post = self.queue.get()
+            try:
+                if post is None:
+                    return
+                with self._analyze_time.time():
+                    self._analyze_post(post)
+                self._processed.inc()
+            except Exception:
+                logger.exception(f'Error processing post: {post.body}')
+            finally:
+                self.queue.task_done()
+
+    def _background_listener(self):
+        try:
+            for post in self._stream():
+                if not self.running:
+                    break
+                if post is not None:
+                    self._enqueue(post)
+        except Exception:
+            logger.exception(f'Error streaming posts in {type(self).__name__}')
+
+    def _serialize(self) -> bytes:
+        with self.lock:
+            past = [
+                [field for s in day.values() for field in (s.ticker, s.value, s.confidence)]
+                for day in self.past_days
+            ]
+            comments = self.comments.data.values()
+            today = [
+                self.comments.date.isoformat(),
+                [field for c in comments for field in (c.id, c.comment, c.ticker, c.sentiment)]
+            ]
+        return codec.pack(STATE_KIND, STATE_VERSION, {'past': past, 'today': today})
+
+    def _load_from_store(self, stored):
+        data = codec.unpack(STATE_KIND, STATE_VERSION, stored)
+        self.past_days = [
+            {rows[i]: Sentiment(rows[i], rows[i + 1], rows[i + 2]) for i in range(0, len(rows), 3)}
+            for rows in data['past']
+        ]
+        if data['today']:
+            date, rows = data['today']
+            self.comments = DayComments(
+                datetime.date.fromisoformat(date),
+                {rows[i]: Comment(rows[i], rows[i + 1], rows[i + 2], rows[i + 3]) for i in range(0, len(rows), 4)}
+            )
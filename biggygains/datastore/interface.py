@@ -1,14 +1,18 @@
 import logging
+import typing
 
+Value = typing.Union[str, bytes]
 logger = logging.getLogger('Datastore.interface')
 
 
 """
 Base class for persistant data stores that may be hooked up to environments.
-Datastores are simply key value string pairs that may be used by any module
-or bot to persist data across restarts. Persisted data may be cleared for a
-fresh start, but generally may be used to make bots resilient to crashes and
-restarts
+Datastores are simply key value pairs that may be used by any module or bot
+to persist data across restarts. Values may be str or bytes and are returned
+as the type they were stored as. Persisted data may be cleared for a fresh
+start, but generally may be used to make bots resilient to crashes and
+restarts. The batch methods have default implementations in terms of the
+single key methods which backends should override when they can do better
 """
 class Datastore:
     def initialize(self) -> bool:
@@ -25,16 +29,87 @@ class Datastore:
         logger.warning(f'clear() is not implemented in {type(self).__name__}')
         return False
 
-    def store_data(self, key: str, value: str) -> bool:
+    def store_data(self, key: str, value: Value) -> bool:
         """
         Stores the given key value pair
         """
         logger.warning(f'store_data() is not implemented in {type(self).__name__}')
         return False
 
-    def retrieve_data(self, key: str) -> str:
+    def retrieve_data(self, key: str) -> Value:
         """
         Fetches the stored data for the given key. Returns None on error
         """
         logger.warning(f'retrieve_data() is not implemented in {type(self).__name__}')
         return None
+
+    def store_many(self, items: typing.Dict[str, Value]) -> bool:
+        """
+        Stores all of the given key value pairs
+        """
+        return all([self.store_data(key, value) for key, value in items.items()])
+
+    def retrieve_many(self, keys: typing.Iterable[str]) -> typing.Dict[str, Value]:
+        """
+        Fetches the stored data for each key. Missing keys map to None
+        """
+        return {key: self.retrieve_data(key) for key in keys}
+
+    def scan_prefix(self, prefix: str) -> typing.Dict[str, Value]:
+        """
+        Returns all stored key value pairs whose key starts with prefix
+        """
+        logger.warning(f'scan_prefix() is not implemented in {type(self).__name__}')
+        return {}
+
+    def delete_many(self, keys: typing.Iterable[str]) -> bool:
+        """
+        Removes the given keys. Keys that are not stored are ignored
+        """
+        logger.warning(f'delete_many() is not implemented in {type(self).__name__}')
+        return False
+
+    def namespace(self, name: str) -> 'Datastore':
+        """
+        Returns a view of this datastore where every key is stored under name.
+        Components should persist into their own namespace so their keys can
+        be scanned and cleared without touching anyone else's
+        """
+        return NamespacedDatastore(self, name)
+
+
+"""
+View of a datastore that prefixes every key with a namespace. Namespaces may be
+nested. clear() only removes keys in the namespace
+"""
+class NamespacedDatastore(Datastore):
+    def __init__(self, store: Datastore, name: str):
+        self.store = store
+        self.prefix = name + '/'
+
+    def initialize(self):
+        return True
+
+    def clear(self):
+        return self.delete_many(list(self.scan_prefix('')))
+
+    def store_data(self, key, value):
+        return self.store.store_data(self.prefix + key, value)
+
+    def retrieve_data(self, key):
+        return self.store.retrieve_data(self.prefix + key)
+
+    def store_many(self, items):
+        return self.store.store_many({self.prefix + key: value for key, value in items.items()})
+
+    def retrieve_many(self, keys):
+        keys = list(keys)
+        values = self.store.retrieve_many([self.prefix + key for key in keys])
+        return {key: values[self.prefix + key] for key in keys}
+
+    def scan_prefix(self, prefix):
+        start = len(self.prefix)
+        return {key[start:]: value for key, value in self.store.scan_prefix(self.prefix + prefix).items()}
+
+    def delete_many(self, keys):
+        return self.store.delete_many([self.prefix + key for key in keys])
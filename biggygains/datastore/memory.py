@@ -1,23 +1,56 @@
+import bisect
+
 from .interface import Datastore
 
 
 """
-Simple in memory datastore with no persistence. Useful for testing
+Simple in memory datastore with no persistence. Useful for testing. A sorted copy
+of the keys is kept for prefix scans and only rebuilt after keys are added or removed
 """
 class InMemoryDatastore(Datastore):
     def __init__(self):
         self.data = {}
+        self.sorted_keys = None
 
     def initialize(self):
         return True
 
     def clear(self):
         self.data = {}
+        self.sorted_keys = None
         return True
 
     def store_data(self, key, value):
+        if key not in self.data:
+            self.sorted_keys = None
         self.data[key] = value
         return True
 
     def retrieve_data(self, key):
         return self.data.get(key, None)
+
+    def store_many(self, items):
+        if not self.data.keys() >= items.keys():
+            self.sorted_keys = None
+        self.data.update(items)
+        return True
+
+    def retrieve_many(self, keys):
+        return {key: self.data.get(key) for key in keys}
+
+    def scan_prefix(self, prefix):
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self.data)
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        result = {}
+        for key in self.sorted_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            result[key] = self.data[key]
+        return result
+
+    def delete_many(self, keys):
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                self.sorted_keys = None
+        return True
@@ -0,0 +1,348 @@
+import contextlib
+import logging
+import socket
+import threading
+import typing
+
+from .interface import Datastore
+
+logger = logging.getLogger('RedisDatastore')
+
+
+"""
+Error reply sent by the server. Errors are returned from read_reply() rather than
+raised so that every reply of a pipeline is consumed before the caller raises
+"""
+class RespError(Exception):
+    pass
+
+
+def encode_command(args) -> bytes:
+    """
+    Encodes a command as a RESP array of bulk strings
+    """
+
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """
+    Reads a single RESP value from a buffered binary stream. Bulk strings are
+    returned as bytes and simple strings as str
+    """
+
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Connection closed by server')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        return RespError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError('Connection closed by server')
+        return data[:-2]
+    if kind == b'*':
+        length = int(rest)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise ConnectionError(f'Unexpected reply type {kind!r}')
+
+
+"""
+A single connection to the server. Commands are written in one send and replies
+read back in order, so a pipeline costs one round trip regardless of its length
+"""
+class Connection:
+    def __init__(self, host: str, port: int, timeout: float = 5, password: str = None, db: int = 0):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def pipeline(self, commands: typing.List[tuple]) -> list:
+        self.sock.sendall(b''.join(encode_command(command) for command in commands))
+        return [read_reply(self.stream) for _ in commands]
+
+    def execute(self, *args):
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+"""
+Thread safe pool of idle connections. Connections are created on demand and up to
+size idle connections are kept for reuse. A connection that fails with a socket
+error is discarded rather than returned to the pool
+"""
+class ConnectionPool:
+    def __init__(self, host: str, port: int, size: int = 4, timeout: float = 5, password: str = None, db: int = 0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.password = password
+        self.db = db
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def connect(self) -> Connection:
+        return Connection(self.host, self.port, self.timeout, self.password, self.db)
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self.connect()
+
+        try:
+            yield conn
+        except OSError:
+            conn.close()
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        self._release(conn)
+
+    def _release(self, conn: Connection):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+"""
+Handle for a pub/sub subscription. Messages are delivered to the callback on a
+background thread until close() is called
+"""
+class Subscription:
+    def __init__(self, conn: Connection, channel: str, callback: typing.Callable[[str], None]):
+        self.conn = conn
+        self.channel = channel
+        self.callback = callback
+        self.running = True
+        conn.sock.settimeout(None)
+        conn.execute('SUBSCRIBE', channel)
+        self.thread = threading.Thread(target=self._listen, daemon=True)
+        self.thread.start()
+
+    def _listen(self):
+        while self.running:
+            try:
+                message = read_reply(self.conn.stream)
+            except (OSError, ValueError):
+                break
+            if isinstance(message, list) and len(message) == 3 and message[0] == b'message':
+                try:
+                    self.callback(message[2].decode())
+                except Exception:
+                    logger.exception(f'Subscription callback failed for {self.channel}')
+        if self.running:
+            logger.warning(f'Subscription to {self.channel} lost')
+
+    def close(self):
+        self.running = False
+        try:
+            self.conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+        self.thread.join()
+
+
+def _encode_value(value) -> bytes:
+    # Strings are stored as plain UTF-8 so other clients can read them. bytes are
+    # tagged with a leading 0 byte, and strings that happen to start with a tag byte
+    # are tagged with a leading 1 byte
+    if isinstance(value, bytes):
+        return b'\x00' + value
+    encoded = value.encode()
+    return b'\x01' + encoded if encoded[:1] in (b'\x00', b'\x01') else encoded
+
+
+def _decode_value(value: bytes):
+    if value is None:
+        return None
+    if value[:1] == b'\x00':
+        return value[1:]
+    if value[:1] == b'\x01':
+        return value[1:].decode()
+    return value.decode()
+
+
+"""
+Datastore backed by a Redis compatible key value server, so several bot instances
+can share persisted state. Keys are stored under a prefix so one server may be
+shared with other applications, and clear() only removes keys under the prefix.
+When notify is set every write publishes the changed key so other instances can
+subscribe() to changes. Batch operations are sent in a single round trip
+"""
+class RedisDatastore(Datastore):
+    def __init__(self, host: str = 'localhost', port: int = 6379, prefix: str = 'biggygains:', password: str = None, db: int = 0, pool_size: int = 4, timeout: float = 5, notify: bool = False):
+        self.prefix = prefix
+        self.notify = notify
+        self.channel = prefix + '__changed'
+        self.pool = ConnectionPool(host, port, pool_size, timeout, password, db)
+
+    def _pipeline(self, commands: typing.List[tuple]) -> list:
+        """
+        Runs commands in a single round trip and raises the first error reply. A
+        pooled connection may have been closed by the server while idle, so a
+        failed connection is retried once with a new one
+        """
+
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as conn:
+                    replies = conn.pipeline(commands)
+                break
+            except OSError:
+                if attempt:
+                    raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def _publish(self, keys) -> typing.List[tuple]:
+        return [('PUBLISH', self.channel, key) for key in keys] if self.notify else []
+
+    def initialize(self):
+        try:
+            self._pipeline([('PING',)])
+        except (OSError, RespError):
+            logger.exception(f'Failed to connect to {self.pool.host}:{self.pool.port}')
+            return False
+        return True
+
+    def _scan(self, prefix: str):
+        """
+        Yields batches of full key names starting with prefix
+        """
+
+        match = ''.join('\\' + c if c in '*?[]\\' else c for c in prefix) + '*'
+        cursor = b'0'
+        while True:
+            cursor, keys = self._pipeline([('SCAN', cursor, 'MATCH', match, 'COUNT', 1000)])[0]
+            if keys:
+                yield keys
+            if cursor == b'0':
+                return
+
+    def clear(self):
+        try:
+            for keys in self._scan(self.prefix):
+                self._pipeline([('DEL', *keys)])
+        except (OSError, RespError):
+            logger.exception('Failed to clear datastore')
+            return False
+        return True
+
+    def store_data(self, key, value):
+        try:
+            self._pipeline([('SET', self.prefix + key, _encode_value(value))] + self._publish([key]))
+        except (OSError, RespError):
+            logger.exception(f'Failed to store {key}')
+            return False
+        return True
+
+    def retrieve_data(self, key):
+        try:
+            value = self._pipeline([('GET', self.prefix + key)])[0]
+        except (OSError, RespError):
+            logger.exception(f'Failed to retrieve {key}')
+            return None
+        return _decode_value(value)
+
+    def store_many(self, items):
+        if not items:
+            return True
+        args = [arg for key, value in items.items() for arg in (self.prefix + key, _encode_value(value))]
+        try:
+            self._pipeline([('MSET', *args)] + self._publish(items))
+        except (OSError, RespError):
+            logger.exception(f'Failed to store {len(items)} keys')
+            return False
+        return True
+
+    def retrieve_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self._pipeline([('MGET', *[self.prefix + key for key in keys])])[0]
+        except (OSError, RespError):
+            logger.exception(f'Failed to retrieve {len(keys)} keys')
+            return {key: None for key in keys}
+        return {key: _decode_value(value) for key, value in zip(keys, values)}
+
+    def scan_prefix(self, prefix):
+        start = len(self.prefix)
+        result = {}
+        try:
+            for keys in self._scan(self.prefix + prefix):
+                values = self._pipeline([('MGET', *keys)])[0]
+                for key, value in zip(keys, values):
+                    if value is not None:
+                        result[key[start:].decode()] = _decode_value(value)
+        except (OSError, RespError):
+            logger.exception(f'Failed to scan {prefix}')
+            return {}
+        return result
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return True
+        try:
+            self._pipeline([('DEL', *[self.prefix + key for key in keys])] + self._publish(keys))
+        except (OSError, RespError):
+            logger.exception(f'Failed to delete {len(keys)} keys')
+            return False
+        return True
+
+    def subscribe(self, callback: typing.Callable[[str], None]) -> Subscription:
+        """
+        Calls callback with the key name whenever a datastore with notify set writes
+        a key under this prefix. The callback runs on a background thread
+        """
+
+        return Subscription(self.pool.connect(), self.channel, callback)
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,170 @@
+from __future__ import annotations # Non runtime type checking
+
+import collections
+import datetime
+import itertools
+import logging
+import threading
+import typing
+
+if typing.TYPE_CHECKING:
+    from biggygains.trading.stock import ExecutedOrder, Quote
+
+logger = logging.getLogger('EventBus')
+
+
+"""
+Base class for events published on the EventBus. Events with a coalesce key replace
+a pending event with the same key in a subscriber's queue instead of being queued
+behind it, merged by merge(). Events without one are always delivered
+"""
+class Event:
+    __slots__ = ()
+
+    def coalesce_key(self):
+        return None
+
+    def merge(self, newer: 'Event') -> 'Event':
+        return newer
+
+
+"""
+An order filled. owner is the name of the hosted bot that placed it, if known
+"""
+class OrderFilled(Event):
+    __slots__ = ('fill', 'owner')
+
+    def __init__(self, fill: ExecutedOrder, owner: str = None):
+        self.fill = fill
+        self.owner = owner
+
+
+"""
+Sentiment changed for the given tickers. Pending events merge into one covering
+every changed ticker
+"""
+class SentimentChanged(Event):
+    __slots__ = ('tickers',)
+
+    def __init__(self, tickers: typing.Iterable[str]):
+        self.tickers = frozenset(tickers)
+
+    def coalesce_key(self):
+        return SentimentChanged
+
+    def merge(self, newer: 'SentimentChanged') -> 'SentimentChanged':
+        return SentimentChanged(self.tickers | newer.tickers)
+
+
+"""
+A new quote was fetched for a ticker. Only the latest pending quote per ticker is kept
+"""
+class QuoteUpdated(Event):
+    __slots__ = ('ticker', 'quote')
+
+    def __init__(self, ticker: str, quote: Quote):
+        self.ticker = ticker
+        self.quote = quote
+
+    def coalesce_key(self):
+        return (QuoteUpdated, self.ticker)
+
+
+"""
+The market opened
+"""
+class MarketOpened(Event):
+    __slots__ = ('time',)
+
+    def __init__(self, time: datetime.datetime):
+        self.time = time
+
+
+"""
+The market closed
+"""
+class MarketClosed(Event):
+    __slots__ = ('time',)
+
+    def __init__(self, time: datetime.datetime):
+        self.time = time
+
+
+"""
+A subscriber's queue of pending events. Events are kept in publish order, except
+that a coalescing event takes the place of the pending event it merges into. When
+more than max_pending events are waiting the oldest are dropped
+"""
+class Subscription:
+    def __init__(self, bus: EventBus, types: typing.Tuple[type, ...], accept: typing.Callable[[Event], bool] = None, max_pending: int = 1000):
+        self.bus = bus
+        self.types = types
+        self.accept = accept
+        self.max_pending = max_pending
+        self.pending = collections.OrderedDict()
+        self.sequence = itertools.count()
+        self.dropped = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def _offer(self, event: Event):
+        if not isinstance(event, self.types) or (self.accept and not self.accept(event)):
+            return
+        key = event.coalesce_key()
+        with self.lock:
+            if key is not None and key in self.pending:
+                self.pending[key] = self.pending[key].merge(event)
+                return
+            self.pending[key if key is not None else next(self.sequence)] = event
+            if len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    logger.warning(f'Subscriber fell behind, {self.dropped} events dropped')
+
+    def poll(self) -> typing.List[Event]:
+        """
+        Returns and clears every pending event
+        """
+
+        with self.lock:
+            events = list(self.pending.values())
+            self.pending.clear()
+        return events
+
+    def close(self):
+        self.bus._unsubscribe(self)
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+
+
+"""
+In process publish/subscribe bus. Each subscriber gets its own queue, so a slow
+subscriber never holds up publishers or other subscribers, and bursts of coalescing
+events collapse into one per key while they wait. Safe to publish from any thread
+"""
+class EventBus:
+    def __init__(self):
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, types: typing.Iterable[type], accept: typing.Callable[[Event], bool] = None, max_pending: int = 1000) -> Subscription:
+        """
+        Subscribes to events of the given types and their subclasses. If accept is
+        given, only events it returns True for are queued
+        """
+
+        subscription = Subscription(self, tuple(types), accept, max_pending)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, event: Event):
+        # The list is replaced rather than modified, so it can be read without the lock
+        for subscription in self.subscriptions:
+            subscription._offer(event)
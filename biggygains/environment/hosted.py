@@ -0,0 +1,78 @@
+from __future__ import annotations # Non runtime type checking
+
+import logging
+import typing
+
+from biggygains.trading.stock import Order
+from biggygains.trading.portfolio import Portfolio
+from biggygains.environment.events import Event, OrderFilled, Subscription
+
+if typing.TYPE_CHECKING:
+    from biggygains.bots.interface import Bot
+    from biggygains.environment.interface import Environment
+
+logger = logging.getLogger('Environment.hosted')
+
+
+"""
+The view of the environment handed to a single hosted bot. Market data, sentiment,
+quotes and the datastore are shared with every other bot through the parent
+environment. The portfolio is the bot's own sub-portfolio, and orders are tagged
+with the bot's name so fills can be attributed back to it. Bots only see and cancel
+orders they placed themselves, and only receive fill events for them
+"""
+class BotEnvironment:
+    def __init__(self, parent: Environment, bot: Bot, name: str, allocation: float = None):
+        self.parent = parent
+        self.bot = bot
+        self.name = name
+        self.allocation = allocation
+        self.portfolio = parent.portfolio
+
+    def __getattr__(self, attr):
+        # Everything not specific to the bot is shared with the parent
+        return getattr(self.parent, attr)
+
+    def get_portfolio(self) -> Portfolio:
+        return self.portfolio
+
+    def place_order(self, order: Order) -> bool:
+        if not self.parent.place_order(order):
+            return False
+        self._claim(order)
+        self.parent._save_bots()
+        return True
+
+    def place_orders(self, orders: typing.List[Order]) -> typing.List[bool]:
+        results = self.parent.place_orders(orders)
+        for order, placed in zip(orders, results):
+            if placed:
+                self._claim(order)
+        if any(results):
+            self.parent._save_bots()
+        return results
+
+    def _claim(self, order: Order):
+        if order.order_id is None:
+            logger.warning(f'Order for {order.quantity} {order.ticker} from {self.name} has no id and cannot be attributed')
+            return
+        for placed in [order] + order.legs:
+            self.parent.order_owners[placed.order_id] = self.name
+
+    def cancel_order(self, order_id) -> bool:
+        if self.parent.order_owners.get(order_id) != self.name:
+            logger.warning(f'{self.name} tried to cancel order {order_id} which it did not place')
+            return False
+        return self.parent.cancel_order(order_id)
+
+    def subscribe(self, types: typing.Iterable[type], callback: typing.Callable[[Event], None] = None, accept: typing.Callable[[Event], bool] = None) -> Subscription:
+        # Fills of orders placed by other bots are filtered out
+        def accept_own(event: Event) -> bool:
+            if isinstance(event, OrderFilled) and event.owner not in (None, self.name):
+                return False
+            return accept is None or accept(event)
+        return self.parent.subscribe(types, callback, accept_own)
+
+    def open_orders(self) -> typing.List[Order]:
+        owners = self.parent.order_owners
+        return [order for order in self.parent.open_orders() if owners.get(order.order_id) == self.name]
@@ -3,17 +3,21 @@ from __future__ import annotations # Non runtime type checking
 import typing
 import logging
 import datetime
+import json
 import time
 
 from biggygains.components.sentiment.interface import Sentiment, SentimentSource
-from biggygains.trading.stock import Order, ExecutedOrder
+from biggygains.trading.stock import Order, ExecutedOrder, Quote, Stock
+from biggygains.trading.bars import Bars, Timeframe
 from biggygains.trading.interface import TradeInterface, PricingSource
 from biggygains.datastore.interface import Datastore
 from biggygains.bots.interface import Bot
-
-
-
+from biggygains.metrics.registry import MetricsRegistry, NullRegistry
 from biggygains.trading.portfolio import Portfolio
+from biggygains.environment.hosted import BotEnvironment
+from biggygains.environment.events import Event, EventBus, Subscription, OrderFilled, QuoteUpdated, MarketOpened, MarketClosed
+from biggygains.trading.calendar import SessionCalendar
+from biggygains.trading.performance import PerformanceRecorder
 
 logger = logging.getLogger('Environment.interface')
 
@@ -23,6 +27,8 @@ This is the base class for each environment a bot can run in. It provides
 the set of methods used by the bot to interact with the world.
 """
 class Environment:
+    _BOT_PERSIST_KEY = 'Environment_hosted_bots_v1'
+
     ##################################################################
     #                 Methods to be used by bots                     #
     ##################################################################
@@ -31,8 +37,23 @@ class Environment:
         """
         Returns whether or not the market is open for trading
         """
+        if self.calendar.available():
+            return self.calendar.market_open(self.now())
         return self.trade_interface.market_open()
 
+    def time_to_close(self) -> typing.Optional[datetime.timedelta]:
+        """
+        Returns the time left until the market closes, or None if it is closed or
+        the market calendar is unavailable
+        """
+        return self.calendar.time_to_close(self.now())
+
+    def next_open(self) -> typing.Optional[datetime.datetime]:
+        """
+        Returns when the market next opens, or None if unknown
+        """
+        return self.calendar.next_open(self.now())
+
     def now(self) -> datetime.datetime:
         """
         Returns the current time. Override for historical environments to
@@ -58,19 +79,54 @@ class Environment:
                 result.append(s)
         return result
 
-    def get_all_sentiment(self) -> typing.List[typing.Dict[str, Sentiment]]:
+    def get_all_sentiment(self) -> typing.List[typing.Mapping[str, typing.Tuple[Sentiment, ...]]]:
         """
-        Returns all sentiment data as a list. One item per source. Inner dict
-        is keyed on ticker
+        Returns all sentiment data as a list. One item per source. Inner map
+        is a read only snapshot keyed on ticker
         """
         return [source.get_all_sentiment() for source in self.sentiment_sources]
 
+    def get_quote(self, ticker) -> Quote:
+        """
+        Returns a recent quote for the given ticker. Quotes are cached for
+        quote_cache_seconds and shared between all bots in the environment
+        """
+        now = time.monotonic()
+        cached = self.quote_cache.get(ticker)
+        if cached and cached[0] > now:
+            return cached[1]
+        quote = self.price_source.get_quote(ticker)
+        if quote is not None:
+            self.quote_cache[ticker] = (now + self.quote_cache_seconds, quote)
+            self.events.publish(QuoteUpdated(ticker, quote))
+        return quote
+
+    def get_equity(self, ticker, start: datetime.date = None, end: datetime.date = None) -> Stock:
+        """
+        Returns metadata and daily history for the given ticker. History covers
+        start through end, or the pricing source's default range
+        """
+        return self.price_source.get_equity(ticker, start, end)
+
+    def get_bars(self, ticker, timeframe: Timeframe, start: datetime.date, end: datetime.date) -> Bars:
+        """
+        Returns price bars for the given ticker from start through end inclusive
+        """
+        return self.price_source.get_bars(ticker, timeframe, start, end)
+
     def place_order(self, order: Order) -> bool:
         """
         Places an order. The order will not reflect in portfolio until it is executed
         """
         return self.trade_interface.place_order(order)
 
+    def place_orders(self, orders: typing.List[Order]) -> typing.List[bool]:
+        """
+        Places a basket of orders at once, which is faster than placing them one by
+        one. Returns whether each order was placed, in the same order
+        """
+        return self.trade_interface.place_orders(orders)
+
     def cancel_order(self, order_id) -> bool:
         """
         Cancels an open order and returns True if canceled, False if unable or not found
@@ -83,18 +139,40 @@ class Environment:
         """
         return self.trade_interface.open_orders()
 
+    def subscribe(self, types: typing.Iterable[type], callback: typing.Callable[[Event], None] = None, accept: typing.Callable[[Event], bool] = None) -> Subscription:
+        """
+        Subscribes to events of the given types, such as OrderFilled or
+        SentimentChanged. With a callback, pending events are passed to it every
+        tick after the components update and before bots update. Otherwise poll()
+        the returned subscription. Close the subscription to stop receiving events
+        """
+        subscription = self.events.subscribe(types, accept)
+        if callback:
+            self.handlers.append((subscription, callback))
+        return subscription
+
     ##################################################################
     #           Methods to be used by custom environments            #
     ##################################################################
 
     def __init__(self):
         self.sentiment_sources = []
-        self.bot = Bot()
+        self.bots = []
+        self.order_owners = {}
+        self.quote_cache = {}
+        self.quote_cache_seconds = 5
         self.price_source = PricingSource()
         self.trade_interface = TradeInterface()
         self.portfolio = Portfolio(0)
         self.update_period_seconds = 60
+        self.closed_update_period_seconds = 900
+        self.calendar = SessionCalendar(lambda start, end: self.trade_interface.get_calendar(start, end))
         self.datastore = Datastore()
+        self.set_metrics_registry(NullRegistry())
+        self.recorder = None
+        self.events = EventBus()
+        self.handlers = []
+        self.was_open = None
 
     def connect_sentiment_source(self, source: SentimentSource):
         self.sentiment_sources.append(source)
@@ -119,12 +197,26 @@ class Environment:
 
     def notify_order_completed(self, order: ExecutedOrder):
         """
-        This should be called by TradeInterfaces when an open order is executed
+        This should be called by TradeInterfaces when an open order is executed.
+        The account portfolio is always updated. If the order was placed by a
+        hosted bot with its own sub-portfolio then that is updated as well
         """
-        if order.is_buy:
-            self.portfolio.buy(order.ticker, order.quantity, order.avg_price)
-        else:
-            self.portfolio.sell(order.ticker, order.quantity, order.avg_price)
+        portfolios = [self.portfolio]
+        owner_name = self.order_owners.pop(order.order_id, None)
+        owner = self._hosted_bot(owner_name)
+        if owner and owner.portfolio is not self.portfolio:
+            portfolios.append(owner.portfolio)
+
+        if self.recorder:
+            self.recorder.record_fill(self.now(), order)
+        for portfolio in portfolios:
+            if order.is_buy:
+                portfolio._buy(order.ticker, order.quantity, order.avg_price)
+            else:
+                portfolio._sell(order.ticker, order.quantity, order.avg_price)
+        if owner_name is not None:
+            self._save_bots()
+        self.events.publish(OrderFilled(order, owner_name))
 
     def ticker_exists(self, ticker) -> bool:
         """
@@ -139,16 +231,66 @@ class Environment:
     def run(self):
         try:
             while True:
-                self.trade_interface.update(self)
-                for source in self.sentiment_sources:
-                    source.update(self)
-                self.bot.update(self)
-                time.sleep(self.update_period_seconds)
+                with self._tick_time.time():
+                    self._publish_market_status()
+                    with self._trade_interface_time.time():
+                        self.trade_interface.update(self)
+                    for source in self.sentiment_sources:
+                        with self.metrics.timer('sentiment_source_update_seconds', 'Time spent in SentimentSource.update()', source=type(source).__name__):
+                            source.update(self)
+                    self._dispatch_events()
+                    for hosted in self.bots:
+                        with self.metrics.timer('bot_update_seconds', 'Time spent in Bot.update()', bot=hosted.name):
+                            hosted.bot.update(hosted)
+                    if self.recorder:
+                        self._record_performance()
+                self._ticks.inc()
+                time.sleep(self._tick_period())
         except Exception:
             logger.exception('Encountered runtime error, terminating')
         finally:
             self._shutdown()
 
+    def _tick_period(self) -> float:
+        """
+        Ticks slow down to closed_update_period_seconds while the market is closed,
+        but resume the normal period in time for the next open
+        """
+        if not self.calendar.available() or self.market_open():
+            return self.update_period_seconds
+        period = self.closed_update_period_seconds
+        next_open = self.calendar.next_open(self.now())
+        if next_open:
+            period = min(period, (next_open - self.now().astimezone()).total_seconds())
+        return max(self.update_period_seconds, period)
+
+    def _publish_market_status(self):
+        is_open = self.market_open()
+        if self.was_open is not None and is_open != self.was_open:
+            self.events.publish(MarketOpened(self.now()) if is_open else MarketClosed(self.now()))
+        self.was_open = is_open
+
+    def _dispatch_events(self):
+        self.handlers = [(subscription, callback) for subscription, callback in self.handlers if not subscription.closed]
+        for subscription, callback in list(self.handlers):
+            for event in subscription.poll():
+                try:
+                    callback(event)
+                except Exception:
+                    logger.exception(f'Error handling {type(event).__name__}')
+
+    def _record_performance(self):
+        # Closed market ticks would add flat returns that PerformanceRecorder.sharpe()
+        # annualizes as trading time
+        if not self.market_open():
+            return
+        for position in self.portfolio.positions.values():
+            if position.qty:
+                quote = self.get_quote(position.ticker)
+                if quote is not None:
+                    self.portfolio._update_price(position.ticker, quote.mid)
+        self.recorder.sample(self.now(), self.portfolio)
+
     def initialize(self, clear_datastore) -> bool:
         if not self.datastore.initialize():
             logger.error(f'Failed to initialize Datastore {type(self.datastore).__name__}')
@@ -166,6 +308,9 @@ class Environment:
             logger.error('Failed to initialize trading interface')
             return False
 
+        if not self.calendar.load(self.now()) or not self.calendar.available():
+            logger.warning('Market calendar unavailable, market status will be requested every tick')
+
         if not self.price_source.initialize(self):
             logger.error('Failed to initialize pricing source')
             return False
@@ -175,19 +320,124 @@ class Environment:
                 logger.error(f'Failed to initialize SentimentSource {type(sentiment_source).__name__}')
                 return False
 
-        if not self.bot.initialize(self):
-            logger.error('Failed to initialize bot')
+        if not self._allocate_portfolios():
             return False
 
+        for hosted in self.bots:
+            if not hosted.bot.initialize(hosted):
+                logger.error(f'Failed to initialize bot {hosted.name}')
+                return False
+
         return True
 
     def _shutdown(self):
         for source in self.sentiment_sources:
             source.shutdown(self)
-        self.bot.shutdown(self)
+        for hosted in self.bots:
+            hosted.bot.shutdown(hosted)
+        self._save_bots()
 
-    def connect_bot(self, bot: Bot):
-        self.bot = bot
+    def _save_bots(self):
+        """
+        Persists every sub-portfolio and the owner of every open order. Called after
+        each fill and placement by a hosted bot so a crash loses neither
+        """
+        sub = [hosted for hosted in self.bots if hosted.portfolio is not self.portfolio]
+        self.datastore.store_data(Environment._BOT_PERSIST_KEY, json.dumps({
+            'portfolios': {hosted.name: hosted.portfolio.to_dict() for hosted in sub},
+            'allocations': {hosted.name: hosted.allocation for hosted in sub},
+            'orders': self.order_owners
+        }))
+
+    def _allocate_portfolios(self) -> bool:
+        """
+        Gives each hosted bot its sub-portfolio. A single bot without an allocation
+        trades the whole account. Otherwise each bot gets its allocated fraction of
+        the account cash and unallocated bots split what remains evenly. Positions
+        held by the account before the bots were hosted are not given to any bot.
+        Sub-portfolios and ownership of still open orders persisted by a previous run
+        are restored, and bots without a persisted sub-portfolio are only given cash
+        the restored ones don't already hold
+        """
+
+        stored = self.datastore.retrieve_data(Environment._BOT_PERSIST_KEY)
+        saved = json.loads(stored) if stored else {'portfolios': {}, 'orders': {}}
+        open_ids = {order.order_id for order in self.open_orders()}
+        self.order_owners.update({order_id: name for order_id, name in saved['orders'].items() if order_id in open_ids})
+
+        if len(self.bots) == 1 and self.bots[0].allocation is None:
+            self.bots[0].portfolio = self.portfolio
+            return True
+
+        allocated = sum(hosted.allocation for hosted in self.bots if hosted.allocation is not None)
+        if allocated > 1:
+            logger.error(f'Bot allocations sum to {allocated}, which is more than the whole account')
+            return False
+        unallocated = [hosted for hosted in self.bots if hosted.allocation is None]
+        share = (1 - allocated) / len(unallocated) if unallocated else 0
+
+        cash = self.portfolio.cash
+        restored = [hosted for hosted in self.bots if hosted.name in saved['portfolios']]
+        new = [hosted for hosted in self.bots if hosted.name not in saved['portfolios']]
+        saved_allocations = saved.get('allocations', {})
+        for hosted in restored:
+            hosted.portfolio = Portfolio.from_dict(saved['portfolios'][hosted.name])
+            if hosted.name in saved_allocations and saved_allocations[hosted.name] != hosted.allocation:
+                logger.warning(f'Bot {hosted.name} is configured with allocation {hosted.allocation} but was persisted with '
+                               f'{saved_allocations[hosted.name]}, keeping its persisted portfolio')
+
+        wanted = {hosted.name: cash * (share if hosted.allocation is None else hosted.allocation) for hosted in new}
+        free = max(0.0, cash - sum(hosted.portfolio.cash for hosted in restored))
+        scale = 1.0
+        if sum(wanted.values()) > free:
+            scale = free / sum(wanted.values())
+            logger.warning(f'Only {free:.2f} cash is not held by restored bots, scaling new bots down to {scale:.0%} of their allocation')
+        for hosted in new:
+            hosted.portfolio = Portfolio(wanted[hosted.name] * scale)
+
+        for hosted in self.bots:
+            logger.info(f'Bot {hosted.name} starts with portfolio value {hosted.portfolio.value():.2f}')
+        return True
+
+    def _hosted_bot(self, name) -> BotEnvironment:
+        for hosted in self.bots:
+            if hosted.name == name:
+                return hosted
+        return None
+
+    def connect_bot(self, bot: Bot, name: str = None, allocation: float = None):
+        """
+        Hosts a bot in the environment. Any number of bots may be connected and
+        they share all data sources. Bots are named after their type unless a
+        name is given, and the name identifies the bot's persisted sub-portfolio.
+        allocation is the fraction of account cash the bot may trade with
+        """
+
+        name = name or type(bot).__name__
+        if self._hosted_bot(name):
+            suffix = 2
+            while self._hosted_bot(f'{name}_{suffix}'):
+                suffix += 1
+            name = f'{name}_{suffix}'
+        self.bots.append(BotEnvironment(self, bot, name, allocation))
 
     def set_datastore(self, store: Datastore):
         self.datastore = store
+
+    def set_metrics_registry(self, registry: MetricsRegistry):
+        """
+        Enables metrics collection. Components read the registry from the environment
+        when they are initialized, so this must be called before initialize()
+        """
+        self.metrics = registry
+        self._tick_time = registry.histogram('environment_tick_seconds', 'Time spent in a full environment tick')
+        self._trade_interface_time = registry.histogram('trade_interface_update_seconds', 'Time spent in TradeInterface.update()')
+        self._ticks = registry.counter('environment_ticks_total', 'Number of completed environment ticks')
+
+    def set_performance_recorder(self, recorder: PerformanceRecorder):
+        """
+        Samples the account portfolio into the recorder at the end of every tick
+        while the market is open, marked to market with current quotes, and records
+        every fill
+        """
+        self.recorder = recorder
@@ -1,21 +1,34 @@
+import functools
+
 from biggygains.environment.interface import Environment
 from biggygains.trading.impl.alpaca import AlpacaPricingSource, AlpacaTradeInterface
+from biggygains.trading.execution import ExecutionEngine
 from biggygains.components.sentiment.reddit import RedditSentimentSource
 from biggygains.components.sentiment.interface import SentimentAnalyzer
+from biggygains.components.sentiment.process import ProcessSentimentSource
 
 
 """
 A live environment. Makes real (or paper) trades and gets data from the real
-world. Runs in realtime. Components can still be changed via the Environment
+world. Runs in realtime. Components can still be changed via the Environment.
+With isolate_sentiment the Reddit source runs in its own process
 """
 class LiveEnvironment(Environment):
-    def __init__(self, reddit_key, reddit_secret, reddit_subs, alp_url, alp_key, alp_secret):
+    def __init__(self, reddit_key, reddit_secret, reddit_subs, alp_url, alp_key, alp_secret, analyzer: SentimentAnalyzer = None, analysis_cache_size: int = 10000, keep_comment_bodies: bool = True, bar_cache_dir: str = None, isolate_sentiment: bool = False):
         super().__init__()
         
-        self.set_trade_interface(AlpacaTradeInterface(alp_key, alp_secret, alp_url))
-        self.set_pricing_source(AlpacaPricingSource(alp_key, alp_secret, alp_url))
-        self.connect_sentiment_source(RedditSentimentSource(SentimentAnalyzer(), reddit_key, reddit_secret, reddit_subs))
-        # TODO - Configure sentiment analyzer from args
+        self.set_trade_interface(ExecutionEngine(AlpacaTradeInterface(alp_key, alp_secret, alp_url)))
+        self.set_pricing_source(AlpacaPricingSource(alp_key, alp_secret, alp_url, bar_cache_dir))
+        reddit = functools.partial(
+            RedditSentimentSource,
+            analyzer or SentimentAnalyzer(),
+            reddit_key,
+            reddit_secret,
+            reddit_subs,
+            cache_size=analysis_cache_size,
+            keep_bodies=keep_comment_bodies
+        )
+        self.connect_sentiment_source(ProcessSentimentSource(reddit) if isolate_sentiment else reddit())
 
     def _initialize(self):
         # Custom setup?
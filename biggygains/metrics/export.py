@@ -0,0 +1,124 @@
+import http.server
+import logging
+import os
+import threading
+
+from .registry import MetricsRegistry
+
+logger = logging.getLogger('Metrics.export')
+
+
+def render_prometheus(registry: MetricsRegistry) -> str:
+    """
+    Renders all metrics in the registry in the Prometheus text exposition format
+    """
+
+    lines = []
+    described = set()
+    for metric in registry.collect():
+        if metric.name not in described:
+            described.add(metric.name)
+            if metric.help:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+
+        if metric.kind == 'histogram':
+            cumulative = 0
+            bounds = [str(b) for b in metric.buckets] + ['+Inf']
+            for bound, count in zip(bounds, metric.counts):
+                cumulative += count
+                lines.append(f'{metric.name}_bucket{_labels(metric.labels, le=bound)} {cumulative}')
+            lines.append(f'{metric.name}_sum{_labels(metric.labels)} {metric.sum}')
+            lines.append(f'{metric.name}_count{_labels(metric.labels)} {metric.count}')
+        else:
+            lines.append(f'{metric.name}{_labels(metric.labels)} {metric.value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = [
+        (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    ]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+"""
+Serves the registry over HTTP at /metrics on a background thread so that it may be
+scraped by Prometheus or inspected with curl
+"""
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ['/', '/metrics']:
+                    self.send_error(404)
+                    return
+                body = render_prometheus(registry).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info(f'Serving metrics on http://{self.host}:{self.port}/metrics')
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+"""
+Periodically writes the registry to a file in the Prometheus text format. The file
+is replaced atomically so readers never see a partial write
+"""
+class MetricsFileWriter:
+    def __init__(self, registry: MetricsRegistry, path: str, interval_seconds: float = 15):
+        self.registry = registry
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f'Writing metrics to {self.path}')
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.write()
+
+    def write(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(render_prometheus(self.registry))
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval_seconds):
+            try:
+                self.write()
+            except Exception:
+                logger.exception(f'Failed to write metrics to {self.path}')
@@ -0,0 +1,193 @@
+import bisect
+import threading
+import time
+import typing
+
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+
+"""
+Monotonically increasing count of events
+"""
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, labels, help=''):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+"""
+Point in time value that may go up or down, such as queue depth
+"""
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, labels, help=''):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+"""
+Context manager that records elapsed wall time into a Histogram
+"""
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+"""
+Bucketed distribution of observed values. Primarily used for latencies in seconds
+"""
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, labels, help='', buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1) # Last bucket is +Inf
+        self.sum = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+"""
+Creates and holds all metrics for a process. Metrics are identified by name and an
+optional set of labels. Requesting the same name and labels twice returns the same
+metric, so components may fetch metrics on every call or hold on to them
+"""
+class MetricsRegistry:
+    enabled = True
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help='', **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help='', **labels) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help='', **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels)
+
+    def timer(self, name, help='', **labels) -> _Timer:
+        """
+        Returns a context manager that records the time spent inside it into the
+        named histogram
+        """
+        return self.histogram(name, help, **labels).time()
+
+    def collect(self) -> typing.List[typing.Union[Counter, Gauge, Histogram]]:
+        """
+        Returns all metrics sorted by name
+        """
+        with self._lock:
+            return sorted(self.metrics.values(), key=lambda m: (m.name, m.labels))
+
+    def _get(self, cls, name, help, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = cls(name, key[1], help)
+                    self.metrics[key] = metric
+        return metric
+
+
+"""
+Metric that ignores all updates. Shared by every name in NullRegistry
+"""
+class _NullMetric:
+    __slots__ = ()
+    value = 0
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+
+
+"""
+Registry used when metrics are disabled. Every method returns the same no-op
+object, so instrumented code costs a method call and nothing else
+"""
+class NullRegistry(MetricsRegistry):
+    enabled = False
+
+    def counter(self, name, help='', **labels):
+        return _NULL_METRIC
+
+    def gauge(self, name, help='', **labels):
+        return _NULL_METRIC
+
+    def histogram(self, name, help='', **labels):
+        return _NULL_METRIC
+
+    def timer(self, name, help='', **labels):
+        return _NULL_METRIC
+
+    def collect(self):
+        return []
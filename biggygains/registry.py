@@ -0,0 +1,31 @@
+import importlib
+import typing
+
+
+"""
+Reference to a component class that is only imported when it is needed. This keeps
+heavy dependencies such as network SDKs out of startup for commands that never use
+them. Required arguments are the names of parsed command line arguments that must
+be set before the component may be constructed
+"""
+class LazyComponent:
+    def __init__(self, module: str, name: str, required_args: typing.List[str] = None):
+        self.module = module
+        self.name = name
+        self.required_args = required_args or []
+
+    def load(self) -> type:
+        """
+        Imports and returns the component class
+        """
+        return getattr(importlib.import_module(self.module), self.name)
+
+    def missing_args(self, args) -> typing.List[str]:
+        """
+        Returns the command line flags for required arguments that are not set
+        """
+        return [
+            '--' + name.replace('_', '-')
+            for name in self.required_args
+            if not getattr(args, name, None)
+        ]
@@ -0,0 +1,267 @@
+import csv
+import datetime
+import enum
+import json
+import logging
+import os
+import threading
+import typing
+
+import numpy as np
+
+from biggygains.trading.calendar import MARKET_TIMEZONE
+from biggygains.trading.stock import Quote, TradingDay
+
+logger = logging.getLogger('BarCache')
+
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'), # Bar start, seconds since the epoch
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+CSV_COLUMNS = BAR_DTYPE.names
+
+
+def day_start(date: datetime.date) -> int:
+    """
+    Returns midnight of the given date in the market timezone as an epoch timestamp
+    """
+
+    return int(datetime.datetime.combine(date, datetime.time(), MARKET_TIMEZONE).timestamp())
+
+
+def _market_date(timestamp: int) -> datetime.date:
+    return datetime.datetime.fromtimestamp(timestamp, MARKET_TIMEZONE).date()
+
+
+def _parse_time(value: str) -> int:
+    try:
+        return int(float(value))
+    except ValueError:
+        return int(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+
+"""
+Bar resolutions kept by the cache
+"""
+class Timeframe(enum.Enum):
+    Minute = 'minute'
+    Day = 'day'
+
+
+"""
+Price bars for a single ticker, held in one numpy structured array sorted by time.
+Columns are exposed as array views, so indicators can work on them directly without
+copying. Slicing by time is a binary search
+"""
+class Bars:
+    __slots__ = ('data',)
+
+    def __init__(self, data: np.ndarray = None):
+        self.data = data if data is not None else np.empty(0, dtype=BAR_DTYPE)
+
+    @staticmethod
+    def from_rows(rows: typing.Iterable[tuple]) -> 'Bars':
+        """
+        Builds bars from (time, open, high, low, close, volume) rows in any order
+        """
+
+        data = np.array(list(rows), dtype=BAR_DTYPE)
+        return Bars(np.sort(data, order='time'))
+
+    @staticmethod
+    def from_csv(path: str) -> 'Bars':
+        """
+        Reads bars from a CSV file with a header naming the time, open, high, low,
+        close, and volume columns. Times may be epoch seconds or ISO 8601
+        """
+
+        with open(path, newline='') as f:
+            rows = [
+                (_parse_time(row['time']),) + tuple(float(row[c]) for c in CSV_COLUMNS[1:])
+                for row in csv.DictReader(f)
+            ]
+        return Bars.from_rows(rows)
+
+    def to_csv(self, path: str):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(self.data.tolist())
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.data['time']
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.data['open']
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.data['high']
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.data['low']
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.data['close']
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.data['volume']
+
+    def between(self, start: int, end: int) -> 'Bars':
+        """
+        Returns a view of the bars starting in [start, end) epoch seconds
+        """
+
+        times = self.data['time']
+        return Bars(self.data[np.searchsorted(times, start):np.searchsorted(times, end)])
+
+    def merge(self, other: 'Bars') -> 'Bars':
+        """
+        Returns the union of both sets of bars. Where both have a bar for the same
+        time, the bar from other wins
+        """
+
+        if not len(other):
+            return self
+        data = np.concatenate([other.data, self.data])
+        _, first = np.unique(data['time'], return_index=True)
+        return Bars(data[first])
+
+    def trading_days(self) -> typing.List[TradingDay]:
+        """
+        Converts daily bars to TradingDay objects for code written against Stock.history
+        """
+
+        days = []
+        for t, o, _, _, c, v in self.data.tolist():
+            opened = datetime.datetime.fromtimestamp(t, MARKET_TIMEZONE)
+            days.append(TradingDay(opened.date(), Quote(o, o, 0, opened), Quote(c, c, v, opened)))
+        return days
+
+
+"""
+Per ticker bar cache, backed by files in a directory. Each ticker and timeframe is
+kept as a .npy array of bars alongside a .json list of the date ranges already
+fetched, so only dates that have never been fetched are requested again. Ranges
+reaching today are not recorded since today's bars are still coming in.
+
+fetch(ticker, timeframe, start, end) returns Bars for the dates start through end
+inclusive. Without fetch, or when it fails, the cache serves what it has, which
+makes it usable offline. A TICKER.csv placed in the timeframe directory is imported
+as covering the dates from its first bar to its last. Without a directory the cache
+only lives in memory
+"""
+class BarCache:
+    def __init__(self, directory: typing.Optional[str], fetch: typing.Callable[[str, Timeframe, datetime.date, datetime.date], Bars] = None):
+        self.directory = directory
+        self.fetch = fetch
+        self.entries = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, ticker: str, timeframe: Timeframe, start: datetime.date, end: datetime.date, today: datetime.date = None) -> Bars:
+        """
+        Returns the bars for the dates start through end inclusive, fetching any
+        dates not yet in the cache
+        """
+
+        today = today or datetime.datetime.now(MARKET_TIMEZONE).date()
+        key = (ticker, timeframe)
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if key not in self.entries:
+                self.entries[key] = self._load(ticker, timeframe)
+            bars, ranges = self.entries[key]
+
+            changed = False
+            for missing_start, missing_end in self._missing(ranges, start, end) if self.fetch else []:
+                try:
+                    fetched = self.fetch(ticker, timeframe, missing_start, missing_end)
+                except Exception:
+                    logger.exception(f'Failed to fetch {timeframe.value} bars for {ticker} {missing_start} to {missing_end}')
+                    continue
+                bars = bars.merge(fetched)
+                if missing_start < today:
+                    ranges = self._add_range(ranges, missing_start, min(missing_end, today - datetime.timedelta(days=1)))
+                changed = True
+
+            if changed:
+                self.entries[key] = (bars, ranges)
+                self._save(ticker, timeframe, bars, ranges)
+        return bars.between(day_start(start), day_start(end + datetime.timedelta(days=1)))
+
+    @staticmethod
+    def _missing(ranges: list, start: datetime.date, end: datetime.date) -> typing.List[typing.Tuple[datetime.date, datetime.date]]:
+        missing = []
+        for covered_start, covered_end in ranges:
+            if covered_end < start:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > start:
+                missing.append((start, covered_start - datetime.timedelta(days=1)))
+            start = covered_end + datetime.timedelta(days=1)
+        if start <= end:
+            missing.append((start, end))
+        return missing
+
+    @staticmethod
+    def _add_range(ranges: list, start: datetime.date, end: datetime.date) -> list:
+        merged = []
+        for covered in sorted(ranges + [(start, end)]):
+            if merged and covered[0] <= merged[-1][1] + datetime.timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], covered[1]))
+            else:
+                merged.append(covered)
+        return merged
+
+    def _path(self, ticker: str, timeframe: Timeframe, extension: str) -> str:
+        return os.path.join(self.directory, timeframe.value, f'{ticker}.{extension}')
+
+    def _load(self, ticker: str, timeframe: Timeframe) -> typing.Tuple[Bars, list]:
+        if not self.directory:
+            return Bars(), []
+        try:
+            if os.path.exists(self._path(ticker, timeframe, 'npy')):
+                bars = Bars(np.load(self._path(ticker, timeframe, 'npy')))
+                with open(self._path(ticker, timeframe, 'json')) as f:
+                    ranges = [tuple(datetime.date.fromisoformat(d) for d in r) for r in json.load(f)]
+                return bars, ranges
+            if os.path.exists(self._path(ticker, timeframe, 'csv')):
+                bars = Bars.from_csv(self._path(ticker, timeframe, 'csv'))
+                if len(bars):
+                    return bars, [(_market_date(bars.time[0]), _market_date(bars.time[-1]))]
+        except (OSError, ValueError, KeyError):
+            logger.exception(f'Failed to load cached {timeframe.value} bars for {ticker}, starting empty')
+        return Bars(), []
+
+    def _save(self, ticker: str, timeframe: Timeframe, bars: Bars, ranges: list):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(os.path.join(self.directory, timeframe.value), exist_ok=True)
+            # Write then rename so a crash never leaves a partial file behind
+            path = self._path(ticker, timeframe, 'npy')
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, bars.data)
+            os.replace(path + '.tmp', path)
+            path = self._path(ticker, timeframe, 'json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump([[s.isoformat(), e.isoformat()] for s, e in ranges], f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            logger.exception(f'Failed to save {timeframe.value} bars for {ticker}')
@@ -0,0 +1,106 @@
+import bisect
+import datetime
+import logging
+import threading
+import typing
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger('SessionCalendar')
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+
+
+"""
+A single trading session with timezone aware open and close times
+"""
+class Session:
+    def __init__(self, date: datetime.date, open_: datetime.datetime, close: datetime.datetime):
+        self.date = date
+        self.open = open_
+        self.close = close
+
+
+"""
+Caches market sessions for a window of days so market status can be answered
+without a network call. Sessions are fetched with fetch(start, end), which returns
+the sessions between the two dates inclusive. The window is refetched once the
+current date gets within refresh_margin days of its end. If a fetch fails the
+calendar keeps answering from what it has and retries after retry_seconds.
+available() is False until sessions have been loaded
+"""
+class SessionCalendar:
+    def __init__(self, fetch: typing.Callable[[datetime.date, datetime.date], typing.List[Session]], days: int = 30, refresh_margin: int = 5, retry_seconds: float = 300):
+        self.fetch = fetch
+        self.days = days
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self.sessions = []
+        self.opens = []
+        self.end = None
+        self.next_attempt = None
+        self.lock = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(self.sessions)
+
+    def load(self, now: datetime.datetime) -> bool:
+        """
+        Fetches sessions from a few days before now through the window. Returns False
+        on failure
+        """
+
+        start = now.date() - datetime.timedelta(days=7)
+        end = now.date() + datetime.timedelta(days=self.days)
+        try:
+            sessions = sorted(self.fetch(start, end), key=lambda s: s.open)
+        except Exception:
+            logger.exception('Failed to fetch the market calendar')
+            self.next_attempt = now + datetime.timedelta(seconds=self.retry_seconds)
+            return False
+        with self.lock:
+            self.sessions = sessions
+            self.opens = [s.open for s in sessions]
+            self.end = end
+            self.next_attempt = None
+        logger.info(f'Loaded {len(sessions)} market sessions through {end}')
+        return True
+
+    def _refresh(self, now: datetime.datetime):
+        stale = self.end is None or now.date() > self.end - datetime.timedelta(days=self.refresh_margin)
+        if stale and (self.next_attempt is None or now >= self.next_attempt):
+            self.load(now)
+
+    def session(self, now: datetime.datetime) -> typing.Optional[Session]:
+        """
+        Returns the session in progress at now, or None if the market is closed
+        """
+
+        now = now.astimezone()
+        self._refresh(now)
+        with self.lock:
+            i = bisect.bisect_right(self.opens, now) - 1
+            if i >= 0 and now < self.sessions[i].close:
+                return self.sessions[i]
+        return None
+
+    def market_open(self, now: datetime.datetime) -> bool:
+        return self.session(now) is not None
+
+    def time_to_close(self, now: datetime.datetime) -> typing.Optional[datetime.timedelta]:
+        """
+        Returns the time left in the current session, or None if the market is closed
+        """
+
+        session = self.session(now)
+        return session.close - now.astimezone() if session else None
+
+    def next_open(self, now: datetime.datetime) -> typing.Optional[datetime.datetime]:
+        """
+        Returns the open of the next session starting after now, or None if it is
+        beyond the cached window
+        """
+
+        now = now.astimezone()
+        self._refresh(now)
+        with self.lock:
+            i = bisect.bisect_right(self.opens, now)
+            return self.sessions[i].open if i < len(self.sessions) else None
@@ -0,0 +1,275 @@
+from __future__ import annotations # Non runtime type checking
+
+import datetime
+import itertools
+import logging
+import math
+import typing
+
+import numpy as np
+
+from biggygains.trading.bars import Timeframe
+from biggygains.trading.calendar import MARKET_TIMEZONE
+from biggygains.trading.interface import TradeInterface
+from biggygains.trading.stock import Order, OrderType, OrderClass, ExecutedOrder
+
+if typing.TYPE_CHECKING:
+    from biggygains.environment.interface import Environment
+
+logger = logging.getLogger('ExecutionEngine')
+
+
+"""
+Time weighted schedule. Splits a parent order into equal slices over duration
+"""
+class TWAP:
+    def __init__(self, duration: datetime.timedelta, slices: int = 10):
+        self.duration = duration
+        self.slices = slices
+
+    def plan(self, env: Environment, ticker, start: datetime.datetime) -> np.ndarray:
+        """
+        Returns the cumulative fraction of the parent to have filled by the end of
+        each slice. The last value is always 1
+        """
+
+        return np.arange(1, self.slices + 1) / self.slices
+
+
+"""
+Volume weighted schedule. Slices are sized by how much of the day's volume usually
+trades in them, taken from the ticker's minute bars over the last lookback_days
+at the same time of day. Falls back to equal slices without bar history
+"""
+class VWAP(TWAP):
+    def __init__(self, duration: datetime.timedelta, slices: int = 10, lookback_days: int = 10):
+        super().__init__(duration, slices)
+        self.lookback_days = lookback_days
+
+    def plan(self, env: Environment, ticker, start: datetime.datetime) -> np.ndarray:
+        start = start.astimezone(MARKET_TIMEZONE)
+        bars = env.get_bars(
+            ticker,
+            Timeframe.Minute,
+            start.date() - datetime.timedelta(days=self.lookback_days),
+            start.date() - datetime.timedelta(days=1)
+        )
+        if not bars:
+            return super().plan(env, ticker, start)
+
+        # Bucket every historical bar by its offset from start's time of day
+        utc_offset = start.utcoffset().total_seconds()
+        offset = start.hour * 3600 + start.minute * 60 + start.second
+        time_of_day = (bars.time + utc_offset) % 86400
+        slice_seconds = self.duration.total_seconds() / self.slices
+        bucket = np.floor((time_of_day - offset) / slice_seconds).astype(np.int64)
+        valid = (bucket >= 0) & (bucket < self.slices)
+        volume = np.bincount(bucket[valid], weights=bars.volume[valid], minlength=self.slices)
+        if volume.sum() <= 0:
+            return super().plan(env, ticker, start)
+        cumulative = np.cumsum(volume) / volume.sum()
+        cumulative[-1] = 1
+        return cumulative
+
+
+"""
+Execution state of a parent order being worked by the engine
+"""
+class ParentOrder:
+    __slots__ = ('order', 'schedule', 'plan', 'start', 'filled', 'notional', 'children', 'canceling', 'done')
+
+    def __init__(self, order: Order):
+        self.order = order
+        self.schedule = order.execution
+        self.plan = None
+        self.start = None
+        self.filled = 0
+        self.notional = 0.0
+        self.children = {}
+        self.canceling = set()
+        self.done = False
+
+    def avg_price(self) -> typing.Optional[float]:
+        return self.notional / self.filled if self.filled else None
+
+    def remaining(self):
+        return self.order.quantity - self.filled
+
+
+"""
+Environment proxy handed to the wrapped interface so child fills are seen by the
+engine on their way to the environment
+"""
+class _FillListener:
+    def __init__(self, engine: ExecutionEngine, env: Environment):
+        self.engine = engine
+        self.env = env
+
+    def __getattr__(self, attr):
+        return getattr(self.env, attr)
+
+    def notify_order_completed(self, order: ExecutedOrder):
+        self.engine._on_fill(self.env, order)
+        self.env.notify_order_completed(order)
+
+
+"""
+Execution layer wrapping another TradeInterface. Orders with an execution schedule
+are kept as parent orders and worked over the schedule's duration as a series of
+child orders, while every other order passes straight through.
+
+Each tick the parent's target is how much of the schedule should be done by the end
+of the current slice. The shortfall is sent as a child limit order resting on the
+near side of the quote, so the spread is earned rather than paid. A child that
+doesn't fill within its slice is canceled and the quantity is repriced in the next
+one. Only once the schedule has run out is the remainder sent to the far side of
+the quote, and it is repriced whenever the quote moves away so the parent still
+completes in a running market. Children never cross a parent's limit price.
+
+Fills on children are applied to the portfolio as they happen and attributed to the
+bot that placed the parent. Parents are worked from memory and are not restored
+after a restart, though their children are
+"""
+class ExecutionEngine(TradeInterface):
+    def __init__(self, interface: TradeInterface):
+        self.interface = interface
+        self.parents = {}
+        self.child_parents = {}
+        self.ids = itertools.count(1)
+
+    def initialize(self, env: Environment) -> bool:
+        return self.interface.initialize(env)
+
+    def update(self, env: Environment):
+        self.interface.update(_FillListener(self, env))
+
+        # Children that closed without filling are only seen by their absence
+        open_ids = {order.order_id for order in self.interface.open_orders()}
+        for child_id in [child_id for child_id in self.child_parents if child_id not in open_ids]:
+            self._close_child(child_id)
+
+        now = env.now()
+        for parent_id, parent in list(self.parents.items()):
+            if not parent.done:
+                self._work(env, parent, now)
+            if parent.done and not parent.children:
+                del self.parents[parent_id]
+                env.order_owners.pop(parent_id, None)
+
+    def place_order(self, order: Order) -> bool:
+        if order.execution is None:
+            return self.interface.place_order(order)
+        if order.order_class != OrderClass.Simple:
+            logger.error(f'Order for {order.quantity} {order.ticker} cannot have both an execution schedule and exits')
+            return False
+        order.order_id = f'parent-{next(self.ids)}'
+        self.parents[order.order_id] = ParentOrder(order)
+        logger.info(f'Working {order.quantity} {order.ticker} as {order.order_id} over {order.execution.duration}')
+        return True
+
+    def place_orders(self, orders: typing.List[Order]) -> typing.List[bool]:
+        direct = [order for order in orders if order.execution is None]
+        placed = dict(zip(map(id, direct), self.interface.place_orders(direct)))
+        return [placed[id(order)] if order.execution is None else self.place_order(order) for order in orders]
+
+    def cancel_order(self, order_id) -> bool:
+        parent = self.parents.get(order_id)
+        if parent is None:
+            return self.interface.cancel_order(order_id)
+        parent.done = True
+        for child_id in parent.children:
+            self.interface.cancel_order(child_id)
+        return True
+
+    def market_open(self) -> bool:
+        return self.interface.market_open()
+
+    def open_orders(self) -> typing.List[Order]:
+        orders = [order for order in self.interface.open_orders() if order.order_id not in self.child_parents]
+        return orders + [parent.order for parent in self.parents.values() if not parent.done]
+
+    def get_calendar(self, start, end):
+        return self.interface.get_calendar(start, end)
+
+    def ticker_exists(self, ticker) -> bool:
+        return self.interface.ticker_exists(ticker)
+
+    def parent(self, order_id) -> typing.Optional[ParentOrder]:
+        """
+        Returns the execution state of a parent order that is still being worked
+        """
+
+        return self.parents.get(order_id)
+
+    def _work(self, env: Environment, parent: ParentOrder, now: datetime.datetime):
+        order = parent.order
+        if parent.start is None:
+            parent.start = now
+            parent.plan = parent.schedule.plan(env, order.ticker, now)
+
+        elapsed = (now - parent.start).total_seconds()
+        duration = parent.schedule.duration.total_seconds()
+        slice_seconds = duration / len(parent.plan)
+        expired = elapsed >= duration
+        index = min(len(parent.plan) - 1, int(elapsed // slice_seconds))
+        target = order.quantity if expired else math.floor(parent.plan[index] * order.quantity + 1e-9)
+
+        # Children left over from an earlier slice are pulled, as are children sent
+        # after the schedule ran out once the quote moves away from them, and the
+        # quantity is repriced once they have closed
+        current = len(parent.plan) if expired else index
+        quote = env.get_quote(order.ticker) if expired or target > parent.filled else None
+        price = self._price(order, quote, expired) if quote is not None else None
+        for child_id, (child, placed) in parent.children.items():
+            stale = placed < current or (expired and price is not None and child.limit_price != price)
+            if stale and child_id not in parent.canceling:
+                self.interface.cancel_order(child_id)
+                parent.canceling.add(child_id)
+        if parent.children:
+            return
+
+        need = target - parent.filled
+        if need <= 0:
+            return
+        if quote is None:
+            logger.warning(f'No quote for {order.ticker}, delaying {order.order_id}')
+            return
+
+        child = Order(order.ticker, OrderType.Limit, need, order.is_buy, limit_price=price)
+        if not self.interface.place_order(child):
+            return
+        parent.children[child.order_id] = (child, current)
+        self.child_parents[child.order_id] = order.order_id
+        owner = env.order_owners.get(order.order_id)
+        if owner is not None:
+            env.order_owners[child.order_id] = owner
+
+    @staticmethod
+    def _price(order: Order, quote, expired: bool) -> float:
+        """
+        Limit price for a child: the near side of the quote while the schedule runs
+        and the far side after, never past the parent's limit
+        """
+
+        if order.is_buy:
+            price = quote.ask if expired else quote.bid
+            return min(price, order.limit_price) if order.limit_price is not None else price
+        price = quote.bid if expired else quote.ask
+        return max(price, order.limit_price) if order.limit_price is not None else price
+
+    def _close_child(self, child_id) -> typing.Optional[ParentOrder]:
+        parent = self.parents.get(self.child_parents.pop(child_id, None))
+        if parent is not None:
+            parent.children.pop(child_id, None)
+            parent.canceling.discard(child_id)
+        return parent
+
+    def _on_fill(self, env: Environment, fill: ExecutedOrder):
+        parent = self._close_child(fill.order_id)
+        if parent is None:
+            return
+        parent.filled += fill.quantity
+        parent.notional += fill.quantity * fill.avg_price
+        if parent.filled >= parent.order.quantity:
+            parent.done = True
+            logger.info(f'{parent.order.order_id} filled {parent.filled} {parent.order.ticker} at {parent.avg_price():.4f}')
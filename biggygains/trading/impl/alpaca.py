@@ -1,130 +1,330 @@
+import json
 import logging
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from biggygains.trading.interface import TradeInterface, PricingSource
-from biggygains.trading.stock import Order, OrderType, ExecutedOrder
+from biggygains.trading.stock import Order, OrderType, OrderClass, ExecutedOrder, Quote, Stock
 from biggygains.environment.interface import Environment
 from biggygains.trading.portfolio import Position
-
-from alpaca_trade_api import REST as Alpaca
+from biggygains.trading.journal import OrderJournal
+from biggygains.trading.calendar import Session, MARKET_TIMEZONE
+from biggygains.trading.bars import Bars, BarCache, Timeframe, day_start
+from biggygains.trading.impl.broker import alpaca_client, not_found
 
 logger = logging.getLogger('AlpacaTradeInterface')
+PAGE_SIZE = 500
+SUBMIT_WORKERS = 8
+
+
+def _timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _order_type(order_type: OrderType) -> str:
+    return 'stop_limit' if order_type == OrderType.StopLimit else order_type.value
 
 
+def _to_order(order) -> Order:
+    return Order(
+        order.symbol,
+        OrderType(order.order_type.replace('_', '')),
+        float(order.qty),
+        order.side == 'buy',
+        order_id=order.id,
+        limit_price=float(order.limit_price) if order.limit_price is not None else None,
+        stop_price=float(order.stop_price) if order.stop_price is not None else None
+    )
+
+
+"""
+Prices from Alpaca market data. Historical bars go through a BarCache, kept in
+bar_cache_dir if given, so history is only downloaded once
+"""
 class AlpacaPricingSource(PricingSource):
-    def __init__(self, key, secret, endpoint):
-        self.api = Alpaca(key, secret, endpoint)
+    def __init__(self, key, secret, endpoint, bar_cache_dir=None):
+        self.credentials = (key, secret, endpoint)
+        self.client = None
+        self.bars = BarCache(bar_cache_dir, self._fetch_bars)
 
     def initialize(self, env: Environment):
+        self.client = alpaca_client(*self.credentials)
+        self.client.bind_metrics(env.metrics)
         return True
 
-    def get_equity(self, ticker):
-        # TODO - fetch data and populate
-        return None
+    def get_equity(self, ticker, start=None, end=None):
+        end = end or datetime.now(MARKET_TIMEZONE).date()
+        start = start or end - timedelta(days=365)
+        daily = self.bars.get(ticker, Timeframe.Day, start, end)
+        quote = self.get_quote(ticker)
+        if quote is None:
+            if not len(daily):
+                return None
+            close = datetime.fromtimestamp(int(daily.time[-1]), MARKET_TIMEZONE)
+            quote = Quote(float(daily.close[-1]), float(daily.close[-1]), float(daily.volume[-1]), close)
+
+        year = daily.between(day_start(end - timedelta(days=364)), day_start(end + timedelta(days=1)))
+        stats = {}
+        if len(year):
+            stats = {'high': float(year.high.max()), 'low': float(year.low.min()), 'avgvol': float(year.volume.mean())}
+        return Stock(ticker, quote, bars=daily, **stats)
+
+    def get_bars(self, ticker, timeframe, start, end):
+        return self.bars.get(ticker, timeframe, start, end)
+
+    def _fetch_bars(self, ticker, timeframe, start, end):
+        from alpaca_trade_api.rest import TimeFrame
+
+        # Alpaca's end is inclusive, so stop just before the next day's first bar
+        bars = self.client.call(
+            'get_bars',
+            ticker,
+            TimeFrame.Day if timeframe == Timeframe.Day else TimeFrame.Minute,
+            datetime.fromtimestamp(day_start(start), timezone.utc).isoformat(),
+            datetime.fromtimestamp(day_start(end + timedelta(days=1)) - 1, timezone.utc).isoformat()
+        )
+        return Bars.from_rows(
+            (int(_timestamp(b.t).timestamp()), float(b.o), float(b.h), float(b.l), float(b.c), float(b.v))
+            for b in bars
+        )
 
     def get_quote(self, ticker):
-        # TODO - fetch data and populate
-        return None
+        try:
+            quote = self.client.call('get_latest_quote', ticker)
+        except Exception:
+            logger.exception(f'Failed to get quote for {ticker}')
+            return None
+        # Quotes carry bid and ask sizes but not traded volume
+        return Quote(float(quote.bp), float(quote.ap), 0, quote.t)
 
 
+"""
+Trades through Alpaca. Order activity is written to an OrderJournal in the datastore,
+so a restart restores the portfolio and open orders from the journal and only asks
+Alpaca about orders that were open when the bot stopped. The account and positions
+are only pulled in full when there is no journal yet
+"""
 class AlpacaTradeInterface(TradeInterface):
+    _TICKERS_PERSIST_KEY = 'AlpacaTradeInterface_tickers_v1'
+    _JOURNAL_NAMESPACE = 'AlpacaTradeInterface_journal_v1'
+
     def __init__(self, key, secret, endpoint):
-        self.api = Alpaca(key, secret, endpoint)
+        self.credentials = (key, secret, endpoint)
+        self.client = None
+        self.journal = None
         self.pending_orders = {}
+        self.verify_cash = False
         self.cached_tickers = {}
+        self.new_tickers = False
 
     def initialize(self, env: Environment):
+        # Ticker lookups are shared through the datastore so instances don't each repeat them
+        stored = env.datastore.retrieve_data(AlpacaTradeInterface._TICKERS_PERSIST_KEY)
+        if stored:
+            self.cached_tickers.update(json.loads(stored))
         try:
-            # Load cash balance
-            account = self.api.get_account()
-            env.get_portfolio().cash = float(account.cash) # We have margin but shouldn't use it
-
-            # Load open orders
-            orders = self.api.list_orders(status='open', limit=500)
-            self.pending_orders = {
-                order.id: Order(
-                    order.symbol,
-                    OrderType(order.order_type),
-                    order.qty,
-                    order.side == 'buy',
-                    order_id=order.id,
-                    limit_price=order.limit_price,
-                    stop_price=order.stop_price
-                )
-                for order in orders
-            }
-
-            # Load open positions
-            positions = self.api.list_positions()
-            for pos in positions:
-                env.get_portfolio()._add_position(Position(
-                    pos.symbol,
-                    pos.qty,
-                    pos.avg_entry_price,
-                    pos.current_price
-                ))
+            self.client = alpaca_client(*self.credentials)
+            self.client.bind_metrics(env.metrics)
+            self.journal = OrderJournal(env.datastore.namespace(AlpacaTradeInterface._JOURNAL_NAMESPACE))
+            if self.journal.load():
+                # Orders that closed while stopped are picked up by the first update(),
+                # after which the cash balance is checked against the account
+                portfolio = env.get_portfolio()
+                portfolio.cash = self.journal.portfolio.cash
+                for position in self.journal.portfolio.positions.values():
+                    portfolio._add_position(position)
+                self.verify_cash = True
+            else:
+                self._full_sync(env)
+            self.pending_orders = self.journal.pending
 
         except Exception:
             logger.exception('Failed to pull current orders and cash balance')
             return False
         return True
 
+    def _full_sync(self, env: Environment):
+        logger.info('No order journal found, loading account from Alpaca')
+
+        # Load cash balance
+        account = self.client.call('get_account')
+        env.get_portfolio().cash = float(account.cash) # We have margin but shouldn't use it
+
+        # Load open orders
+        for order in self._list_orders('open'):
+            self.journal.record_placed(_to_order(order), _timestamp(order.submitted_at).isoformat())
+
+        # Load open positions
+        positions = self.client.call('list_positions')
+        for pos in positions:
+            env.get_portfolio()._add_position(Position(
+                pos.symbol,
+                float(pos.qty),
+                float(pos.avg_entry_price),
+                float(pos.current_price)
+            ))
+        self.journal.checkpoint(env.get_portfolio())
+
+    def _list_orders(self, status, after: str = None):
+        """
+        Yields every order with the given status submitted after the given time,
+        oldest first, paging through results PAGE_SIZE at a time
+        """
+
+        seen = set()
+        while True:
+            page = self.client.call('list_orders', status=status, after=after, limit=PAGE_SIZE, direction='asc')
+            new = [order for order in page if order.id not in seen]
+            for order in new:
+                seen.add(order.id)
+                yield order
+            if len(page) < PAGE_SIZE or not new:
+                return
+            # after is exclusive, so back off slightly to not skip orders sharing the
+            # last timestamp. Repeats are filtered out by id
+            after = (_timestamp(page[-1].submitted_at) - timedelta(microseconds=1)).isoformat()
+
     def update(self, env: Environment):
-        orders = self.api.list_orders(status='closed', after=datetime.now() - timedelta(days=2), limit=500)
-        for order in orders:
-            if order.id in self.pending_orders:
-                logger.info(f'Order {order.id} executed')
-                env.notify_order_completed(ExecutedOrder(
-                    order.symbol,
-                    order.filled_qty,
-                    order.filled_avg_price,
-                    order.side == 'buy'
-                ))
+        if self.new_tickers:
+            self.new_tickers = False
+            env.datastore.store_data(AlpacaTradeInterface._TICKERS_PERSIST_KEY, json.dumps(self.cached_tickers))
+
+        # Only orders submitted since the oldest open order can have closed since the
+        # last update, so nothing is listed when no orders are open
+        oldest = self.journal.oldest_pending()
+        if oldest:
+            after = (_timestamp(oldest) - timedelta(seconds=1)).isoformat()
+            for order in self._list_orders('closed', after):
+                if order.id not in self.pending_orders:
+                    continue
+                filled = float(order.filled_qty or 0)
+                if filled > 0:
+                    fill = ExecutedOrder(
+                        order.symbol,
+                        filled,
+                        float(order.filled_avg_price),
+                        order.side == 'buy',
+                        order_id=order.id
+                    )
+                    if self.journal.record_fill(fill):
+                        logger.info(f'Order {order.id} executed')
+                        env.notify_order_completed(fill)
+                else:
+                    logger.info(f'Order {order.id} closed without filling')
+                    self.journal.record_closed(order.id)
+
+        if self.verify_cash:
+            self.verify_cash = False
+            cash = float(self.client.call('get_account').cash)
+            if abs(cash - env.get_portfolio().cash) > 0.01:
+                logger.warning(f'Journal cash {env.get_portfolio().cash:.2f} differs from account cash {cash:.2f}, using account cash')
+                env.get_portfolio().cash = cash
+
+        if self.journal.checkpoint_due():
+            self.journal.checkpoint(env.get_portfolio())
 
     def place_order(self, order: Order):
-        logger.info(f'Placing order for {order.quantity} {order.ticker}')
+        return self._record(order, self._submit(order))
+
+    def place_orders(self, orders):
+        """
+        Submits all orders at once, each on its own connection, so a basket costs
+        about one round trip within the rate budget. Placements are journaled in
+        order once every submission has returned
+        """
+
+        if len(orders) <= 1:
+            return [self.place_order(order) for order in orders]
+        with ThreadPoolExecutor(max_workers=min(len(orders), SUBMIT_WORKERS), thread_name_prefix='AlpacaSubmit') as pool:
+            results = list(pool.map(self._submit, orders))
+        return [self._record(order, result) for order, result in zip(orders, results)]
+
+    def _submit(self, order: Order):
+        logger.info(f'Placing {order.order_class.value} order for {order.quantity} {order.ticker}')
+        exits = {}
+        if order.order_class != OrderClass.Simple:
+            exits['order_class'] = order.order_class.value
+            if order.take_profit_price is not None:
+                exits['take_profit'] = {'limit_price': order.take_profit_price}
+            if order.stop_loss_price is not None:
+                exits['stop_loss'] = {'stop_price': order.stop_loss_price}
+                if order.stop_loss_limit_price is not None:
+                    exits['stop_loss']['limit_price'] = order.stop_loss_limit_price
         try:
-            result = self.api.submit_order(
+            return self.client.call(
+                'submit_order',
                 order.ticker,
                 order.quantity,
                 'buy' if order.is_buy else 'sell',
-                order.order_type.value,
+                _order_type(order.order_type),
                 'day',
                 limit_price=order.limit_price,
-                stop_price=order.stop_price   
+                stop_price=order.stop_price,
+                **exits
             )
-            order.order_id = result.id
-            self.pending_orders[result.id] = order
-            return True
-
         except Exception:
             logger.exception(f'Failed to place order for {order.quantity} {order.ticker}')
+            return None
+
+    def _record(self, order: Order, result) -> bool:
+        if result is None:
             return False
+        order.order_id = result.id
+        submitted = getattr(result, 'submitted_at', None)
+        submitted = _timestamp(submitted).isoformat() if submitted else datetime.now(timezone.utc).isoformat()
+        self.journal.record_placed(order, submitted)
+
+        # Exits are separate orders at Alpaca and fill on their own
+        order.legs = [_to_order(leg) for leg in getattr(result, 'legs', None) or []]
+        for leg in order.legs:
+            self.journal.record_placed(leg, submitted)
+        return True
 
     def cancel_order(self, order_id):
         logger.info(f'Canceling order {order_id}')
         try:
-            self.api.cancel_order(order_id)
-            self.pending_orders.pop(order_id, None)
+            self.client.call('cancel_order', order_id)
+            # The order stays open until Alpaca reports it closed since it may have
+            # partially filled before the cancel went through
             return True
         except Exception:
             logger.exception(f'Failed to cancel order {order_id}')
             return False
 
     def market_open(self):
-        clock = self.api.get_clock()
-        return clock.is_open # TODO - we also have open/close times. May want to avoid holding overnight
+        clock = self.client.call('get_clock')
+        return clock.is_open
+
+    def get_calendar(self, start, end):
+        days = self.client.call('get_calendar', start=start.isoformat(), end=end.isoformat())
+        sessions = []
+        for day in days:
+            date = day.date.date()
+            sessions.append(Session(
+                date,
+                datetime.combine(date, day.open, MARKET_TIMEZONE),
+                datetime.combine(date, day.close, MARKET_TIMEZONE)
+            ))
+        return sessions
 
     def open_orders(self):
         return [order for order in self.pending_orders.values()]
 
     def ticker_exists(self, ticker):
+        if ticker in self.cached_tickers:
+            return self.cached_tickers[ticker]
         try:
-            if ticker in self.cached_tickers:
-                return self.cached_tickers[ticker]
-            asset = self.api.get_asset(ticker)
-            self.cached_tickers[ticker] = asset.tradable
-            return asset.tradable
-        except:
+            asset = self.client.call('get_asset', ticker)
+        except Exception as e:
+            if not not_found(e):
+                # Transient failures aren't remembered, so the ticker is asked about again
+                logger.warning(f'Failed to look up {ticker}: {e}')
+                return False
             self.cached_tickers[ticker] = False
+            self.new_tickers = True
             return False
+        self.cached_tickers[ticker] = asset.tradable
+        self.new_tickers = True
+        return asset.tradable
@@ -0,0 +1,225 @@
+import logging
+import random
+import threading
+import time
+import typing
+
+import requests
+
+from biggygains.metrics.registry import NullRegistry
+
+logger = logging.getLogger('BrokerClient')
+
+# Alpaca allows 200 requests per minute per account
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 10
+
+
+"""
+Token bucket rate limiter. Tokens refill continuously at rate per second up to
+burst, and acquire() blocks until one is available. Safe to share between threads
+"""
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting for one if needed, and returns the time spent waiting.
+        Tokens are reserved in arrival order so waiters can't starve each other
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+"""
+Collapses concurrent identical calls into one. The first caller for a key runs the
+call and every caller that arrives while it is in flight gets the same result or
+exception
+"""
+class SingleFlight:
+    class _Flight:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func: typing.Callable[[], typing.Any]) -> typing.Tuple[typing.Any, bool]:
+        """
+        Returns the result and whether it was shared from another caller's flight
+        """
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = SingleFlight._Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+def _status(error: Exception) -> typing.Optional[int]:
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def not_found(error: Exception) -> bool:
+    """
+    Whether the broker rejected the request because what it names doesn't exist
+    """
+
+    return _status(error) == 404
+
+
+def _retry_after(error: Exception) -> typing.Optional[float]:
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers['Retry-After'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+"""
+Shared front end for a broker REST client such as alpaca_trade_api.REST. Every call
+goes through one token bucket so all components share the account's rate budget,
+and through the client's single pooled HTTP session. Concurrent identical read
+calls are coalesced into one request. Failed calls are retried with jittered
+exponential backoff, honoring Retry-After, when it is safe to do so: reads are
+retried on connection errors, throttling, and server errors, while writes are only
+retried when the request was throttled or never connected, since a write that
+reached the server may have taken effect
+"""
+class BrokerClient:
+    READ_PREFIXES = ('get_', 'list_')
+
+    def __init__(self, api, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, retries: int = 4, backoff: float = 0.5, max_backoff: float = 30):
+        self.api = api
+        self.bucket = TokenBucket(rate, burst)
+        self.flights = SingleFlight()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bind_metrics(NullRegistry())
+
+    def bind_metrics(self, metrics):
+        self.metrics = metrics
+        self._coalesced = metrics.counter('broker_coalesced_total', 'Broker calls served by an identical in flight call')
+        self._retried = metrics.counter('broker_retries_total', 'Broker calls retried after a failure')
+        self._throttled = metrics.histogram('broker_rate_limit_wait_seconds', 'Time broker calls waited for the rate limiter')
+
+    def call(self, name: str, *args, **kwargs):
+        """
+        Calls the named client method with the given arguments
+        """
+
+        if not name.startswith(BrokerClient.READ_PREFIXES):
+            return self._call(name, args, kwargs, False)
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return self._call(name, args, kwargs, True)
+        result, shared = self.flights.do(key, lambda: self._call(name, args, kwargs, True))
+        if shared:
+            self._coalesced.inc()
+        return result
+
+    def _call(self, name, args, kwargs, is_read):
+        method = getattr(self.api, name)
+        attempt = 0
+        while True:
+            self._throttled.observe(self.bucket.acquire())
+            try:
+                with self.metrics.timer('alpaca_rest_seconds', 'Latency of Alpaca REST calls', call=name):
+                    return method(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries or not self._retryable(e, is_read):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1)
+                attempt += 1
+                self._retried.inc()
+                logger.warning(f'{name} failed ({e}), retrying in {delay:.2f}s ({attempt}/{self.retries})')
+                time.sleep(delay)
+
+    @staticmethod
+    def _retryable(error: Exception, is_read: bool) -> bool:
+        status = _status(error)
+        if status == 429:
+            return True
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if not is_read:
+            return False
+        if status is not None:
+            return status >= 500
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def alpaca_client(key: str, secret: str, endpoint: str, pool_size: int = 10, **kwargs) -> BrokerClient:
+    """
+    Returns the BrokerClient for the given Alpaca credentials, creating it on first
+    use. Every component using the same account shares one client, and with it one
+    rate budget and connection pool. Keyword arguments configure a new client
+    """
+
+    with _clients_lock:
+        client = _clients.get((key, secret, endpoint))
+        if client is None:
+            from alpaca_trade_api import REST as Alpaca
+
+            api = Alpaca(key, secret, endpoint)
+            api._retry = 0 # Retries are handled by BrokerClient
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+            api._session.mount('https://', adapter)
+            api._session.mount('http://', adapter)
+            client = _clients[(key, secret, endpoint)] = BrokerClient(api, **kwargs)
+        return client
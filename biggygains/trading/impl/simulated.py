@@ -0,0 +1,84 @@
+import itertools
+import logging
+
+from biggygains.trading.interface import TradeInterface
+from biggygains.trading.stock import Order, OrderType, OrderClass, ExecutedOrder, Quote
+from biggygains.environment.interface import Environment
+
+logger = logging.getLogger('SimulatedTradeInterface')
+
+
+def _match(order: Order, quote: Quote):
+    """
+    Returns the price the order fills at against the quote, or None if it doesn't
+    """
+
+    if order.order_type in (OrderType.Stop, OrderType.StopLimit):
+        triggered = quote.ask >= order.stop_price if order.is_buy else quote.bid <= order.stop_price
+        if not triggered:
+            return None
+        if order.order_type == OrderType.Stop:
+            return quote.ask if order.is_buy else quote.bid
+        # Once triggered a stop limit rests as a limit order
+        order.order_type = OrderType.Limit
+        order.stop_price = None
+
+    if order.order_type == OrderType.Market:
+        return quote.ask if order.is_buy else quote.bid
+    # Resting limits fill at their own price once the far side of the quote reaches
+    # them, and marketable limits at the quote
+    if order.is_buy:
+        return min(order.limit_price, quote.ask) if quote.ask <= order.limit_price else None
+    return max(order.limit_price, quote.bid) if quote.bid >= order.limit_price else None
+
+
+"""
+Matches orders against the environment's quotes instead of sending them anywhere.
+Open orders are checked once per update and fill in full when the quote allows.
+Market orders fill at the far side of the quote, and limit orders once the far side
+reaches their price. Useful for testing execution logic and for paper runs without
+a broker account. The market is always open and every ticker exists
+"""
+class SimulatedTradeInterface(TradeInterface):
+    def __init__(self, cash: float = 100000):
+        self.cash = cash
+        self.pending = {}
+        self.ids = itertools.count(1)
+
+    def initialize(self, env: Environment) -> bool:
+        env.get_portfolio().cash = self.cash
+        return True
+
+    def update(self, env: Environment):
+        for order in list(self.pending.values()):
+            quote = env.get_quote(order.ticker)
+            if quote is None:
+                continue
+            price = _match(order, quote)
+            if price is None:
+                continue
+            del self.pending[order.order_id]
+            env.notify_order_completed(ExecutedOrder(order.ticker, order.quantity, price, order.is_buy, order_id=order.order_id))
+
+    def place_order(self, order: Order) -> bool:
+        if order.order_class != OrderClass.Simple:
+            logger.error(f'{order.order_class.value} orders are not supported by the simulator')
+            return False
+        order.order_id = f'sim-{next(self.ids)}'
+        self.pending[order.order_id] = order
+        return True
+
+    def cancel_order(self, order_id) -> bool:
+        return self.pending.pop(order_id, None) is not None
+
+    def market_open(self) -> bool:
+        return True
+
+    def get_calendar(self, start, end):
+        return []
+
+    def open_orders(self):
+        return list(self.pending.values())
+
+    def ticker_exists(self, ticker) -> bool:
+        return True
@@ -1,10 +1,13 @@
 from __future__ import annotations # Non runtime type checking
 
+import datetime
 import logging
 import typing
 
 if typing.TYPE_CHECKING:
     from biggygains.environment.interface import Environment
+    from biggygains.trading.calendar import Session
+    from biggygains.trading.bars import Bars, Timeframe
 
 logger = logging.getLogger('Trading.interface')
 
@@ -23,16 +26,26 @@ class PricingSource:
         logger.warning(f'initialize() is unimplemented in {type(self).__name__}')
         return False
 
-    def get_equity(self, ticker) -> Stock:
+    def get_equity(self, ticker, start: datetime.date = None, end: datetime.date = None) -> Stock:
         """
-        Fetch and return the entire metadata set for a given ticker. Additional
-        keyword arguments may be passed to custom sources to get different 
-        information, such as historical time ranges
+        Fetch and return the entire metadata set for a given ticker, with daily
+        history from start through end. Sources pick a default range when they are
+        not given. Additional keyword arguments may be passed to custom sources to
+        get different information
         """
 
         logger.warning(f'get_equity() is unimplemented in {type(self).__name__}')
         pass
 
+    def get_bars(self, ticker, timeframe: Timeframe, start: datetime.date, end: datetime.date) -> Bars:
+        """
+        Fetch and return price bars of the given timeframe for the dates start
+        through end inclusive
+        """
+
+        logger.warning(f'get_bars() is unimplemented in {type(self).__name__}')
+        pass
+
     def get_quote(self, ticker) -> Quote:
         """
         Fetch and return a single quote for the given ticker
@@ -74,6 +87,14 @@ class TradeInterface:
         logger.warning(f'place_order() is unimplemented in {type(self).__name__}')
         return False
 
+    def place_orders(self, orders: typing.List[Order]) -> typing.List[bool]:
+        """
+        Place a basket of orders, returning whether each was placed in the same
+        order. Interfaces that can submit concurrently should override this
+        """
+
+        return [self.place_order(order) for order in orders]
+
     def cancel_order(self, order_id) -> bool:
         """
         Cancels an open order and returns True if canceled, False if unable or not found
@@ -98,6 +119,16 @@ class TradeInterface:
         logger.warning(f'open_orders() is unimplemented in {type(self).__name__}')
         return []
 
+    def get_calendar(self, start: datetime.date, end: datetime.date) -> typing.List[Session]:
+        """
+        Returns the market sessions between start and end inclusive. The environment
+        caches these to answer market status without calling market_open(). An
+        empty list means the calendar is not supported
+        """
+
+        logger.warning(f'get_calendar() is unimplemented in {type(self).__name__}')
+        return []
+
     def ticker_exists(self, ticker) -> bool:
         """
         Tests whether the given ticker is valid
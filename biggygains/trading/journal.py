@@ -0,0 +1,202 @@
+import collections
+import logging
+import typing
+
+from biggygains import codec
+from biggygains.datastore.interface import Datastore
+from biggygains.trading.portfolio import Portfolio, Position
+from biggygains.trading.stock import Order, OrderType, OrderClass, ExecutedOrder
+
+logger = logging.getLogger('OrderJournal')
+
+# Checkpoints hold the portfolio as [cash, ticker, qty, avg_price, current_price, ...]
+# and open orders as flat rows of their fields. Entries are small dicts
+CHECKPOINT_KIND = 'journal_checkpoint'
+CHECKPOINT_VERSION = 3
+ENTRY_KIND = 'journal_entry'
+ENTRY_VERSION = 2
+
+
+def _portfolio_rows(portfolio: Portfolio) -> list:
+    rows = [portfolio.cash]
+    for p in portfolio.positions.values():
+        rows += (p.ticker, p.qty, p.avg_price, p.current_price)
+    return rows
+
+
+def _order_rows(orders: typing.Iterable[Order]) -> list:
+    rows = []
+    for o in orders:
+        rows += (
+            o.ticker, o.order_type.value, o.quantity, o.is_buy, o.order_id, o.limit_price, o.stop_price,
+            o.order_class.value, o.take_profit_price, o.stop_loss_price, o.stop_loss_limit_price
+        )
+    return rows
+
+
+def _orders_from_rows(rows: list) -> typing.Dict[typing.Any, Order]:
+    return {
+        rows[i + 4]: Order(
+            rows[i], OrderType(rows[i + 1]), rows[i + 2], rows[i + 3], order_id=rows[i + 4],
+            limit_price=rows[i + 5], stop_price=rows[i + 6], order_class=OrderClass(rows[i + 7]),
+            take_profit_price=rows[i + 8], stop_loss_price=rows[i + 9], stop_loss_limit_price=rows[i + 10]
+        )
+        for i in range(0, len(rows), 11)
+    }
+
+
+def _migrate_checkpoint_v1(data: dict) -> dict:
+    # v1 was JSON with the portfolio and orders in their to_dict() forms
+    data['portfolio'] = _portfolio_rows(Portfolio.from_dict(data['portfolio']))
+    fields = ('ticker', 'order_type', 'quantity', 'is_buy', 'order_id', 'limit_price', 'stop_price')
+    data['pending'] = [order[field] for order in data['pending'] for field in fields]
+    return data
+
+
+def _migrate_checkpoint_v2(data: dict) -> dict:
+    # v3 added the order class and exit prices to open orders
+    rows = data['pending']
+    data['pending'] = [field for i in range(0, len(rows), 7) for field in rows[i:i + 7] + [OrderClass.Simple.value, None, None, None]]
+    return data
+
+
+codec.register_migration(CHECKPOINT_KIND, 1, _migrate_checkpoint_v1)
+codec.register_migration(CHECKPOINT_KIND, 2, _migrate_checkpoint_v2)
+codec.register_migration(ENTRY_KIND, 1, lambda entry: entry)
+
+
+"""
+Write ahead journal of order activity kept in a datastore. Every placement, fill,
+and close is written as its own entry before it is acted on, and the full state is
+periodically checkpointed so entries before the checkpoint can be dropped. Loading
+replays the entries after the last checkpoint to rebuild the portfolio and the set
+of open orders exactly as they were, without asking the broker.
+
+Fills are deduplicated by order id. A fill is only applied for an order that is
+still open in the journal, and ids of recently closed orders are remembered so a
+fill reported twice is ignored
+"""
+class OrderJournal:
+    CHECKPOINT_KEY = 'checkpoint'
+    ENTRY_PREFIX = 'entry/'
+
+    def __init__(self, datastore: Datastore, checkpoint_every: int = 100, closed_history: int = 1000):
+        self.datastore = datastore
+        self.checkpoint_every = checkpoint_every
+        self.closed_history = closed_history
+        self.portfolio = Portfolio(0)
+        self.pending = {}
+        self.submitted = {}
+        self.closed = collections.OrderedDict()
+        self.seq = 0
+        self.checkpoint_seq = 0
+
+    def load(self) -> bool:
+        """
+        Rebuilds state from the last checkpoint and the entries written after it.
+        Returns False if there is no checkpoint to load
+        """
+
+        stored = self.datastore.retrieve_data(OrderJournal.CHECKPOINT_KEY)
+        if not stored:
+            return False
+        checkpoint = codec.unpack(CHECKPOINT_KIND, CHECKPOINT_VERSION, stored)
+        rows = checkpoint['portfolio']
+        self.portfolio = Portfolio(rows[0], [Position(*rows[i:i + 4]) for i in range(1, len(rows), 4)])
+        self.pending = _orders_from_rows(checkpoint['pending'])
+        self.submitted = checkpoint['submitted']
+        self.closed = collections.OrderedDict((order_id, True) for order_id in checkpoint['closed'])
+        self.seq = self.checkpoint_seq = checkpoint['seq']
+
+        entries = self.datastore.scan_prefix(OrderJournal.ENTRY_PREFIX)
+        replayed = 0
+        for key in sorted(entries):
+            seq = int(key[len(OrderJournal.ENTRY_PREFIX):])
+            if seq <= self.checkpoint_seq:
+                continue # Written before a checkpoint that was saved but not yet trimmed
+            self._apply(codec.unpack(ENTRY_KIND, ENTRY_VERSION, entries[key]), replaying=True)
+            self.seq = seq
+            replayed += 1
+        logger.info(f'Loaded checkpoint {self.checkpoint_seq} and replayed {replayed} entries. {len(self.pending)} orders open')
+        return True
+
+    def record_placed(self, order: Order, submitted_at: str):
+        self._write({'type': 'placed', 'order': order.to_dict(), 'submitted_at': submitted_at})
+
+    def record_fill(self, fill: ExecutedOrder) -> bool:
+        """
+        Records a fill for an open order. Returns False without recording anything
+        if the order is not open, which means the fill was already applied
+        """
+
+        if fill.order_id not in self.pending:
+            if fill.order_id in self.closed:
+                logger.warning(f'Ignoring duplicate fill for order {fill.order_id}')
+            else:
+                logger.warning(f'Ignoring fill for unknown order {fill.order_id}')
+            return False
+        self._write({'type': 'fill', 'fill': fill.to_dict()})
+        return True
+
+    def record_closed(self, order_id):
+        if order_id in self.pending:
+            self._write({'type': 'closed', 'order_id': order_id})
+
+    def checkpoint(self, portfolio: Portfolio):
+        """
+        Saves the full state and drops the entries it covers. The portfolio is taken
+        from the caller since the journal only tracks it while replaying
+        """
+
+        self.datastore.store_data(OrderJournal.CHECKPOINT_KEY, codec.pack(CHECKPOINT_KIND, CHECKPOINT_VERSION, {
+            'seq': self.seq,
+            'portfolio': _portfolio_rows(portfolio),
+            'pending': _order_rows(self.pending.values()),
+            'submitted': self.submitted,
+            'closed': list(self.closed)
+        }))
+        self.datastore.delete_many([self._key(seq) for seq in range(self.checkpoint_seq + 1, self.seq + 1)])
+        self.checkpoint_seq = self.seq
+
+    def checkpoint_due(self) -> bool:
+        return self.seq - self.checkpoint_seq >= self.checkpoint_every
+
+    def oldest_pending(self) -> typing.Optional[str]:
+        """
+        Submission time of the oldest open order, as an ISO 8601 string
+        """
+
+        return min(self.submitted.values()) if self.submitted else None
+
+    def _key(self, seq: int) -> str:
+        return f'{OrderJournal.ENTRY_PREFIX}{seq:012d}'
+
+    def _write(self, entry: dict):
+        self.seq += 1
+        self.datastore.store_data(self._key(self.seq), codec.pack(ENTRY_KIND, ENTRY_VERSION, entry))
+        self._apply(entry)
+
+    def _apply(self, entry: dict, replaying: bool = False):
+        kind = entry['type']
+        if kind == 'placed':
+            order = Order.from_dict(entry['order'])
+            self.pending[order.order_id] = order
+            self.submitted[order.order_id] = entry['submitted_at']
+        elif kind == 'fill':
+            fill = ExecutedOrder.from_dict(entry['fill'])
+            # Live fills are applied to the portfolio by the environment
+            if replaying:
+                if fill.is_buy:
+                    self.portfolio._buy(fill.ticker, fill.quantity, fill.avg_price)
+                else:
+                    self.portfolio._sell(fill.ticker, fill.quantity, fill.avg_price)
+            self._close(fill.order_id)
+        elif kind == 'closed':
+            self._close(entry['order_id'])
+
+    def _close(self, order_id):
+        self.pending.pop(order_id, None)
+        self.submitted.pop(order_id, None)
+        self.closed[order_id] = True
+        while len(self.closed) > self.closed_history:
+            self.closed.popitem(last=False)
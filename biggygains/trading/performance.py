@@ -0,0 +1,221 @@
+import datetime
+import logging
+import typing
+
+import numpy as np
+
+from biggygains.trading.portfolio import Portfolio
+from biggygains.trading.stock import ExecutedOrder
+
+logger = logging.getLogger('PerformanceRecorder')
+
+# 252 sessions of 6.5 hours, used to annualize when samples only cover market hours
+TRADING_SECONDS_PER_YEAR = 252 * 6.5 * 3600
+
+
+def _grow(array: np.ndarray, rows: int) -> np.ndarray:
+    grown = np.zeros((rows,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+"""
+Records portfolio value, cash, exposure, and per ticker position value each time it
+is sampled, along with every fill, into preallocated numpy arrays that double in
+size as they fill up. Sampling is O(positions) and every statistic is computed over
+whole columns at once, so analytics over months of minute samples take
+milliseconds. Statistics cover everything recorded
+"""
+class PerformanceRecorder:
+    def __init__(self, capacity: int = 4096):
+        self.count = 0
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.cash = np.zeros(capacity)
+        self.exposure = np.zeros(capacity)
+        self.tickers = []
+        self.columns = {}
+        self.positions = np.zeros((capacity, 16))
+
+        self.fill_count = 0
+        self.fill_times = np.zeros(capacity)
+        self.fill_tickers = np.zeros(capacity, dtype=np.int64)
+        self.fill_qty = np.zeros(capacity)
+        self.fill_prices = np.zeros(capacity)
+
+    def _column(self, ticker) -> int:
+        column = self.columns.get(ticker)
+        if column is None:
+            column = self.columns[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+            if column == self.positions.shape[1]:
+                self.positions = _grow(self.positions.T, column * 2).T.copy()
+        return column
+
+    def sample(self, time: datetime.datetime, portfolio: Portfolio):
+        """
+        Records the portfolio as of time, valued at its positions' current prices
+        """
+
+        if self.count == len(self.times):
+            size = self.count * 2
+            self.times, self.values, self.cash, self.exposure = (
+                _grow(a, size) for a in (self.times, self.values, self.cash, self.exposure)
+            )
+            self.positions = _grow(self.positions, size)
+
+        i = self.count
+        exposure = 0.0
+        for position in portfolio.positions.values():
+            column = self._column(position.ticker) # May replace self.positions
+            value = position.value()
+            self.positions[i, column] = value
+            exposure += abs(value)
+        self.times[i] = time.timestamp()
+        self.cash[i] = portfolio.cash
+        self.exposure[i] = exposure
+        self.values[i] = portfolio.value()
+        self.count += 1
+
+    def record_fill(self, time: datetime.datetime, fill: ExecutedOrder):
+        if self.fill_count == len(self.fill_times):
+            size = self.fill_count * 2
+            self.fill_times, self.fill_tickers, self.fill_qty, self.fill_prices = (
+                _grow(a, size) for a in (self.fill_times, self.fill_tickers, self.fill_qty, self.fill_prices)
+            )
+
+        i = self.fill_count
+        self.fill_times[i] = time.timestamp()
+        self.fill_tickers[i] = self._column(fill.ticker)
+        self.fill_qty[i] = fill.quantity if fill.is_buy else -fill.quantity
+        self.fill_prices[i] = fill.avg_price
+        self.fill_count += 1
+
+    def returns(self) -> np.ndarray:
+        """
+        Simple returns between consecutive samples. A step from a zero value counts
+        as no return
+        """
+
+        values = self.values[:self.count]
+        return np.divide(np.diff(values), values[:-1], out=np.zeros(max(len(values) - 1, 0)), where=values[:-1] != 0)
+
+    def sharpe(self, periods_per_year: float = None) -> float:
+        """
+        Annualized Sharpe ratio of the sample returns with no risk free rate. The
+        number of periods per year is estimated from the median sample interval
+        over trading hours if not given, and the ratio is 0 if that interval isn't
+        positive
+        """
+
+        returns = self.returns()
+        if len(returns) < 2 or not returns.std():
+            return 0.0
+        if periods_per_year is None:
+            interval = np.median(np.diff(self.times[:self.count]))
+            if interval <= 0:
+                return 0.0
+            periods_per_year = TRADING_SECONDS_PER_YEAR / interval
+        return float(returns.mean() / returns.std(ddof=1) * np.sqrt(periods_per_year))
+
+    def drawdowns(self) -> np.ndarray:
+        """
+        Fraction below the running peak value at each sample
+        """
+
+        values = self.values[:self.count]
+        return 1 - values / np.maximum.accumulate(values)
+
+    def max_drawdown(self) -> float:
+        return float(self.drawdowns().max()) if self.count else 0.0
+
+    def turnover(self) -> float:
+        """
+        Traded notional over the mean portfolio value
+        """
+
+        if not self.count:
+            return 0.0
+        notional = np.abs(self.fill_qty[:self.fill_count] * self.fill_prices[:self.fill_count]).sum()
+        return float(notional / self.values[:self.count].mean())
+
+    def attribution(self) -> typing.Dict[str, float]:
+        """
+        Profit and loss of each ticker from the first sample to the last: the change
+        in its position value less the net cash spent trading it in between
+        """
+
+        if not self.count:
+            return {}
+        first, last = self.times[0], self.times[self.count - 1]
+        n = len(self.tickers)
+        fills = slice(0, self.fill_count)
+        window = (self.fill_times[fills] > first) & (self.fill_times[fills] <= last)
+        spent = np.bincount(
+            self.fill_tickers[fills][window],
+            weights=(self.fill_qty[fills] * self.fill_prices[fills])[window],
+            minlength=n
+        )
+        pnl = self.positions[self.count - 1, :n] - self.positions[0, :n] - spent
+        return dict(zip(self.tickers, pnl.tolist()))
+
+    def summary(self) -> dict:
+        return {
+            'samples': self.count,
+            'fills': self.fill_count,
+            'start_value': float(self.values[0]) if self.count else None,
+            'end_value': float(self.values[self.count - 1]) if self.count else None,
+            'sharpe': self.sharpe(),
+            'max_drawdown': self.max_drawdown(),
+            'turnover': self.turnover()
+        }
+
+    def to_csv(self, path: str):
+        """
+        Writes one row per sample: epoch time, value, cash, exposure, and the position
+        value of every ticker
+        """
+
+        n = self.count
+        table = np.column_stack([self.times[:n], self.values[:n], self.cash[:n], self.exposure[:n], self.positions[:n, :len(self.tickers)]])
+        np.savetxt(path, table, delimiter=',', fmt='%.10g', header=','.join(['time', 'value', 'cash', 'exposure'] + self.tickers), comments='')
+
+    def save(self, path: str):
+        """
+        Saves every recorded array to a .npz file that load() restores
+        """
+
+        n, f = self.count, self.fill_count
+        np.savez_compressed(
+            path,
+            times=self.times[:n],
+            values=self.values[:n],
+            cash=self.cash[:n],
+            exposure=self.exposure[:n],
+            positions=self.positions[:n, :len(self.tickers)],
+            tickers=np.array(self.tickers, dtype=str),
+            fill_times=self.fill_times[:f],
+            fill_tickers=self.fill_tickers[:f],
+            fill_qty=self.fill_qty[:f],
+            fill_prices=self.fill_prices[:f]
+        )
+
+    @staticmethod
+    def load(path: str) -> 'PerformanceRecorder':
+        with np.load(path) as data:
+            recorder = PerformanceRecorder(max(1, len(data['times'])))
+            recorder.count = len(data['times'])
+            for name in ('times', 'values', 'cash', 'exposure'):
+                getattr(recorder, name)[:recorder.count] = data[name]
+            recorder.tickers = data['tickers'].tolist()
+            recorder.columns = {ticker: i for i, ticker in enumerate(recorder.tickers)}
+            recorder.positions = np.zeros((len(recorder.times), max(16, len(recorder.tickers))))
+            recorder.positions[:recorder.count, :len(recorder.tickers)] = data['positions']
+
+            recorder.fill_count = len(data['fill_times'])
+            size = max(1, recorder.fill_count)
+            for name in ('fill_times', 'fill_tickers', 'fill_qty', 'fill_prices'):
+                array = np.zeros(size, dtype=data[name].dtype)
+                array[:recorder.fill_count] = data[name]
+                setattr(recorder, name, array)
+        return recorder
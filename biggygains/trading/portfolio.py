@@ -10,6 +10,8 @@ positions are supported. Negative share quantities could represent short
 positions, but Portfolio does not support them
 """
 class Position:
+    __slots__ = ('ticker', 'qty', 'avg_price', 'current_price')
+
     def __init__(self, ticker, qty, avg_price, current_price):
         self.ticker = ticker
         self.qty = qty
@@ -28,6 +30,18 @@ class Position:
     def _update_price(self, new_price):
         self.current_price = new_price
 
+    def to_dict(self) -> dict:
+        return {
+            'ticker': self.ticker,
+            'qty': self.qty,
+            'avg_price': self.avg_price,
+            'current_price': self.current_price
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Position':
+        return Position(data['ticker'], data['qty'], data['avg_price'], data['current_price'])
+
     def _sell(self, qty):
         self.qty -= qty
 
@@ -52,6 +66,18 @@ class Portfolio:
     def __init__(self, cash, positions: typing.List[Position] = []):
         self.cash = cash
         self.positions = {}
+        for position in positions:
+            self._add_position(position)
+
+    def to_dict(self) -> dict:
+        return {
+            'cash': self.cash,
+            'positions': [pos.to_dict() for pos in self.positions.values()]
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Portfolio':
+        return Portfolio(data['cash'], [Position.from_dict(pos) for pos in data['positions']])
 
     def _add_position(self, position: Position):
         if position.ticker not in self.positions:
@@ -13,6 +13,8 @@ A basic quote for a stock. Includes bid, ask, and mid prices, as well as current
 volume and quote time
 """
 class Quote:
+    __slots__ = ('bid', 'ask', 'mid', 'volume', 'time')
+
     def __init__(self, bid, ask, volume, time: datetime.datetime):
         self.bid = bid
         self.ask = ask
@@ -20,17 +22,42 @@ class Quote:
         self.volume = volume
         self.time = time
 
+    def to_dict(self) -> dict:
+        return {
+            'bid': self.bid,
+            'ask': self.ask,
+            'volume': self.volume,
+            'time': self.time.isoformat()
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Quote':
+        return Quote(data['bid'], data['ask'], data['volume'], datetime.datetime.fromisoformat(data['time']))
+
 
 """
 Represents a past trading day for a particular stock. Holds information 
 about the open and close, as well as the trade date
 """
 class TradingDay:
+    __slots__ = ('date', 'open', 'close')
+
     def __init__(self, date: datetime.date, open_: Quote, close: Quote):
         self.date = date
         self.open = open_
         self.close = close
 
+    def to_dict(self) -> dict:
+        return {
+            'date': self.date.isoformat(),
+            'open': self.open.to_dict(),
+            'close': self.close.to_dict()
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'TradingDay':
+        return TradingDay(datetime.date.fromisoformat(data['date']), Quote.from_dict(data['open']), Quote.from_dict(data['close']))
+
 
 """
 Represents metadata about a particular equity. Holds ticker, current quote,
@@ -45,6 +72,7 @@ class Stock:
         Optional keyword arguments:
             timeseries: List of quotes containing granular time and price info
             history: List of TradingDay for previous trading days
+            bars: Daily Bars for previous trading days
             pe: P/E ratio of the company
             eps: Earnings per share of the company
             low: 52 week low
@@ -55,7 +83,8 @@ class Stock:
         self.ticker = ticker
         self.quote = quote
         self.timeseries = kwargs['timeseries'] if 'timeseries' in kwargs else [quote]
-        self.history = kwargs['hist'] if 'hist' in kwargs else []
+        self.history = kwargs['history'] if 'history' in kwargs else []
+        self.bars = kwargs['bars'] if 'bars' in kwargs else None
         self.pe = kwargs['pe'] if 'pe' in kwargs else 0
         self.eps = kwargs['eps'] if 'eps' in kwargs else 0
         self.low = kwargs['low'] if 'low' in kwargs else 0
@@ -72,12 +101,28 @@ TradeInterface when orders are successfully executed and are processed by Enviro
 to keep local book information up to date
 """
 class ExecutedOrder:
-    def __init__(self, ticker, quantity, avg_price, is_buy):
+    __slots__ = ('ticker', 'quantity', 'avg_price', 'is_buy', 'is_sell', 'order_id')
+
+    def __init__(self, ticker, quantity, avg_price, is_buy, order_id=None):
         self.ticker = ticker
         self.quantity = quantity
         self.avg_price = avg_price
         self.is_buy = is_buy
         self.is_sell = not is_buy
+        self.order_id = order_id
+
+    def to_dict(self) -> dict:
+        return {
+            'ticker': self.ticker,
+            'quantity': self.quantity,
+            'avg_price': self.avg_price,
+            'is_buy': self.is_buy,
+            'order_id': self.order_id
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'ExecutedOrder':
+        return ExecutedOrder(data['ticker'], data['quantity'], data['avg_price'], data['is_buy'], order_id=data['order_id'])
 
 
 """
@@ -92,9 +137,29 @@ class OrderType(enum.Enum):
 
 
 """
-Basic representation of an order that may be placed and executed
+Enumeration of order classes. Bracket orders attach a take profit and a stop loss
+exit to an entry, OTO attaches one of the two, and OCO places a take profit limit
+order with a stop loss so that whichever fills first cancels the other
+"""
+class OrderClass(enum.Enum):
+    Simple = 'simple'
+    Bracket = 'bracket'
+    OCO = 'oco'
+    OTO = 'oto'
+
+
+"""
+Basic representation of an order that may be placed and executed. Orders of a class
+other than Simple carry the prices of their exits, and once placed, the exit orders
+created for them in legs. Orders with an execution schedule, such as a TWAP, are
+worked over time by an ExecutionEngine
 """
 class Order:
+    __slots__ = (
+        'ticker', 'order_type', 'quantity', 'is_buy', 'is_sell', 'order_id', 'limit_price', 'stop_price',
+        'order_class', 'take_profit_price', 'stop_loss_price', 'stop_loss_limit_price', 'legs', 'execution'
+    )
+
     def __init__(self, ticker, order_type: OrderType, quantity, is_buy, **kwargs):
         self.ticker = ticker
         self.order_type = order_type
@@ -104,3 +169,40 @@ class Order:
         self.order_id = kwargs['order_id'] if 'order_id' in kwargs else None
         self.limit_price = kwargs['limit_price'] if 'limit_price' in kwargs else None
         self.stop_price = kwargs['stop_price'] if 'stop_price' in kwargs else None
+        self.order_class = kwargs['order_class'] if 'order_class' in kwargs else OrderClass.Simple
+        self.take_profit_price = kwargs['take_profit_price'] if 'take_profit_price' in kwargs else None
+        self.stop_loss_price = kwargs['stop_loss_price'] if 'stop_loss_price' in kwargs else None
+        self.stop_loss_limit_price = kwargs['stop_loss_limit_price'] if 'stop_loss_limit_price' in kwargs else None
+        self.legs = []
+        self.execution = kwargs['execution'] if 'execution' in kwargs else None
+
+    def to_dict(self) -> dict:
+        return {
+            'ticker': self.ticker,
+            'order_type': self.order_type.value,
+            'quantity': self.quantity,
+            'is_buy': self.is_buy,
+            'order_id': self.order_id,
+            'limit_price': self.limit_price,
+            'stop_price': self.stop_price,
+            'order_class': self.order_class.value,
+            'take_profit_price': self.take_profit_price,
+            'stop_loss_price': self.stop_loss_price,
+            'stop_loss_limit_price': self.stop_loss_limit_price
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Order':
+        return Order(
+            data['ticker'],
+            OrderType(data['order_type']),
+            data['quantity'],
+            data['is_buy'],
+            order_id=data['order_id'],
+            limit_price=data['limit_price'],
+            stop_price=data['stop_price'],
+            order_class=OrderClass(data.get('order_class', OrderClass.Simple.value)),
+            take_profit_price=data.get('take_profit_price'),
+            stop_loss_price=data.get('stop_loss_price'),
+            stop_loss_limit_price=data.get('stop_loss_limit_price')
+        )
@@ -3,11 +3,9 @@ import logging
 import os
 import enum
 
-from biggygains.bots.interface import Bot
-from biggygains.bots.ben_sentiment import BenSentimentBot
-from biggygains.environment.interface import Environment
-from biggygains.environment.live import LiveEnvironment
-from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.registry import LazyComponent
+from biggygains.metrics.registry import MetricsRegistry
+from biggygains.metrics.export import MetricsServer, MetricsFileWriter
 
 
 """
@@ -37,12 +35,30 @@ Enum storing available datastores
 """
 class DatastoreType(enum.Enum):
     InMemory = 'memory'
-    # More. Maybe distributed Redis?
+    Redis = 'redis'
+    # More
 
     def __str__(self):
         return self.value
 
 
+# Components are imported only once selected so --help and offline runs stay fast
+BOTS = {
+    BotType.BenSentimentBot: LazyComponent('biggygains.bots.ben_sentiment', 'BenSentimentBot')
+}
+ENVIRONMENTS = {
+    EnvironmentType.Live: LazyComponent(
+        'biggygains.environment.live',
+        'LiveEnvironment',
+        required_args=['reddit_key', 'reddit_secret', 'alpaca_url', 'alpaca_key', 'alpaca_secret']
+    )
+}
+DATASTORES = {
+    DatastoreType.InMemory: LazyComponent('biggygains.datastore.memory', 'InMemoryDatastore'),
+    DatastoreType.Redis: LazyComponent('biggygains.datastore.redis', 'RedisDatastore')
+}
+
+
 def main():
     """
     This is the main entrypoint of the bot utility. It will read command line
@@ -52,18 +68,32 @@ def main():
     
     parser = argparse.ArgumentParser()
     parser.add_argument('env_type', type=EnvironmentType, choices=list(EnvironmentType), help='The name of the environment to run in')
-    parser.add_argument('bot_type', type=BotType, choices=list(BotType), help='The name of the bot to run')
+    parser.add_argument('bot_type', type=BotType, choices=list(BotType), nargs='+', help='The names of the bots to run. Bots share data feeds and trade separate sub-portfolios')
     parser.add_argument('datastore', type=DatastoreType, choices=list(DatastoreType), help='Underlying datastore to use to persist runtime data')
 
     parser.add_argument('--reddit-key', type=str, default=os.environ.get('REDDIT_KEY'), help='The key id for accessing Reddit data')
     parser.add_argument('--reddit-secret', type=str, default=os.environ.get('REDDIT_SECRET'), help='The key secret for accessing Reddit data')
     parser.add_argument('--reddit-subs', type=str, default='wallstreetbets', help='Subreddits formatted as "sub1+sub2+sub3"')
+    parser.add_argument('--sentiment-model', type=str, default=os.environ.get('SENTIMENT_MODEL'), help='Trained LinearSentimentAnalyzer model (.npz) to score comments with')
+    parser.add_argument('--analysis-cache-size', type=int, default=10000, help='Number of analyzed comments to memoize by normalized text. 0 disables the cache')
+    parser.add_argument('--drop-comment-bodies', default=False, action='store_true', help='Discard comment text once scored to reduce memory use')
+    parser.add_argument('--isolate-sentiment', default=os.environ.get('ISOLATE_SENTIMENT', '').lower() in ('1', 'true', 'yes'), action='store_true', help='Run sentiment ingestion in its own process, restarted if it crashes')
     parser.add_argument('--alpaca-url', type=str, default=os.environ.get('ALPACA_URL'), help='The Alpaca endpoint to trade through (paper vs live)')
     parser.add_argument('--alpaca-key', type=str, default=os.environ.get('ALPACA_KEY'), help='The key id for interfacing with Alpaca')
     parser.add_argument('--alpaca-secret', type=str, default=os.environ.get('ALPACA_SECRET'), help='The key secret for interfacing with Alpaca')
+    parser.add_argument('--bar-cache', type=str, default=os.environ.get('BAR_CACHE'), help='Directory to cache historical price bars in. Bars are only kept in memory without it')
 
-    # TODO - datastore parameters (connection info etc)
+    parser.add_argument('--datastore-host', type=str, default=os.environ.get('DATASTORE_HOST', 'localhost'), help='Host of the networked datastore')
+    parser.add_argument('--datastore-port', type=int, default=int(os.environ.get('DATASTORE_PORT', 6379)), help='Port of the networked datastore')
+    parser.add_argument('--datastore-password', type=str, default=os.environ.get('DATASTORE_PASSWORD'), help='Password for the networked datastore')
+    parser.add_argument('--datastore-prefix', type=str, default='biggygains:', help='Prefix for all keys in the networked datastore. Instances with the same prefix share state')
+    parser.add_argument('--datastore-notify', default=False, action='store_true', help='Publish a change notification for every key written to the networked datastore')
 
+    parser.add_argument('--metrics-port', type=int, default=None, help='Serve Prometheus metrics on this local port')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Periodically write Prometheus metrics to this file')
+    parser.add_argument('--performance-file', type=str, default=None, help='Record portfolio performance every tick and save it to this .npz or .csv file on exit')
+
+    parser.add_argument('--allocation', type=float, nargs='+', default=None, help='Fraction of account cash given to each bot, in the same order as the bots')
     parser.add_argument('--clear-datastore', default=False, action='store_true', help='Clear the datastore of all data before starting the bot')
     parser.add_argument('--log-level', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Logging verbosity')
     args = parser.parse_args()
@@ -71,51 +101,92 @@ def main():
     logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s: %(message)s', level=args.log_level)
     logger = logging.getLogger('main')
 
-    datastore = None
-    if args.datastore == DatastoreType.InMemory:
-        datastore = InMemoryDatastore()
+    if args.allocation and len(args.allocation) != len(args.bot_type):
+        parser.error(f'--allocation needs one value per bot, got {len(args.allocation)} for {len(args.bot_type)} bots')
+
+    missing = ENVIRONMENTS[args.env_type].missing_args(args)
+    if missing:
+        parser.error(f'{", ".join(missing)} required for {args.env_type} environment')
+
+    if args.datastore == DatastoreType.Redis:
+        datastore = DATASTORES[args.datastore].load()(
+            args.datastore_host,
+            args.datastore_port,
+            prefix=args.datastore_prefix,
+            password=args.datastore_password,
+            notify=args.datastore_notify
+        )
+    else:
+        datastore = DATASTORES[args.datastore].load()()
     if not datastore:
         logger.critical('Failed to initialize datastore from options')
         return
     
     env = None
     if args.env_type == EnvironmentType.Live:
-        if not args.reddit_key:
-            print('--reddit-key is required for live environment')
-        if not args.reddit_secret:
-            print('--reddit-secret is required for live environment')
-        if not args.alpaca_url:
-            print('--alpaca-url is required for live environment')
-        if not args.alpaca_key:
-            print('--alpaca-key is required for live environment')
-        if not args.alpaca_secret:
-            print('--alpaca-secret is required for live environment')
-
-        env = LiveEnvironment(
+        analyzer = None
+        if args.sentiment_model:
+            from biggygains.components.sentiment.linear import LinearSentimentAnalyzer
+            analyzer = LinearSentimentAnalyzer.load(args.sentiment_model)
+            logger.info(f'Loaded sentiment model {args.sentiment_model}')
+
+        env = ENVIRONMENTS[args.env_type].load()(
             args.reddit_key,
             args.reddit_secret,
             args.reddit_subs,
             args.alpaca_url,
             args.alpaca_key,
-            args.alpaca_secret
+            args.alpaca_secret,
+            analyzer,
+            args.analysis_cache_size,
+            not args.drop_comment_bodies,
+            args.bar_cache,
+            args.isolate_sentiment
         )
     if not env:
         logger.critical('Failed to initialize environment from options')
         return
 
-    bot = None
-    if args.bot_type == BotType.BenSentimentBot:
-        bot = BenSentimentBot()
-    if not bot:
+    bots = [BOTS[bot_type].load()() for bot_type in args.bot_type]
+    if not all(bots):
         logger.critical('Failed to initialize bot from options')
         return
 
+    exporters = []
+    if args.metrics_port is not None or args.metrics_file:
+        registry = MetricsRegistry()
+        env.set_metrics_registry(registry)
+        if args.metrics_port is not None:
+            exporters.append(MetricsServer(registry, args.metrics_port))
+        if args.metrics_file:
+            exporters.append(MetricsFileWriter(registry, args.metrics_file))
+
+    recorder = None
+    if args.performance_file:
+        from biggygains.trading.performance import PerformanceRecorder
+        recorder = PerformanceRecorder()
+        env.set_performance_recorder(recorder)
+
     env.set_datastore(datastore)
-    env.connect_bot(bot)
+    for i, bot in enumerate(bots):
+        env.connect_bot(bot, allocation=args.allocation[i] if args.allocation else None)
     if not env.initialize(args.clear_datastore):
         logger.error('Failed to run environment initialization, exiting')
         return
-    env.run()
+
+    for exporter in exporters:
+        exporter.start()
+    try:
+        env.run()
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+        if recorder:
+            if args.performance_file.endswith('.csv'):
+                recorder.to_csv(args.performance_file)
+            else:
+                recorder.save(args.performance_file)
+            logger.info(f'Performance: {recorder.summary()}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from biggygains.components.sentiment.cache import AnalysisCache, normalize
+from biggygains.components.sentiment.file import FileSentimentSource
+from biggygains.components.sentiment.stream import Post
+
+from .test_stream import FakeEnvironment, KeywordAnalyzer
+
+
+class CountingAnalyzer(KeywordAnalyzer):
+    def __init__(self):
+        self.calls = 0
+
+    def analyze(self, message):
+        self.calls += 1
+        return super().analyze(message)
+
+
+class AnalysisCacheTests(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize('  GME   🚀🚀🚀 !!  '), 'GME 🚀 !')
+        self.assertEqual(AnalysisCache.key('GME 🚀🚀'), AnalysisCache.key('GME  🚀🚀🚀'))
+        self.assertNotEqual(AnalysisCache.key('GME'), AnalysisCache.key('gme'))
+
+    def test_lru(self):
+        cache = AnalysisCache(2)
+        cache.put(b'a', 1)
+        cache.put(b'b', 2)
+        cache.get(b'a')
+        cache.put(b'c', 3)
+
+        self.assertIs(cache.get(b'b'), AnalysisCache.MISSING)
+        self.assertEqual(cache.get(b'a'), 1)
+        self.assertEqual(cache.get(b'c'), 3)
+        self.assertEqual(cache.hit_rate(), 0.75)
+
+    def test_source_uses_cache(self):
+        analyzer = CountingAnalyzer()
+        source = FileSentimentSource(analyzer, '.', cache_size=100)
+        source.env = FakeEnvironment(['GME'])
+        for i in range(10):
+            source._analyze_post(Post(str(i), 'GME to the moon 🚀' + '🚀' * i, time.time()))
+        source.update(source.env)
+
+        self.assertEqual(analyzer.calls, 1)
+        self.assertEqual(source.get_sentiment('GME')[0].confidence, 10)
+        self.assertEqual(source.cache.hits, 9)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from biggygains.components.sentiment.linear import LinearSentimentAnalyzer, hashed_features
+
+
+class LinearSentimentAnalyzerTests(unittest.TestCase):
+    def _data(self):
+        messages = ['GME to the moon 🚀', 'buying more calls', 'this is going to dump', 'puts are printing',
+                    'just holding', 'no idea what to do'] * 10
+        labels = [2, 1, -1, -2, 0, 0] * 10
+        return messages, labels
+
+    def test_features_stable(self):
+        a = hashed_features('GME to the moon', 10)
+        self.assertTrue(np.array_equal(a, hashed_features('gme TO the moon', 10)))
+        self.assertEqual(len(a), 7) # 4 unigrams and 3 bigrams
+        self.assertTrue((a < 1024).all())
+
+    def test_fit(self):
+        messages, labels = self._data()
+        model = LinearSentimentAnalyzer(bits=12)
+        model.fit(messages, labels, epochs=5)
+
+        self.assertEqual(model.analyze_batch(messages[0:6]), [1, 1, -1, -1, 0, 0])
+        self.assertEqual(model.analyze(''), model.analyze_batch([''])[0])
+
+    def test_learn_reduces_uncertainty(self):
+        model = LinearSentimentAnalyzer(bits=12)
+        before = model.uncertainty(['rockets everywhere'])[0]
+        self.assertAlmostEqual(before, 1.0, places=5)
+        for _ in range(5):
+            model.learn('rockets everywhere', 2)
+        self.assertLess(model.uncertainty(['rockets everywhere'])[0], before)
+        self.assertEqual(model.analyze('rockets everywhere'), 1)
+
+    def test_save_load(self):
+        messages, labels = self._data()
+        model = LinearSentimentAnalyzer(bits=12)
+        model.fit(messages, labels)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.npz')
+            model.save(path)
+            loaded = LinearSentimentAnalyzer.load(path)
+
+        self.assertEqual(loaded.bits, 12)
+        self.assertTrue(np.allclose(loaded.predict_proba(messages), model.predict_proba(messages)))
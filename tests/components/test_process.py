@@ -0,0 +1,122 @@
+import functools
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from biggygains.components.sentiment.interface import Sentiment
+from biggygains.components.sentiment.file import FileSentimentSource
+from biggygains.components.sentiment.process import ProcessSentimentSource, SentimentTable, RUNNING
+from biggygains.environment.events import SentimentChanged
+from tests.components.test_stream import FakeEnvironment, KeywordAnalyzer
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+class SentimentTableTests(unittest.TestCase):
+    def setUp(self):
+        self.table = SentimentTable.create(4)
+        self.addCleanup(self.table.close)
+
+    def test_round_trip(self):
+        self.table.write({'GME': [Sentiment('GME', 0.5, 4), Sentiment('GME', -1, 2)]})
+        version, rows = self.table.read()
+        self.assertEqual(rows.tolist(), [(b'GME', 0, 0.5, 4.0), (b'GME', 1, -1.0, 2.0)])
+        self.assertIsNone(self.table.read(version))
+
+        self.table.header['sequence'] += 1
+        self.assertIsNone(self.table.read())
+        self.table.reset()
+        self.assertEqual(self.table.read()[0], version)
+
+        reader = SentimentTable.attach(self.table.name, 4)
+        self.assertEqual(reader.read()[1].tolist(), rows.tolist())
+        reader.close()
+
+    def test_overflow_keeps_most_confident(self):
+        self.table.write({
+            ticker: [Sentiment(ticker, 1, confidence)] * 2
+            for ticker, confidence in [('AMC', 1), ('GME', 3), ('TSLA', 2)]
+        })
+        _, rows = self.table.read()
+        self.assertEqual([row[0] for row in rows.tolist()], [b'GME', b'GME', b'TSLA', b'TSLA'])
+
+
+class ProcessSentimentSourceTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'comments.jsonl')
+        self.write(['GME to the moon', 'GME moon', 'AMC dump'])
+        self.env = FakeEnvironment(['GME', 'AMC'])
+        self.source = ProcessSentimentSource(
+            functools.partial(FileSentimentSource, KeywordAnalyzer(), self.path, follow=True, poll_seconds=0.05),
+            update_seconds=0.05,
+            checkpoint_seconds=0,
+            restart_delay=0
+        )
+
+    def write(self, bodies):
+        with open(self.path, 'a') as f:
+            for body in bodies:
+                f.write(json.dumps({'body': body, 'id': body, 'created_utc': time.time()}) + '\n')
+
+    def test_runs_in_worker(self):
+        subscription = self.env.subscribe([SentimentChanged])
+        self.assertTrue(self.source.initialize(self.env))
+        self.assertNotEqual(self.source.process.pid, os.getpid())
+        self.assertEqual(self.source.get_sentiment('GME')[0].confidence, 2)
+        self.assertEqual(self.source.get_sentiment('AMC')[0].value, -1)
+        self.assertEqual(subscription.poll()[0].tickers, {'GME', 'AMC'})
+
+        self.write(['GME moon again'])
+        self.assertTrue(wait_for(lambda: self.source.update(self.env) or self.source.get_sentiment('GME')[0].confidence == 3))
+        self.assertEqual(subscription.poll()[0].tickers, {'GME'})
+
+        self.source.shutdown(self.env)
+        self.assertIsNotNone(self.env.datastore.retrieve_data(FileSentimentSource._DATA_PERSIST_KEY))
+
+    def test_restarts_after_crash(self):
+        self.assertTrue(self.source.initialize(self.env))
+        self.addCleanup(self.source.shutdown, self.env)
+        self.write(['GME moon again'])
+        self.assertTrue(wait_for(lambda: self.source.update(self.env) or self.source.get_sentiment('GME')[0].confidence == 3))
+        crashed = self.source.process.pid
+        version = self.source.version
+        self.assertTrue(wait_for(lambda: self.env.datastore.retrieve_data(FileSentimentSource._DATA_PERSIST_KEY) is not None))
+        self.source.process.kill()
+        self.source.process.join()
+        open(self.path, 'w').close() # Only the checkpoint can bring the comments back
+
+        self.source.update(self.env)
+        self.assertEqual(self.source.get_sentiment('GME')[0].confidence, 3)
+        self.assertTrue(wait_for(lambda: self.source.update(self.env) or (self.source.process.pid != crashed and self.source.version != version)))
+        self.assertEqual(self.source.get_sentiment('GME')[0].confidence, 3)
+        self.assertEqual(self.source.get_sentiment('AMC')[0].value, -1)
+
+    def test_worker_killed_mid_write(self):
+        self.assertTrue(self.source.initialize(self.env))
+        self.addCleanup(self.source.shutdown, self.env)
+        crashed = self.source.process.pid
+        self.source.process.kill()
+        self.source.process.join()
+        self.source.table.header['sequence'] += 1 # Left odd by the dead writer
+        self.source.table.header['version'] += 1
+
+        started = time.time()
+        self.source.update(self.env)
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(self.source.get_sentiment('GME')[0].confidence, 2)
+
+        self.write(['GME moon again'])
+        self.assertTrue(wait_for(lambda: self.source.update(self.env) or (self.source.process.pid != crashed and self.source.get_sentiment('GME')[0].confidence == 3)))
+
+    def test_failed_start(self):
+        source = ProcessSentimentSource(functools.partial(FileSentimentSource, KeywordAnalyzer(), self.path + '.missing'))
+        self.assertFalse(source.initialize(self.env))
@@ -0,0 +1,47 @@
+import time
+import unittest
+
+from biggygains.components.sentiment.reddit import RedditSentimentSource
+from biggygains.components.sentiment.replay import ReplayReddit
+from biggygains.components.sentiment.stream import Post
+
+from .test_stream import FakeEnvironment, KeywordAnalyzer
+
+
+class ReplayTests(unittest.TestCase):
+    def _posts(self, count, spacing=1):
+        return [Post(f'p{i}', 'GME moon' if i % 2 else 'AMC dump', 1000 + i * spacing) for i in range(count)]
+
+    def test_as_fast_as_possible(self):
+        api = ReplayReddit(self._posts(50), backfill=10)
+        sub = api.subreddit('wallstreetbets')
+        self.assertEqual(len(sub.new()[0].comments.list()), 10)
+        self.assertEqual(len(list(sub.stream.comments())), 40)
+
+    def test_speed(self):
+        api = ReplayReddit(self._posts(3, spacing=1), speed=20)
+        start = time.time()
+        comments = list(api.subreddit('x').stream.comments())
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        self.assertEqual([c.id for c in comments], ['p0', 'p1', 'p2'])
+        self.assertGreaterEqual(comments[0].created_utc, start)
+
+    def test_loop_unique_ids(self):
+        api = ReplayReddit(self._posts(2), loop=True)
+        stream = api.subreddit('x').stream.comments()
+        ids = [next(stream).id for _ in range(5)]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_reddit_pipeline(self):
+        env = FakeEnvironment(['GME', 'AMC'])
+        api = ReplayReddit(self._posts(40), backfill=20)
+        source = RedditSentimentSource(KeywordAnalyzer(), None, None, 'wallstreetbets', api=api, workers=2)
+        self.assertTrue(source.initialize(env))
+        self.assertEqual(source.get_sentiment('GME')[0].confidence, 10)
+
+        source.listener.join(timeout=5)
+        source.queue.join()
+        source.update(env)
+        self.assertEqual(source.get_sentiment('GME')[0].confidence, 20)
+        self.assertEqual(source.get_sentiment('AMC')[0].value, -1)
+        source.shutdown(env)
@@ -0,0 +1,246 @@
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from biggygains.components.sentiment.interface import Sentiment, SentimentAnalyzer, SentimentSource
+from biggygains.components.sentiment.file import FileSentimentSource
+from biggygains.components.sentiment.stream import extract_ticker, DayComments, Comment, Post
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.environment.events import SentimentChanged
+
+
+class FakeEnvironment(Environment):
+    def __init__(self, tickers):
+        super().__init__()
+        self.tickers = set(tickers)
+        self.datastore = InMemoryDatastore()
+
+    def ticker_exists(self, ticker):
+        return ticker in self.tickers
+
+
+class KeywordAnalyzer(SentimentAnalyzer):
+    def analyze(self, message):
+        if 'moon' in message:
+            return 1
+        if 'dump' in message:
+            return -1
+        return 0
+
+
+class ExtractTickerTests(unittest.TestCase):
+    def test_single_upper(self):
+        exists = lambda t: t in ['GME', 'AMC']
+        self.assertEqual(extract_ticker('GME to the moon', exists), 'GME')
+
+    def test_multiple_upper(self):
+        exists = lambda t: t in ['GME', 'AMC']
+        self.assertIsNone(extract_ticker('GME and AMC', exists))
+
+    def test_lowercase(self):
+        exists = lambda t: t in ['GME', 'AMC']
+        self.assertEqual(extract_ticker('buying gme today', exists), 'GME')
+
+
+class DayCommentsTests(unittest.TestCase):
+    def test_rollover(self):
+        today = datetime.date(2021, 5, 1)
+        day = DayComments(today)
+        self.assertIsNone(day.add_comment(today, Comment('a', 'x', 'GME', 1)))
+        self.assertIsNone(day.add_comment(today, Comment('b', 'x', 'GME', 0)))
+
+        agg = day.add_comment(today + datetime.timedelta(days=1), Comment('c', 'x', 'AMC', -1))
+        self.assertEqual(agg['GME'].value, 0.5)
+        self.assertEqual(agg['GME'].confidence, 2)
+        self.assertEqual(day.date, today + datetime.timedelta(days=1))
+        self.assertEqual(list(day.data.keys()), ['c'])
+
+    def test_duplicate_replaces_totals(self):
+        day = DayComments(datetime.date(2021, 5, 1))
+        day.add_comment(day.date, Comment('a', 'x', 'GME', 1))
+        day.add_comment(day.date, Comment('a', 'x', 'AMC', -1))
+        self.assertEqual(list(day.aggregate().keys()), ['AMC'])
+        self.assertEqual(day.aggregate()['AMC'].confidence, 1)
+
+    def test_round_trip(self):
+        day = DayComments(datetime.date(2021, 5, 1))
+        day.add_comment(day.date, Comment('a', 'x', 'GME', 1))
+        loaded = DayComments.from_dict(json.loads(json.dumps(day.to_dict())))
+        self.assertEqual(loaded.aggregate()['GME'].value, 1)
+
+    def test_load_legacy_json(self):
+        day = DayComments(datetime.date(2021, 5, 1))
+        day.add_comment(day.date, Comment('a', 'GME moon', 'GME', 1))
+        legacy = json.dumps({
+            'past': [{'AMC': Sentiment('AMC', -0.5, 4).to_dict()}],
+            'today': day.to_dict()
+        })
+
+        source = FileSentimentSource(KeywordAnalyzer(), '')
+        source._load_from_store(legacy)
+        self.assertEqual(source.past_days[0]['AMC'].confidence, 4)
+        self.assertEqual(source.comments.date, day.date)
+        self.assertEqual(source.comments.data['a'].comment, 'GME moon')
+
+        restored = FileSentimentSource(KeywordAnalyzer(), '')
+        restored._load_from_store(source._serialize())
+        self.assertEqual(restored.past_days[0]['AMC'].value, -0.5)
+        self.assertEqual(restored.comments.aggregate()['GME'].value, 1)
+
+
+class SnapshotTests(unittest.TestCase):
+    def test_readers_keep_their_snapshot(self):
+        source = SentimentSource()
+        source.sentiment = {'GME': [Sentiment('GME', 1, 1)]}
+        before = source.get_all_sentiment()
+        source.sentiment = {'AMC': [Sentiment('AMC', -1, 1)]}
+
+        self.assertEqual(list(before.keys()), ['GME'])
+        self.assertIsNone(source.get_sentiment('GME'))
+        self.assertEqual(source.snapshot.version, 2)
+        with self.assertRaises(TypeError):
+            before['AMC'] = ()
+
+    def test_reads_during_ingestion(self):
+        env = FakeEnvironment(['GME'])
+        source = FileSentimentSource(KeywordAnalyzer(), '')
+        source.env = env
+        source.update(env)
+        stop = threading.Event()
+        seen = []
+
+        def read():
+            while not stop.is_set():
+                sentiment = source.get_sentiment('GME')
+                if sentiment:
+                    seen.append(sentiment[0].confidence)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(2000):
+            with source.lock:
+                source._add_comment(source.comments.date, Comment(str(i), None, 'GME', 1))
+            if i % 100 == 99:
+                source.update(env)
+        stop.set()
+        reader.join()
+
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(source.get_sentiment('GME')[0].confidence, 2000)
+
+    def test_lock_released_on_error(self):
+        class BrokenSource(FileSentimentSource):
+            def _add_comment(self, date, comment):
+                raise RuntimeError('boom')
+
+        env = FakeEnvironment(['GME'])
+        source = BrokenSource(KeywordAnalyzer(), '', cache_size=0)
+        source.env = env
+        with self.assertRaises(RuntimeError):
+            source._analyze_post(Post('a', 'GME moon', time.time()))
+        self.assertFalse(source.lock.locked())
+        source.update(env)
+
+
+class FileSentimentSourceTests(unittest.TestCase):
+    def test_backfill_and_persist(self):
+        now = time.time()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'comments.jsonl')
+            with open(path, 'w') as f:
+                for i, body in enumerate(['GME to the moon', 'GME moon', 'AMC dump', 'nothing here']):
+                    f.write(json.dumps({'id': str(i), 'body': body, 'created_utc': now}) + '\n')
+
+            env = FakeEnvironment(['GME', 'AMC'])
+            source = FileSentimentSource(KeywordAnalyzer(), path, workers=3)
+            self.assertTrue(source.initialize(env))
+
+            self.assertEqual(source.get_sentiment('GME')[0].value, 1)
+            self.assertEqual(source.get_sentiment('GME')[0].confidence, 2)
+            self.assertEqual(source.get_sentiment('AMC')[0].value, -1)
+            self.assertIsNone(source.get_sentiment('TSLA'))
+
+            source.shutdown(env)
+            restored = FileSentimentSource(KeywordAnalyzer(), path)
+            restored._load_from_store(env.datastore.retrieve_data(FileSentimentSource._DATA_PERSIST_KEY))
+            restored.update(env)
+            self.assertEqual(restored.get_sentiment('GME')[0].confidence, 2)
+
+    def test_publishes_changed_tickers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'changed.json'), 'w') as f:
+                f.write(json.dumps({'x1': {'body': 'GME moon'}, 'x2': {'body': 'AMC dump'}}))
+            env = FakeEnvironment(['GME', 'AMC'])
+            subscription = env.subscribe([SentimentChanged])
+            source = FileSentimentSource(KeywordAnalyzer(), tmp)
+            self.assertTrue(source.initialize(env))
+            source.update(env)
+            source.shutdown(env)
+
+            events = subscription.poll()
+            self.assertEqual(len(events), 1)
+            self.assertEqual(events[0].tickers, {'GME', 'AMC'})
+
+    def test_drop_bodies(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'drop.json'), 'w') as f:
+                f.write(json.dumps({'x1': {'body': 'GME moon'}}))
+            env = FakeEnvironment(['GME'])
+            source = FileSentimentSource(KeywordAnalyzer(), tmp, keep_bodies=False)
+            self.assertTrue(source.initialize(env))
+
+            self.assertEqual(source.get_sentiment('GME')[0].value, 1)
+            self.assertIsNone(source.comments.data['x1'].comment)
+            self.assertFalse(hasattr(source.comments.data['x1'], '__dict__'))
+            source.shutdown(env)
+
+    def test_follow(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = FakeEnvironment(['GME'])
+            source = FileSentimentSource(KeywordAnalyzer(), tmp, follow=True, poll_seconds=0.01)
+            self.assertTrue(source.initialize(env))
+            self.assertIsNone(source.get_sentiment('GME'))
+
+            with open(os.path.join(tmp, 'drop.json'), 'w') as f:
+                f.write(json.dumps({'x1': {'body': 'GME moon'}}))
+            deadline = time.time() + 5
+            while not source.get_sentiment('GME') and time.time() < deadline:
+                time.sleep(0.01)
+                source.update(env)
+
+            self.assertEqual(source.get_sentiment('GME')[0].value, 1)
+            source.shutdown(env)
+
+    def test_follow_retries_partial_drop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = FakeEnvironment(['GME', 'AMC'])
+            source = FileSentimentSource(KeywordAnalyzer(), tmp, follow=True, poll_seconds=0.01)
+            self.assertTrue(source.initialize(env))
+
+            drop = os.path.join(tmp, 'a.json')
+            body = json.dumps({'x1': {'body': 'GME moon'}})
+            with open(drop, 'w') as f:
+                f.write(body[:10])
+            with open(os.path.join(tmp, 'b.json'), 'w') as f:
+                f.write(json.dumps({'x2': {'body': 'AMC dump'}}))
+            deadline = time.time() + 5
+            while not source.get_sentiment('AMC') and time.time() < deadline:
+                time.sleep(0.01)
+                source.update(env)
+            self.assertEqual(source.get_sentiment('AMC')[0].value, -1)
+            self.assertIsNone(source.get_sentiment('GME'))
+
+            with open(drop, 'w') as f:
+                f.write(body)
+            deadline = time.time() + 5
+            while not source.get_sentiment('GME') and time.time() < deadline:
+                time.sleep(0.01)
+                source.update(env)
+            self.assertEqual(source.get_sentiment('GME')[0].value, 1)
+            self.assertTrue(source.listener.is_alive())
+            source.shutdown(env)
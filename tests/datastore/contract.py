@@ -0,0 +1,46 @@
+"""
+Behavior shared by every Datastore backend. Mixed into a TestCase that provides
+make_store()
+"""
+class DatastoreContract:
+    def test_bytes_values(self):
+        store = self.make_store()
+        store.store_data('raw', b'\x00\x01\xffdata')
+        store.store_data('text', '\x00looks binary')
+        self.assertEqual(store.retrieve_data('raw'), b'\x00\x01\xffdata')
+        self.assertEqual(store.retrieve_data('text'), '\x00looks binary')
+
+    def test_many(self):
+        store = self.make_store()
+        self.assertTrue(store.store_many({'a': '1', 'b': b'2'}))
+        self.assertEqual(store.retrieve_many(['a', 'b', 'c']), {'a': '1', 'b': b'2', 'c': None})
+
+    def test_scan_prefix(self):
+        store = self.make_store()
+        store.store_many({'sent/a': '1', 'sent/b': '2', 'sentiment': '3', 'other': '4'})
+        self.assertEqual(store.scan_prefix('sent/'), {'sent/a': '1', 'sent/b': '2'})
+        store.store_data('sent/c', '5')
+        self.assertEqual(len(store.scan_prefix('sent')), 4)
+
+    def test_delete_many(self):
+        store = self.make_store()
+        store.store_many({'a': '1', 'b': '2'})
+        self.assertTrue(store.delete_many(['a', 'missing']))
+        self.assertEqual(store.retrieve_many(['a', 'b']), {'a': None, 'b': '2'})
+        self.assertEqual(store.scan_prefix(''), {'b': '2'})
+
+    def test_namespace(self):
+        store = self.make_store()
+        reddit = store.namespace('reddit')
+        days = reddit.namespace('days')
+        reddit.store_data('today', 'x')
+        days.store_many({'2021-05-01': b'a', '2021-05-02': b'b'})
+        store.store_data('unrelated', 'y')
+
+        self.assertEqual(store.retrieve_data('reddit/today'), 'x')
+        self.assertEqual(days.retrieve_many(['2021-05-01']), {'2021-05-01': b'a'})
+        self.assertEqual(set(reddit.scan_prefix('')), {'today', 'days/2021-05-01', 'days/2021-05-02'})
+
+        self.assertTrue(days.clear())
+        self.assertEqual(reddit.scan_prefix(''), {'today': 'x'})
+        self.assertEqual(store.retrieve_data('unrelated'), 'y')
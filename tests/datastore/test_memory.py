@@ -0,0 +1,12 @@
+import unittest
+
+from biggygains.datastore.memory import InMemoryDatastore
+
+from .contract import DatastoreContract
+
+
+class InMemoryDatastoreTests(DatastoreContract, unittest.TestCase):
+    def make_store(self):
+        store = InMemoryDatastore()
+        store.initialize()
+        return store
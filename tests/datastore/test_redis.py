@@ -0,0 +1,103 @@
+import threading
+import unittest
+
+from biggygains.datastore.redis import RedisDatastore, Connection, RespError
+from tools.kvserver.server import KVServer
+
+from .contract import DatastoreContract
+
+
+class RedisDatastoreTests(DatastoreContract, unittest.TestCase):
+    def setUp(self):
+        self.server = KVServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def store(self, **kwargs) -> RedisDatastore:
+        store = RedisDatastore('127.0.0.1', self.server.port, **kwargs)
+        self.addCleanup(store.close)
+        self.assertTrue(store.initialize())
+        return store
+
+    def make_store(self):
+        return self.store()
+
+    def test_store_retrieve(self):
+        store = self.store()
+        self.assertTrue(store.store_data('key', 'value ✓'))
+        self.assertEqual(store.retrieve_data('key'), 'value ✓')
+        self.assertIsNone(store.retrieve_data('missing'))
+
+    def test_store_many(self):
+        store = self.store()
+        self.assertTrue(store.store_many({'a': '1', 'b': '2'}))
+        self.assertEqual(store.retrieve_data('a'), '1')
+        self.assertEqual(store.retrieve_data('b'), '2')
+
+    def test_clear_only_prefix(self):
+        mine = self.store(prefix='bot[1]:')
+        other = self.store(prefix='other:')
+        for i in range(25):
+            mine.store_data(f'k{i}', 'x')
+        other.store_data('k', 'y')
+
+        self.assertTrue(mine.clear())
+        self.assertIsNone(mine.retrieve_data('k0'))
+        self.assertEqual(other.retrieve_data('k'), 'y')
+
+    def test_pool_reuse_and_reconnect(self):
+        store = self.store(pool_size=1)
+        store.store_data('a', '1')
+        self.assertEqual(len(store.pool.idle), 1)
+
+        # Server side close of an idle pooled connection is retried transparently
+        store.pool.idle[0].sock.close()
+        self.assertEqual(store.retrieve_data('a'), '1')
+
+    def test_concurrent_writers(self):
+        store = self.store(pool_size=2)
+        def write(n):
+            for i in range(50):
+                store.store_data(f'{n}-{i}', str(i))
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(store.retrieve_data('3-49'), '49')
+        self.assertLessEqual(len(store.pool.idle), 2)
+
+    def test_subscribe(self):
+        writer = self.store(notify=True)
+        reader = self.store()
+        changed = []
+        received = threading.Event()
+        def on_change(key):
+            changed.append(key)
+            if len(changed) == 3:
+                received.set()
+
+        subscription = reader.subscribe(on_change)
+        writer.store_data('a', '1')
+        writer.store_many({'b': '2', 'c': '3'})
+        self.assertTrue(received.wait(5))
+        subscription.close()
+        self.assertEqual(changed, ['a', 'b', 'c'])
+
+    def test_auth(self):
+        self.server.password = 'hunter2'
+        conn = Connection('127.0.0.1', self.server.port)
+        with self.assertRaises(RespError):
+            conn.execute('GET', 'a')
+        conn.close()
+
+        self.assertFalse(RedisDatastore('127.0.0.1', self.server.port).initialize())
+        self.store(password='hunter2')
+
+    def test_unreachable(self):
+        self.server.stop()
+        store = RedisDatastore('127.0.0.1', self.server.port, timeout=1)
+        self.assertFalse(store.initialize())
+        self.assertIsNone(store.retrieve_data('a'))
+        self.server = KVServer().start()
@@ -0,0 +1,101 @@
+import datetime
+import threading
+import unittest
+
+from biggygains.environment.events import EventBus, OrderFilled, SentimentChanged, QuoteUpdated, MarketOpened, MarketClosed
+from biggygains.trading.stock import Order, OrderType, ExecutedOrder, Quote
+
+from .test_hosted import HostedEnvironment, IdleBot
+
+
+def quote(price):
+    return Quote(price, price, 0, datetime.datetime(2021, 5, 3))
+
+
+class EventBusTests(unittest.TestCase):
+    def test_coalescing(self):
+        bus = EventBus()
+        subscription = bus.subscribe([SentimentChanged, QuoteUpdated, OrderFilled])
+        bus.publish(QuoteUpdated('GME', quote(1)))
+        bus.publish(SentimentChanged(['GME']))
+        bus.publish(OrderFilled(ExecutedOrder('GME', 1, 1, True)))
+        bus.publish(QuoteUpdated('AMC', quote(2)))
+        bus.publish(QuoteUpdated('GME', quote(3)))
+        bus.publish(SentimentChanged(['AMC']))
+
+        events = subscription.poll()
+        self.assertEqual([type(e) for e in events], [QuoteUpdated, SentimentChanged, OrderFilled, QuoteUpdated])
+        self.assertEqual(events[0].quote.mid, 3)
+        self.assertEqual(events[1].tickers, {'GME', 'AMC'})
+        self.assertEqual(subscription.poll(), [])
+
+    def test_types_and_filter(self):
+        bus = EventBus()
+        market = bus.subscribe([MarketOpened, MarketClosed])
+        big = bus.subscribe([OrderFilled], accept=lambda e: e.fill.quantity > 10)
+        bus.publish(OrderFilled(ExecutedOrder('GME', 5, 1, True)))
+        bus.publish(OrderFilled(ExecutedOrder('GME', 50, 1, True)))
+        bus.publish(MarketOpened(None))
+
+        self.assertEqual([type(e) for e in market.poll()], [MarketOpened])
+        self.assertEqual([e.fill.quantity for e in big.poll()], [50])
+
+        big.close()
+        bus.publish(OrderFilled(ExecutedOrder('GME', 50, 1, True)))
+        self.assertEqual(big.poll(), [])
+
+    def test_bounded_queue(self):
+        bus = EventBus()
+        subscription = bus.subscribe([OrderFilled], max_pending=3)
+        for i in range(5):
+            bus.publish(OrderFilled(ExecutedOrder('GME', i, 1, True)))
+        self.assertEqual([e.fill.quantity for e in subscription.poll()], [2, 3, 4])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_concurrent_publishers(self):
+        bus = EventBus()
+        fills = bus.subscribe([OrderFilled], max_pending=10000)
+        sentiment = bus.subscribe([SentimentChanged])
+        def publish(n):
+            for i in range(500):
+                bus.publish(OrderFilled(ExecutedOrder('GME', i, 1, True)))
+                bus.publish(SentimentChanged([f'{n}-{i % 10}']))
+        threads = [threading.Thread(target=publish, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(fills.poll()), 2000)
+        events = sentiment.poll()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(len(events[0].tickers), 40)
+
+
+class EnvironmentEventTests(unittest.TestCase):
+    def test_bots_get_own_fills(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        a, b = env.bots
+        received = {'a': [], 'b': []}
+        a.subscribe([OrderFilled], received['a'].append)
+        b.subscribe([OrderFilled], received['b'].append)
+
+        a.place_order(Order('GME', OrderType.Market, 10, True))
+        env.trade_interface.fill(env, a.open_orders()[0].order_id, 100)
+        env._dispatch_events()
+        self.assertEqual([e.fill.ticker for e in received['a']], ['GME'])
+        self.assertEqual(received['b'], [])
+
+    def test_quotes_and_market_status(self):
+        env = HostedEnvironment()
+        env.initialize(False)
+        subscription = env.subscribe([QuoteUpdated, MarketOpened, MarketClosed])
+        env.get_quote('GME')
+        env.get_quote('GME')
+        env.trade_interface.market_open = lambda: True
+        env._publish_market_status()
+        env.trade_interface.market_open = lambda: False
+        env._publish_market_status()
+        self.assertEqual([type(e) for e in subscription.poll()], [QuoteUpdated, MarketClosed])
@@ -0,0 +1,231 @@
+import datetime
+import unittest
+
+from biggygains.bots.interface import Bot
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.trading.interface import TradeInterface, PricingSource
+from biggygains.trading.stock import Order, OrderType, OrderClass, ExecutedOrder, Quote
+
+
+class FakeTradeInterface(TradeInterface):
+    def __init__(self, cash):
+        self.cash = cash
+        self.pending = {}
+        self.next_id = 0
+
+    def initialize(self, env):
+        env.get_portfolio().cash = self.cash
+        return True
+
+    def place_order(self, order):
+        self.next_id += 1
+        order.order_id = f'o{self.next_id}'
+        self.pending[order.order_id] = order
+        if order.order_class == OrderClass.OTO:
+            order.legs = [Order(order.ticker, OrderType.Limit, order.quantity, order.is_sell, order_id=f'{order.order_id}-tp', limit_price=order.take_profit_price)]
+            self.pending[order.legs[0].order_id] = order.legs[0]
+        return True
+
+    def cancel_order(self, order_id):
+        return self.pending.pop(order_id, None) is not None
+
+    def open_orders(self):
+        return list(self.pending.values())
+
+    def fill(self, env, order_id, price):
+        order = self.pending.pop(order_id)
+        env.notify_order_completed(ExecutedOrder(order.ticker, order.quantity, price, order.is_buy, order_id=order_id))
+
+
+class CountingPricingSource(PricingSource):
+    def __init__(self):
+        self.calls = 0
+
+    def initialize(self, env):
+        return True
+
+    def get_quote(self, ticker):
+        self.calls += 1
+        return Quote(10, 12, 0, datetime.datetime.now())
+
+
+class IdleBot(Bot):
+    def initialize(self, env):
+        return True
+
+    def update(self, env):
+        pass
+
+    def shutdown(self, env):
+        pass
+
+
+class HostedEnvironment(Environment):
+    def __init__(self, cash=10000, datastore=None):
+        super().__init__()
+        self.trade_interface = FakeTradeInterface(cash)
+        self.price_source = CountingPricingSource()
+        self.datastore = datastore or InMemoryDatastore()
+
+    def _initialize(self):
+        return True
+
+
+class HostedBotTests(unittest.TestCase):
+    def test_single_bot_trades_account(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot())
+        self.assertTrue(env.initialize(False))
+        self.assertIs(env.bots[0].get_portfolio(), env.portfolio)
+
+    def test_allocation(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot(), allocation=0.5)
+        env.connect_bot(IdleBot())
+        env.connect_bot(IdleBot())
+        self.assertTrue(env.initialize(False))
+
+        self.assertEqual([b.name for b in env.bots], ['IdleBot', 'IdleBot_2', 'IdleBot_3'])
+        self.assertEqual([b.get_portfolio().cash for b in env.bots], [5000, 2500, 2500])
+
+    def test_over_allocation(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot(), allocation=0.7)
+        env.connect_bot(IdleBot(), allocation=0.7)
+        self.assertFalse(env.initialize(False))
+
+    def test_fill_attribution(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        a, b = env.bots
+
+        self.assertTrue(a.place_order(Order('GME', OrderType.Market, 10, True)))
+        self.assertTrue(b.place_order(Order('AMC', OrderType.Market, 5, True)))
+        self.assertEqual([o.ticker for o in a.open_orders()], ['GME'])
+        self.assertEqual([o.ticker for o in b.open_orders()], ['AMC'])
+        self.assertFalse(a.cancel_order(b.open_orders()[0].order_id))
+
+        env.trade_interface.fill(env, a.open_orders()[0].order_id, 100)
+        self.assertEqual(a.get_portfolio().cash, 4000)
+        self.assertEqual(a.get_portfolio().positions['GME'].qty, 10)
+        self.assertEqual(b.get_portfolio().cash, 5000)
+        self.assertNotIn('GME', b.get_portfolio().positions)
+        self.assertEqual(env.portfolio.cash, 9000)
+
+    def test_basket_attribution(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        a, b = env.bots
+
+        basket = [
+            Order('GME', OrderType.Market, 10, True, order_class=OrderClass.OTO, take_profit_price=120),
+            Order('AMC', OrderType.Market, 5, True)
+        ]
+        self.assertEqual(b.place_orders(basket), [True, True])
+        self.assertEqual([o.order_id for o in b.open_orders()], ['o1', 'o1-tp', 'o2'])
+        self.assertEqual(a.open_orders(), [])
+
+        env.trade_interface.fill(env, 'o1', 100)
+        env.trade_interface.fill(env, 'o1-tp', 120)
+        self.assertEqual(b.get_portfolio().cash, 5200)
+        self.assertEqual(a.get_portfolio().cash, 5000)
+
+    def test_persistence(self):
+        store = InMemoryDatastore()
+        env = HostedEnvironment(datastore=store)
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        a = env.bots[0]
+        a.place_order(Order('GME', OrderType.Market, 10, True))
+        env.trade_interface.fill(env, a.open_orders()[0].order_id, 100)
+        a.place_order(Order('GME', OrderType.Market, 2, False))
+        pending = env.trade_interface.pending
+        env._shutdown()
+
+        restored = HostedEnvironment(datastore=store)
+        restored.trade_interface.pending = pending
+        restored.connect_bot(IdleBot(), 'a')
+        restored.connect_bot(IdleBot(), 'b')
+        restored.initialize(False)
+        a = restored.bots[0]
+        self.assertEqual(a.get_portfolio().cash, 4000)
+        self.assertEqual(a.get_portfolio().positions['GME'].qty, 10)
+        self.assertEqual(len(a.open_orders()), 1)
+
+    def test_persisted_without_shutdown(self):
+        store = InMemoryDatastore()
+        env = HostedEnvironment(datastore=store)
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        a = env.bots[0]
+        a.place_order(Order('GME', OrderType.Market, 10, True))
+        env.trade_interface.fill(env, a.open_orders()[0].order_id, 100)
+        a.place_order(Order('GME', OrderType.Market, 2, False))
+
+        # Killed without _shutdown()
+        restored = HostedEnvironment(datastore=store)
+        restored.trade_interface.pending = env.trade_interface.pending
+        restored.connect_bot(IdleBot(), 'a')
+        restored.connect_bot(IdleBot(), 'b')
+        restored.initialize(False)
+        a = restored.bots[0]
+        self.assertEqual(a.get_portfolio().positions['GME'].qty, 10)
+        self.assertEqual(len(a.open_orders()), 1)
+
+    def test_new_bot_only_gets_unclaimed_cash(self):
+        store = InMemoryDatastore()
+        env = HostedEnvironment(datastore=store)
+        env.connect_bot(IdleBot(), 'a')
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        b = env.bots[1]
+        b.place_order(Order('GME', OrderType.Market, 40, True))
+        env.trade_interface.fill(env, b.open_orders()[0].order_id, 100)
+
+        # Restored bots hold 5000 and 1000 of the account's 6000
+        restored = HostedEnvironment(6000, datastore=store)
+        restored.connect_bot(IdleBot(), 'a')
+        restored.connect_bot(IdleBot(), 'b')
+        restored.connect_bot(IdleBot(), 'c')
+        with self.assertLogs('Environment', 'WARNING'):
+            restored.initialize(False)
+        self.assertEqual([b.get_portfolio().cash for b in restored.bots], [5000, 1000, 0])
+
+    def test_changed_allocation_is_logged(self):
+        store = InMemoryDatastore()
+        env = HostedEnvironment(datastore=store)
+        env.connect_bot(IdleBot(), 'a', allocation=0.5)
+        env.connect_bot(IdleBot(), 'b')
+        env.initialize(False)
+        env._shutdown()
+
+        restored = HostedEnvironment(datastore=store)
+        restored.connect_bot(IdleBot(), 'a', allocation=0.3)
+        restored.connect_bot(IdleBot(), 'b')
+        with self.assertLogs('Environment', 'WARNING') as logs:
+            restored.initialize(False)
+        self.assertTrue(any('allocation 0.3' in line for line in logs.output))
+        self.assertEqual(restored.bots[0].get_portfolio().cash, 5000)
+
+    def test_shared_quote_cache(self):
+        env = HostedEnvironment()
+        env.connect_bot(IdleBot())
+        env.connect_bot(IdleBot())
+        env.initialize(False)
+
+        env.bots[0].get_quote('GME')
+        env.bots[1].get_quote('GME')
+        self.assertEqual(env.price_source.calls, 1)
+
+        env.quote_cache_seconds = 0
+        env.quote_cache.clear()
+        env.bots[0].get_quote('GME')
+        env.bots[1].get_quote('GME')
+        self.assertEqual(env.price_source.calls, 3)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from biggygains.metrics.registry import MetricsRegistry, NullRegistry
+from biggygains.metrics.export import render_prometheus, MetricsServer, MetricsFileWriter
+
+
+class RegistryTests(unittest.TestCase):
+    def test_same_metric_returned(self):
+        registry = MetricsRegistry()
+        a = registry.counter('requests_total', source='a')
+        self.assertIs(a, registry.counter('requests_total', source='a'))
+        self.assertIsNot(a, registry.counter('requests_total', source='b'))
+
+    def test_histogram(self):
+        registry = MetricsRegistry()
+        h = registry.histogram('latency_seconds')
+        h.observe(0.002)
+        h.observe(0.002)
+        h.observe(100)
+        with registry.timer('latency_seconds'):
+            pass
+
+        self.assertEqual(h.count, 4)
+        self.assertEqual(h.counts[-1], 1)
+
+    def test_null_registry(self):
+        registry = NullRegistry()
+        registry.counter('x').inc()
+        registry.gauge('y').set(5)
+        with registry.timer('z'):
+            pass
+        self.assertEqual(registry.collect(), [])
+
+
+class ExportTests(unittest.TestCase):
+    def _registry(self):
+        registry = MetricsRegistry()
+        registry.counter('comments_total', 'Comments seen', source='reddit').inc(3)
+        registry.gauge('queue_depth').set(7)
+        registry.histogram('tick_seconds').observe(0.02)
+        return registry
+
+    def test_render(self):
+        text = render_prometheus(self._registry())
+        self.assertIn('# HELP comments_total Comments seen', text)
+        self.assertIn('comments_total{source="reddit"} 3', text)
+        self.assertIn('queue_depth 7', text)
+        self.assertIn('tick_seconds_bucket{le="0.05"} 1', text)
+        self.assertIn('tick_seconds_bucket{le="0.01"} 0', text)
+        self.assertIn('tick_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('tick_seconds_count 1', text)
+
+    def test_server(self):
+        server = MetricsServer(self._registry(), 0)
+        server.start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics') as resp:
+                self.assertIn('queue_depth 7', resp.read().decode())
+        finally:
+            server.stop()
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.prom')
+            MetricsFileWriter(self._registry(), path).write()
+            with open(path) as f:
+                self.assertIn('comments_total{source="reddit"} 3', f.read())
@@ -0,0 +1,46 @@
+import unittest
+
+from biggygains.components.sentiment.linear import LinearSentimentAnalyzer
+from tools.reddit.active import ActiveQueue
+
+
+class ActiveQueueTests(unittest.TestCase):
+    def test_uncertain_first(self):
+        model = LinearSentimentAnalyzer(bits=12)
+        model.fit(['moon rocket', 'dump puts'] * 20, [2, -2] * 20)
+        comments = {
+            'known': {'body': 'moon rocket'},
+            'unknown': {'body': 'completely different words'}
+        }
+
+        queue = ActiveQueue(comments, model, ActiveQueue.Uncertainty)
+        self.assertEqual(queue.next(), 'unknown')
+        self.assertEqual(queue.next(), 'known')
+        self.assertIsNone(queue.next())
+
+    def test_diversity_and_record(self):
+        comments = {
+            'a': {'body': 'GME to the moon'},
+            'b': {'body': 'GME to the moon'},
+            'c': {'body': 'something else entirely'}
+        }
+        queue = ActiveQueue(comments, LinearSentimentAnalyzer(bits=12), ActiveQueue.Diversity, rescore_every=1)
+        self.assertEqual(queue.next(), 'a')
+        queue.record('a', 2)
+        self.assertEqual(queue.next(), 'c') # Duplicate of a is no longer novel
+
+    def test_warm_start_scores_once(self):
+        class CountingModel(LinearSentimentAnalyzer):
+            scored = 0
+
+            def uncertainty(self, messages):
+                CountingModel.scored += 1
+                return super().uncertainty(messages)
+
+        comments = {str(i): {'body': f'comment {i}'} for i in range(5)}
+        queue = ActiveQueue(comments, CountingModel(bits=12), ActiveQueue.Uncertainty)
+        queue.warm_start({'x': {'body': 'moon rocket', 'sentiment': 2}})
+        self.assertEqual(CountingModel.scored, 0)
+        self.assertIsNotNone(queue.next())
+        self.assertEqual(CountingModel.scored, 1)
+        self.assertEqual(len(queue), 4)
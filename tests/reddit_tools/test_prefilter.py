@@ -0,0 +1,22 @@
+import unittest
+
+from tools.reddit.prefilter import candidate_tickers, prefilter
+
+
+class PrefilterTests(unittest.TestCase):
+    def test_candidates(self):
+        symbols = {'GME', 'AMC', 'TSLA'}
+        self.assertEqual(candidate_tickers('GME and amc to the moon, GME!', symbols), ['GME', 'AMC'])
+        self.assertEqual(candidate_tickers('nothing to see', symbols), [])
+
+    def test_prefilter(self):
+        comments = {
+            str(i): {'body': body}
+            for i, body in enumerate(['GME calls', 'no ticker here', 'tsla puts', 'buy AMC'] * 25)
+        }
+        filtered = prefilter(comments, {'GME', 'AMC', 'TSLA'}, processes=2)
+
+        self.assertEqual(len(filtered), 75)
+        self.assertEqual(filtered['0']['candidates'], ['GME'])
+        self.assertEqual(filtered['2']['candidates'], ['TSLA'])
+        self.assertNotIn('1', filtered)
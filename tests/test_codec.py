@@ -0,0 +1,45 @@
+import json
+import unittest
+from unittest import mock
+
+from biggygains import codec
+
+
+class CodecTests(unittest.TestCase):
+    def setUp(self):
+        codec.register_migration('test_kind', 1, lambda d: {'rows': [d['a'], d['b']]})
+        codec.register_migration('test_kind', 2, lambda d: {'rows': d['rows'] + [None]})
+
+    def test_round_trip(self):
+        payload = {'rows': ['GME', 1.5, None, True]}
+        for binary in (True, False):
+            with mock.patch.object(codec, 'BINARY', binary):
+                data = codec.pack('test_kind', 3, payload)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(data.startswith(b'BG'), binary)
+            # Readable whichever format the reader would write
+            for reader in (True, False):
+                with mock.patch.object(codec, 'BINARY', reader):
+                    self.assertEqual(codec.unpack('test_kind', 3, data), payload)
+
+    def test_binary_values(self):
+        with mock.patch.object(codec, 'BINARY', True):
+            data = codec.pack('test_kind', 3, {'rows': [b'\x00\xff']})
+        self.assertEqual(codec.unpack('test_kind', 3, data), {'rows': [b'\x00\xff']})
+
+    def test_legacy_json(self):
+        legacy = json.dumps({'a': 'GME', 'b': 2})
+        self.assertEqual(codec.unpack('test_kind', 3, legacy), {'rows': ['GME', 2, None]})
+        self.assertEqual(codec.unpack('test_kind', 3, legacy.encode()), {'rows': ['GME', 2, None]})
+
+    def test_migrates_older_version(self):
+        data = codec.pack('test_kind', 2, {'rows': [1]})
+        self.assertEqual(codec.unpack('test_kind', 3, data), {'rows': [1, None]})
+
+    def test_rejects_mismatch(self):
+        with self.assertRaises(codec.CodecError):
+            codec.unpack('other_kind', 3, codec.pack('test_kind', 3, {}))
+        with self.assertRaises(codec.CodecError):
+            codec.unpack('test_kind', 3, codec.pack('test_kind', 4, {}))
+        with self.assertRaises(codec.CodecError):
+            codec.unpack('unknown_kind', 2, '{}')
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['praw', 'alpaca_trade_api', 'pandas', 'biggygains.environment.live']
+
+# Runs main.py with the given arguments and reports its exit code and which heavy
+# modules it imported on the last line of output
+SCRIPT = '''
+import json, runpy, sys
+sys.argv = ['main.py'] + sys.argv[1:]
+code = 0
+try:
+    runpy.run_path('main.py', run_name='__main__')
+except SystemExit as e:
+    code = e.code
+print(json.dumps({'code': code, 'modules': [m for m in %r if m in sys.modules]}))
+''' % (HEAVY,)
+
+
+def run_main(*args):
+    env = {k: v for k, v in os.environ.items() if not k.startswith(('REDDIT_', 'ALPACA_'))}
+    result = subprocess.run([sys.executable, '-c', SCRIPT] + list(args), cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result
+
+
+class MainTests(unittest.TestCase):
+    def test_help_is_lazy(self):
+        report, result = run_main('--help')
+        self.assertEqual(report['code'], 0)
+        self.assertIn('--isolate-sentiment', result.stdout)
+        self.assertEqual(report['modules'], [])
+
+    def test_missing_credentials_fail_fast(self):
+        report, result = run_main('live', 'ben_sentiment_bot', 'memory')
+        self.assertNotEqual(report['code'], 0)
+        self.assertIn('--reddit-key', result.stderr)
+        self.assertEqual(report['modules'], [])
@@ -0,0 +1,244 @@
+import datetime
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.trading.impl import alpaca
+from biggygains.trading.impl.broker import BrokerClient
+from biggygains.trading.stock import Order, OrderType, OrderClass
+
+START = datetime.datetime(2021, 5, 3, 14, tzinfo=datetime.timezone.utc)
+
+
+"""
+In memory stand in for the parts of the Alpaca REST API the interface uses
+"""
+class FakeApi:
+    def __init__(self, cash=100000):
+        self.cash = cash
+        self.orders = {}
+        self.calls = {}
+        self.submitted = []
+        self.latency = 0
+        self.assets = {}
+        self.asset_status = 404
+        self.lock = threading.Lock()
+
+    def _call(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def get_asset(self, symbol):
+        self._call('get_asset')
+        if symbol in self.assets:
+            return types.SimpleNamespace(symbol=symbol, tradable=self.assets[symbol])
+        error = Exception(f'asset not found for {symbol}')
+        error.response = types.SimpleNamespace(status_code=self.asset_status, headers={})
+        raise error
+
+    def add_order(self, order_id, symbol='GME', qty='10', side='buy', seconds=0, order_type='market', limit_price=None, stop_price=None):
+        with self.lock:
+            self.orders[order_id] = types.SimpleNamespace(
+                id=order_id, symbol=symbol, qty=qty, side=side, order_type=order_type, limit_price=limit_price,
+                stop_price=stop_price, status='new', filled_qty='0', filled_avg_price=None,
+                submitted_at=START + datetime.timedelta(seconds=seconds), legs=None
+            )
+            return self.orders[order_id]
+
+    def fill(self, order_id, price):
+        order = self.orders[order_id]
+        order.status = 'filled'
+        order.filled_qty = order.qty
+        order.filled_avg_price = str(price)
+        self.cash -= float(order.qty) * price * (1 if order.side == 'buy' else -1)
+
+    def get_account(self):
+        self._call('get_account')
+        return types.SimpleNamespace(cash=str(self.cash))
+
+    def list_positions(self):
+        self._call('list_positions')
+        return []
+
+    def list_orders(self, status, after=None, limit=50, direction='desc'):
+        self._call('list_orders')
+        closed = {'filled', 'canceled'}
+        orders = [
+            o for o in sorted(self.orders.values(), key=lambda o: o.submitted_at)
+            if (o.status in closed) == (status == 'closed')
+            and (after is None or o.submitted_at > alpaca._timestamp(after))
+        ]
+        return orders[:limit]
+
+    def submit_order(self, symbol, qty, side, type, time_in_force, limit_price=None, stop_price=None, order_class=None, take_profit=None, stop_loss=None):
+        self._call('submit_order')
+        time.sleep(self.latency)
+        with self.lock:
+            order_id = f'new{len(self.submitted)}'
+            self.submitted.append(order_id)
+        order = self.add_order(order_id, symbol, str(qty), side, len(self.submitted))
+        exit_side = 'sell' if side == 'buy' else 'buy'
+        if order_class == 'bracket':
+            order.legs = [
+                self.add_order(f'{order_id}-tp', symbol, str(qty), exit_side, len(self.submitted), order_type='limit', limit_price=str(take_profit['limit_price'])),
+                self.add_order(f'{order_id}-sl', symbol, str(qty), exit_side, len(self.submitted), order_type='stop_limit', stop_price=str(stop_loss['stop_price']), limit_price=str(stop_loss['limit_price']))
+            ]
+        return order
+
+    def cancel_order(self, order_id):
+        self._call('cancel_order')
+        self.orders[order_id].status = 'canceled'
+
+    def get_latest_quote(self, symbol):
+        self._call('get_latest_quote')
+        return types.SimpleNamespace(bp=99.0, ap=101.0, t=START)
+
+    def get_bars(self, symbol, timeframe, start, end):
+        self._call('get_bars')
+        day = alpaca._timestamp(start)
+        bars = []
+        while day <= alpaca._timestamp(end):
+            bars.append(types.SimpleNamespace(t=day, o=1, h=day.day + 0.5, l=day.day - 0.5, c=day.day, v=1000))
+            day += datetime.timedelta(days=1)
+        return bars
+
+
+class AlpacaEnvironment(Environment):
+    def __init__(self, api, datastore):
+        super().__init__()
+        self.datastore = datastore
+        self.trade_interface = alpaca.AlpacaTradeInterface('key', 'secret', 'url')
+        self.patch = mock.patch.object(alpaca, 'alpaca_client', lambda *args: BrokerClient(api, rate=1000))
+
+
+class AlpacaJournalTests(unittest.TestCase):
+    def start(self, api, store):
+        env = AlpacaEnvironment(api, store)
+        with env.patch:
+            self.assertTrue(env.trade_interface.initialize(env))
+        return env
+
+    def test_full_sync_pages_open_orders(self):
+        api = FakeApi()
+        for i in range(1200):
+            api.add_order(f'o{i}', seconds=i // 3)
+        env = self.start(api, InMemoryDatastore())
+
+        self.assertEqual(len(env.trade_interface.open_orders()), 1200)
+        self.assertEqual(env.portfolio.cash, 100000)
+
+    def test_restart_replays_journal(self):
+        api = FakeApi()
+        store = InMemoryDatastore()
+        env = self.start(api, store)
+        env.trade_interface.place_order(Order('GME', OrderType.Market, 10, True))
+        env.trade_interface.place_order(Order('AMC', OrderType.Market, 5, True))
+        gme, amc = [o.order_id for o in env.trade_interface.open_orders()]
+        api.fill(gme, 100)
+        env.trade_interface.update(env)
+        self.assertEqual(env.portfolio.cash, 99000)
+
+        # AMC fills while the bot is down
+        api.fill(amc, 10)
+        api.calls = {}
+        env = self.start(api, store)
+        self.assertEqual(api.calls, {})
+        self.assertEqual(env.portfolio.positions['GME'].qty, 10)
+        self.assertEqual([o.order_id for o in env.trade_interface.open_orders()], [amc])
+
+        env.trade_interface.update(env)
+        env.trade_interface.update(env)
+        self.assertEqual(env.portfolio.positions['AMC'].qty, 5)
+        self.assertEqual(env.portfolio.cash, 98950)
+        self.assertEqual(api.calls, {'list_orders': 1, 'get_account': 1})
+
+    def test_basket_submits_concurrently(self):
+        api = FakeApi()
+        api.latency = 0.2
+        env = self.start(api, InMemoryDatastore())
+        orders = [Order(f'T{i}', OrderType.Market, 1, True) for i in range(8)]
+
+        start = time.monotonic()
+        self.assertEqual(env.trade_interface.place_orders(orders), [True] * 8)
+        self.assertLess(time.monotonic() - start, 0.2 * 4)
+        self.assertEqual(len(env.trade_interface.open_orders()), 8)
+        self.assertEqual(sorted(o.order_id for o in orders), sorted(api.submitted))
+
+    def test_bracket_legs_journaled(self):
+        api = FakeApi()
+        store = InMemoryDatastore()
+        env = self.start(api, store)
+        order = Order('GME', OrderType.Market, 10, True, order_class=OrderClass.Bracket, take_profit_price=120, stop_loss_price=90, stop_loss_limit_price=89)
+        self.assertTrue(env.trade_interface.place_order(order))
+        self.assertEqual([leg.order_type for leg in order.legs], [OrderType.Limit, OrderType.StopLimit])
+        self.assertEqual(len(env.trade_interface.open_orders()), 3)
+
+        api.fill(order.order_id, 100)
+        env.trade_interface.update(env)
+        api.fill(order.legs[0].order_id, 120)
+        api.orders[order.legs[1].order_id].status = 'canceled'
+        env.trade_interface.journal.checkpoint(env.portfolio)
+
+        restored = self.start(api, store)
+        self.assertEqual([o.order_type for o in restored.trade_interface.open_orders()], [OrderType.Limit, OrderType.StopLimit])
+        restored.trade_interface.update(restored)
+        self.assertEqual(restored.portfolio.cash, 100200)
+        self.assertEqual(restored.trade_interface.open_orders(), [])
+
+    def test_cancel_keeps_partial_fill(self):
+        api = FakeApi()
+        env = self.start(api, InMemoryDatastore())
+        env.trade_interface.place_order(Order('GME', OrderType.Market, 10, True))
+        order_id = env.trade_interface.open_orders()[0].order_id
+        self.assertTrue(env.trade_interface.cancel_order(order_id))
+        self.assertEqual(len(env.trade_interface.open_orders()), 1)
+
+        api.orders[order_id].filled_qty = '4'
+        api.orders[order_id].filled_avg_price = '100'
+        env.trade_interface.update(env)
+        self.assertEqual(env.portfolio.positions['GME'].qty, 4)
+        self.assertEqual(env.trade_interface.open_orders(), [])
+
+
+    def test_ticker_lookups(self):
+        api = FakeApi()
+        api.assets = {'GME': True}
+        store = InMemoryDatastore()
+        env = self.start(api, store)
+        interface = env.trade_interface
+        interface.client.retries = 0
+
+        self.assertTrue(interface.ticker_exists('GME'))
+        self.assertFalse(interface.ticker_exists('ZZZZ'))
+        api.asset_status = 503
+        self.assertFalse(interface.ticker_exists('AMC'))
+        self.assertNotIn('AMC', interface.cached_tickers)
+        api.assets['AMC'] = True
+        self.assertTrue(interface.ticker_exists('AMC'))
+
+        api.assets['ZZZZ'] = True
+        self.assertFalse(interface.ticker_exists('ZZZZ'))
+        self.assertEqual(api.calls['get_asset'], 4)
+
+
+class AlpacaPricingTests(unittest.TestCase):
+    def test_get_equity_cached(self):
+        api = FakeApi()
+        env = AlpacaEnvironment(api, InMemoryDatastore())
+        source = alpaca.AlpacaPricingSource('key', 'secret', 'url')
+        with env.patch:
+            self.assertTrue(source.initialize(env))
+
+        stock = source.get_equity('GME', datetime.date(2021, 5, 1), datetime.date(2021, 5, 10))
+        self.assertEqual(stock.quote.mid, 100)
+        self.assertEqual(stock.bars.close.tolist(), list(range(1, 11)))
+        self.assertEqual(stock.high, 10.5)
+        self.assertEqual(stock.low, 0.5)
+        self.assertEqual(stock.avgvol, 1000)
+
+        source.get_equity('GME', datetime.date(2021, 5, 3), datetime.date(2021, 5, 8))
+        self.assertEqual(api.calls['get_bars'], 1)
@@ -0,0 +1,110 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from biggygains.trading.bars import Bars, BarCache, Timeframe, day_start
+
+TODAY = datetime.date(2021, 5, 10)
+
+
+def daily(start, end):
+    days = (end - start).days + 1
+    return Bars.from_rows(
+        (day_start(start + datetime.timedelta(days=i)) + 4 * 3600, i, i + 1, i - 1, i + 0.5, 100 * i)
+        for i in range(days)
+    )
+
+
+"""
+Fetch function that serves daily bars for any range and records what was asked for
+"""
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, ticker, timeframe, start, end):
+        if self.fail:
+            raise ConnectionError('offline')
+        self.calls.append((start, end))
+        return daily(start, end)
+
+
+class BarsTests(unittest.TestCase):
+    def test_between_and_columns(self):
+        bars = daily(datetime.date(2021, 5, 1), datetime.date(2021, 5, 5))
+        view = bars.between(day_start(datetime.date(2021, 5, 2)), day_start(datetime.date(2021, 5, 4)))
+        self.assertEqual(len(view), 2)
+        self.assertIsInstance(view.close, np.ndarray)
+        self.assertEqual(view.open.tolist(), [1, 2])
+
+    def test_merge_prefers_other(self):
+        bars = Bars.from_rows([(1, 1, 1, 1, 1, 1), (2, 2, 2, 2, 2, 2)])
+        merged = bars.merge(Bars.from_rows([(2, 9, 9, 9, 9, 9), (3, 3, 3, 3, 3, 3)]))
+        self.assertEqual(merged.time.tolist(), [1, 2, 3])
+        self.assertEqual(merged.close.tolist(), [1, 9, 3])
+
+    def test_trading_days(self):
+        days = daily(datetime.date(2021, 5, 3), datetime.date(2021, 5, 4)).trading_days()
+        self.assertEqual([d.date for d in days], [datetime.date(2021, 5, 3), datetime.date(2021, 5, 4)])
+        self.assertEqual(days[1].close.mid, 1.5)
+
+
+class BarCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.fetch = FakeFetch()
+
+    def cache(self):
+        return BarCache(self.tmp.name, self.fetch)
+
+    def test_fetches_only_missing(self):
+        cache = self.cache()
+        bars = cache.get('GME', Timeframe.Day, datetime.date(2021, 5, 3), datetime.date(2021, 5, 5), TODAY)
+        self.assertEqual(len(bars), 3)
+        cache.get('GME', Timeframe.Day, datetime.date(2021, 5, 1), datetime.date(2021, 5, 7), TODAY)
+        self.assertEqual(self.fetch.calls, [
+            (datetime.date(2021, 5, 3), datetime.date(2021, 5, 5)),
+            (datetime.date(2021, 5, 1), datetime.date(2021, 5, 2)),
+            (datetime.date(2021, 5, 6), datetime.date(2021, 5, 7))
+        ])
+
+        bars = cache.get('GME', Timeframe.Day, datetime.date(2021, 5, 2), datetime.date(2021, 5, 6), TODAY)
+        self.assertEqual(len(self.fetch.calls), 3)
+        self.assertEqual(len(bars), 5)
+
+    def test_persists_between_instances(self):
+        self.cache().get('GME', Timeframe.Day, datetime.date(2021, 5, 3), datetime.date(2021, 5, 5), TODAY)
+        self.fetch.calls.clear()
+        bars = self.cache().get('GME', Timeframe.Day, datetime.date(2021, 5, 4), datetime.date(2021, 5, 5), TODAY)
+        self.assertEqual(self.fetch.calls, [])
+        self.assertEqual(len(bars), 2)
+
+    def test_today_refetched(self):
+        cache = self.cache()
+        cache.get('GME', Timeframe.Day, datetime.date(2021, 5, 8), TODAY, TODAY)
+        cache.get('GME', Timeframe.Day, datetime.date(2021, 5, 8), TODAY, TODAY)
+        self.assertEqual(self.fetch.calls[1], (TODAY, TODAY))
+
+    def test_offline(self):
+        self.fetch.fail = True
+        bars = self.cache().get('GME', Timeframe.Day, datetime.date(2021, 5, 3), datetime.date(2021, 5, 5), TODAY)
+        self.assertEqual(len(bars), 0)
+
+        # Nothing was recorded as fetched, so it is retried once back online
+        self.fetch.fail = False
+        bars = self.cache().get('GME', Timeframe.Day, datetime.date(2021, 5, 3), datetime.date(2021, 5, 5), TODAY)
+        self.assertEqual(len(bars), 3)
+
+    def test_csv_import(self):
+        os.makedirs(os.path.join(self.tmp.name, 'day'))
+        daily(datetime.date(2021, 5, 3), datetime.date(2021, 5, 7)).to_csv(os.path.join(self.tmp.name, 'day', 'AMC.csv'))
+
+        bars = BarCache(self.tmp.name).get('AMC', Timeframe.Day, datetime.date(2021, 5, 4), datetime.date(2021, 5, 5), TODAY)
+        self.assertEqual(bars.close.tolist(), [1.5, 2.5])
+        self.cache().get('AMC', Timeframe.Day, datetime.date(2021, 5, 4), datetime.date(2021, 5, 8), TODAY)
+        self.assertEqual(self.fetch.calls, [(datetime.date(2021, 5, 8), datetime.date(2021, 5, 8))])
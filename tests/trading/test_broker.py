@@ -0,0 +1,147 @@
+import http.server
+import json
+import threading
+import time
+import unittest
+
+from biggygains.trading.impl.broker import TokenBucket, alpaca_client
+
+
+"""
+Local HTTP server that plays back scripted responses per path. Unscripted requests
+get the path's default response. Every request is recorded
+"""
+class MockBrokerServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.defaults = {}
+        self.scripts = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def respond(self, method, path, body, status=200, headers=None, delay=0, once=False):
+        response = (status, body, headers or {}, delay)
+        if once:
+            self.scripts.setdefault((method, path), []).append(response)
+        else:
+            self.defaults[(method, path)] = response
+
+    def count(self, method, path):
+        with self.lock:
+            return self.requests.count((method, path))
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def _handle(self, method):
+        key = (method, self.path.split('?')[0])
+        with self.server.lock:
+            self.server.requests.append(key)
+            script = self.server.scripts.get(key)
+            status, body, headers, delay = script.pop(0) if script else self.server.defaults[key]
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+CLOCK = {'timestamp': '2021-05-03T10:00:00-04:00', 'is_open': True, 'next_open': '2021-05-04T09:30:00-04:00', 'next_close': '2021-05-03T16:00:00-04:00'}
+ORDER = {'id': 'o1', 'symbol': 'GME', 'qty': '1', 'side': 'buy', 'submitted_at': '2021-05-03T14:00:00Z'}
+ERROR = {'code': 50000, 'message': 'internal error'}
+
+
+class BrokerClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = MockBrokerServer()
+        self.client = alpaca_client('key', 'secret', self.server.url, rate=1000, burst=100, backoff=0.01)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_shared_per_account(self):
+        self.assertIs(alpaca_client('key', 'secret', self.server.url), self.client)
+        self.assertIsNot(alpaca_client('other', 'secret', self.server.url), self.client)
+
+    def test_read_retried_on_server_error(self):
+        self.server.respond('GET', '/v2/clock', CLOCK)
+        self.server.respond('GET', '/v2/clock', ERROR, status=500, once=True)
+        self.server.respond('GET', '/v2/clock', ERROR, status=503, once=True)
+
+        self.assertTrue(self.client.call('get_clock').is_open)
+        self.assertEqual(self.server.count('GET', '/v2/clock'), 3)
+
+    def test_retries_exhausted(self):
+        self.server.respond('GET', '/v2/clock', ERROR, status=500)
+        with self.assertRaises(Exception):
+            self.client.call('get_clock')
+        self.assertEqual(self.server.count('GET', '/v2/clock'), self.client.retries + 1)
+
+    def test_write_retried_only_when_throttled(self):
+        self.server.respond('POST', '/v2/orders', ORDER)
+        self.server.respond('POST', '/v2/orders', {'code': 42910000, 'message': 'rate limit'}, status=429, headers={'Retry-After': '0.05'}, once=True)
+        start = time.monotonic()
+        self.assertEqual(self.client.call('submit_order', 'GME', 1, 'buy', 'market', 'day').id, 'o1')
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(self.server.count('POST', '/v2/orders'), 2)
+
+        self.server.respond('POST', '/v2/orders', ERROR, status=500, once=True)
+        with self.assertRaises(Exception):
+            self.client.call('submit_order', 'GME', 1, 'buy', 'market', 'day')
+        self.assertEqual(self.server.count('POST', '/v2/orders'), 3)
+
+    def test_identical_reads_coalesced(self):
+        self.server.respond('GET', '/v2/assets/GME', {'symbol': 'GME', 'tradable': True}, delay=0.3)
+        results = []
+        def lookup():
+            results.append(self.client.call('get_asset', 'GME').tradable)
+        threads = [threading.Thread(target=lookup) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(self.server.count('GET', '/v2/assets/GME'), 1)
+
+        self.client.call('get_asset', 'GME')
+        self.assertEqual(self.server.count('GET', '/v2/assets/GME'), 2)
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
@@ -0,0 +1,131 @@
+import datetime
+import unittest
+from zoneinfo import ZoneInfo
+
+from biggygains.environment.interface import Environment
+from biggygains.trading.calendar import Session, SessionCalendar
+from biggygains.trading.interface import TradeInterface
+
+ET = ZoneInfo('America/New_York')
+
+
+def weekday_sessions(start, end):
+    sessions = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            close = datetime.time(13) if day == datetime.date(2021, 11, 26) else datetime.time(16)
+            sessions.append(Session(day, datetime.datetime.combine(day, datetime.time(9, 30), ET), datetime.datetime.combine(day, close, ET)))
+        day += datetime.timedelta(days=1)
+    return sessions
+
+
+def at(day, hour, minute=0):
+    return datetime.datetime(2021, 11, day, hour, minute, tzinfo=ET)
+
+
+class CountingFetch:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def __call__(self, start, end):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('offline')
+        return weekday_sessions(start, end)
+
+
+class SessionCalendarTests(unittest.TestCase):
+    def test_market_status(self):
+        fetch = CountingFetch()
+        calendar = SessionCalendar(fetch)
+        self.assertTrue(calendar.load(at(22, 8)))
+
+        self.assertFalse(calendar.market_open(at(22, 9, 29)))
+        self.assertTrue(calendar.market_open(at(22, 9, 30)))
+        self.assertEqual(calendar.time_to_close(at(22, 15)), datetime.timedelta(hours=1))
+        self.assertIsNone(calendar.time_to_close(at(22, 16)))
+
+        # Early close the day after Thanksgiving, then the weekend
+        self.assertFalse(calendar.market_open(at(26, 13, 30)))
+        self.assertEqual(calendar.next_open(at(26, 13, 30)), at(29, 9, 30))
+        self.assertEqual(fetch.calls, 1)
+
+    def test_naive_times_are_local(self):
+        calendar = SessionCalendar(CountingFetch())
+        calendar.load(at(22, 8))
+        local = at(22, 10).astimezone().replace(tzinfo=None)
+        self.assertTrue(calendar.market_open(local))
+
+    def test_refresh_near_end_of_window(self):
+        fetch = CountingFetch()
+        calendar = SessionCalendar(fetch, days=10, refresh_margin=3)
+        calendar.load(at(1, 8))
+        calendar.market_open(at(8, 10))
+        self.assertEqual(fetch.calls, 1)
+        self.assertTrue(calendar.market_open(at(9, 10)))
+        self.assertEqual(fetch.calls, 2)
+
+    def test_failed_fetch_retries_later(self):
+        fetch = CountingFetch(fail=True)
+        calendar = SessionCalendar(fetch, retry_seconds=60)
+        self.assertFalse(calendar.load(at(22, 8)))
+        self.assertFalse(calendar.available())
+        calendar.market_open(at(22, 8, 0))
+        self.assertEqual(fetch.calls, 1)
+        calendar.market_open(at(22, 8, 2))
+        self.assertEqual(fetch.calls, 2)
+
+
+class CalendarTradeInterface(TradeInterface):
+    def __init__(self):
+        self.clock_calls = 0
+
+    def market_open(self):
+        self.clock_calls += 1
+        return True
+
+    def get_calendar(self, start, end):
+        return weekday_sessions(start, end)
+
+
+class ClockedEnvironment(Environment):
+    def __init__(self, now):
+        super().__init__()
+        self.trade_interface = CalendarTradeInterface()
+        self.current = now
+
+    def now(self):
+        return self.current
+
+
+class EnvironmentCalendarTests(unittest.TestCase):
+    def test_market_open_is_local(self):
+        env = ClockedEnvironment(at(22, 10))
+        env.calendar.load(env.now())
+        self.assertTrue(env.market_open())
+        env.current = at(22, 17)
+        self.assertFalse(env.market_open())
+        self.assertEqual(env.trade_interface.clock_calls, 0)
+
+    def test_falls_back_without_calendar(self):
+        env = ClockedEnvironment(at(22, 17))
+        env.trade_interface.get_calendar = lambda start, end: []
+        env.calendar.load(env.now())
+        self.assertTrue(env.market_open())
+        self.assertEqual(env.trade_interface.clock_calls, 1)
+
+    def test_tick_slows_while_closed(self):
+        env = ClockedEnvironment(at(22, 10))
+        env.calendar.load(env.now())
+        self.assertEqual(env._tick_period(), 60)
+
+        env.current = at(22, 20)
+        self.assertEqual(env._tick_period(), 900)
+
+        env.current = at(23, 9, 20)
+        self.assertEqual(env._tick_period(), 600)
+
+        env.current = at(23, 9, 29)
+        self.assertEqual(env._tick_period(), 60)
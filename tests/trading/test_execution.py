@@ -0,0 +1,160 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.trading.bars import Bars, day_start
+from biggygains.trading.execution import ExecutionEngine, TWAP, VWAP
+from biggygains.trading.impl.simulated import SimulatedTradeInterface
+from biggygains.trading.interface import PricingSource
+from biggygains.trading.stock import Order, OrderType, Quote
+from biggygains.trading.calendar import MARKET_TIMEZONE
+
+START = datetime.datetime(2021, 5, 10, 10, tzinfo=MARKET_TIMEZONE)
+
+
+class ScriptedPricingSource(PricingSource):
+    def __init__(self):
+        self.quotes = {}
+        self.bars = None
+
+    def initialize(self, env):
+        return True
+
+    def get_quote(self, ticker):
+        return self.quotes.get(ticker)
+
+    def get_bars(self, ticker, timeframe, start, end):
+        return self.bars
+
+
+class SimulatedEnvironment(Environment):
+    def __init__(self):
+        super().__init__()
+        self.clock = START
+        self.quote_cache_seconds = 0
+        self.datastore = InMemoryDatastore()
+        self.price_source = ScriptedPricingSource()
+        self.trade_interface = ExecutionEngine(SimulatedTradeInterface(100000))
+
+    def _initialize(self):
+        return True
+
+    def now(self):
+        return self.clock
+
+    def quote(self, bid, ask):
+        self.price_source.quotes['GME'] = Quote(bid, ask, 0, self.clock)
+
+    def tick(self, minutes=1):
+        self.trade_interface.update(self)
+        self.clock += datetime.timedelta(minutes=minutes)
+
+
+class ExecutionEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.env = SimulatedEnvironment()
+        self.assertTrue(self.env.initialize(False))
+        self.engine = self.env.trade_interface
+
+    def test_twap_rests_on_bid(self):
+        order = Order('GME', OrderType.Market, 100, True, execution=TWAP(datetime.timedelta(minutes=10)))
+        self.assertTrue(self.env.place_order(order))
+        parent = self.engine.parent(order.order_id)
+
+        sizes = []
+        for _ in range(10):
+            self.env.quote(10, 10.2)
+            self.env.tick(0)
+            sizes += [child.quantity for child, _ in parent.children.values()]
+            # Someone sells into the bid
+            self.env.quote(9.8, 10)
+            self.env.tick()
+
+        self.assertEqual(sizes, [10] * 10)
+        self.assertEqual(self.env.portfolio.positions['GME'].qty, 100)
+        self.assertEqual(parent.avg_price(), 10)
+        self.assertEqual(self.env.open_orders(), [])
+        self.assertIsNone(self.engine.parent(order.order_id))
+
+    def test_reprices_and_crosses_at_end(self):
+        order = Order('GME', OrderType.Market, 100, True, execution=TWAP(datetime.timedelta(minutes=4), slices=2))
+        self.env.place_order(order)
+        self.env.quote(10, 10.2)
+        parent = self.engine.parent(order.order_id)
+
+        self.env.tick(2)
+        self.assertEqual([c.quantity for c, _ in parent.children.values()], [50])
+        self.env.tick(2)
+        self.env.tick()
+        self.assertEqual([c.quantity for c, _ in parent.children.values()], [100])
+        self.env.tick()
+        self.env.tick()
+        self.assertEqual(self.env.portfolio.positions['GME'].qty, 100)
+        self.assertEqual(self.env.portfolio.positions['GME'].avg_price, 10.2)
+
+    def test_chases_market_after_expiry(self):
+        order = Order('GME', OrderType.Market, 100, True, execution=TWAP(datetime.timedelta(minutes=4), slices=2))
+        self.env.place_order(order)
+        parent = self.engine.parent(order.order_id)
+
+        # The market runs away from every child without ever filling one
+        for minute in range(12):
+            self.env.quote(10 + minute * 0.5, 10.2 + minute * 0.5)
+            self.env.tick()
+        ask = 10.2 + 11 * 0.5
+        prices = [child.limit_price for child, _ in parent.children.values()]
+        self.assertTrue(all(price >= ask - 1 for price in prices), prices)
+
+        self.env.quote(ask - 0.2, ask)
+        self.env.tick()
+        self.env.tick()
+        self.env.tick()
+        self.assertEqual(self.env.portfolio.positions['GME'].qty, 100)
+        self.assertIsNone(self.engine.parent(order.order_id))
+
+    def test_limit_caps_children(self):
+        order = Order('GME', OrderType.Limit, 10, True, limit_price=10.1, execution=TWAP(datetime.timedelta(minutes=1), slices=1))
+        self.env.place_order(order)
+        self.env.quote(10, 10.5)
+        self.env.tick(2)
+        self.env.tick()
+        self.env.tick()
+        children = list(self.engine.parent(order.order_id).children.values())
+        self.assertEqual(children[0][0].limit_price, 10.1)
+
+    def test_cancel_parent(self):
+        order = Order('GME', OrderType.Market, 100, True, execution=TWAP(datetime.timedelta(minutes=10)))
+        self.env.place_order(order)
+        self.env.quote(10, 10.2)
+        self.env.tick()
+        self.assertEqual(len(self.engine.interface.open_orders()), 1)
+        self.assertEqual([o.order_id for o in self.env.open_orders()], [order.order_id])
+
+        self.assertTrue(self.env.cancel_order(order.order_id))
+        self.env.tick()
+        self.assertEqual(self.engine.interface.open_orders(), [])
+        self.assertEqual(self.env.open_orders(), [])
+
+    def test_plain_orders_pass_through(self):
+        self.env.quote(10, 10.2)
+        self.assertEqual(self.env.place_orders([Order('GME', OrderType.Market, 5, True), Order('GME', OrderType.Limit, 5, True, limit_price=9)]), [True, True])
+        self.env.tick()
+        self.assertEqual(self.env.portfolio.positions['GME'].qty, 5)
+        self.assertEqual(len(self.env.open_orders()), 1)
+
+    def test_vwap_plan(self):
+        # Historical volume is three times heavier in the first half hour after 10:00
+        rows = []
+        for day in range(3, 8):
+            opened = day_start(datetime.date(2021, 5, day)) + 10 * 3600
+            rows += [(opened + m * 60, 1, 1, 1, 1, 300 if m < 30 else 100) for m in range(60)]
+        self.env.price_source.bars = Bars.from_rows(rows)
+
+        plan = VWAP(datetime.timedelta(hours=1), slices=2).plan(self.env, 'GME', START)
+        np.testing.assert_allclose(plan, [0.75, 1])
+
+        self.env.price_source.bars = Bars()
+        np.testing.assert_allclose(VWAP(datetime.timedelta(hours=1), slices=4).plan(self.env, 'GME', START), [0.25, 0.5, 0.75, 1])
@@ -0,0 +1,95 @@
+import json
+import unittest
+
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.trading.journal import OrderJournal
+from biggygains.trading.portfolio import Portfolio
+from biggygains.trading.stock import Order, OrderType, ExecutedOrder
+
+
+def order(order_id, ticker='GME', qty=10, is_buy=True):
+    return Order(ticker, OrderType.Limit, qty, is_buy, order_id=order_id, limit_price=100.0)
+
+
+class OrderJournalTests(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryDatastore()
+
+    def journal(self, **kwargs):
+        return OrderJournal(self.store.namespace('journal'), **kwargs)
+
+    def test_no_checkpoint(self):
+        self.assertFalse(self.journal().load())
+
+    def test_replay_after_checkpoint(self):
+        journal = self.journal()
+        journal.checkpoint(Portfolio(10000))
+        journal.record_placed(order('a'), '2021-05-03T14:00:00+00:00')
+        journal.record_placed(order('b', 'AMC', 5), '2021-05-03T14:01:00+00:00')
+        journal.record_fill(ExecutedOrder('GME', 10, 100, True, order_id='a'))
+
+        restored = self.journal()
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.portfolio.cash, 9000)
+        self.assertEqual(restored.portfolio.positions['GME'].qty, 10)
+        self.assertEqual(list(restored.pending), ['b'])
+        self.assertEqual(restored.oldest_pending(), '2021-05-03T14:01:00+00:00')
+
+    def test_duplicate_fill(self):
+        journal = self.journal()
+        journal.checkpoint(Portfolio(10000))
+        journal.record_placed(order('a'), '2021-05-03T14:00:00+00:00')
+        fill = ExecutedOrder('GME', 10, 100, True, order_id='a')
+        self.assertTrue(journal.record_fill(fill))
+        self.assertFalse(journal.record_fill(fill))
+        self.assertFalse(journal.record_fill(ExecutedOrder('GME', 1, 1, True, order_id='unknown')))
+
+        restored = self.journal()
+        restored.load()
+        self.assertEqual(restored.portfolio.positions['GME'].qty, 10)
+
+    def test_checkpoint_trims_entries(self):
+        journal = self.journal(checkpoint_every=3)
+        journal.checkpoint(Portfolio(10000))
+        portfolio = Portfolio(10000)
+        for i in range(3):
+            journal.record_placed(order(str(i)), f'2021-05-03T14:0{i}:00+00:00')
+        journal.record_closed('0')
+        self.assertTrue(journal.checkpoint_due())
+        journal.checkpoint(portfolio)
+
+        self.assertEqual(self.store.scan_prefix('journal/entry/'), {})
+        journal.record_closed('1')
+
+        restored = self.journal()
+        restored.load()
+        self.assertEqual(list(restored.pending), ['2'])
+        self.assertEqual(restored.seq, 5)
+        self.assertIn('1', restored.closed)
+
+    def test_closed_history_bounded(self):
+        journal = self.journal(closed_history=2)
+        for i in range(4):
+            journal.record_placed(order(str(i)), '2021-05-03T14:00:00+00:00')
+            journal.record_closed(str(i))
+        self.assertEqual(list(journal.closed), ['2', '3'])
+
+    def test_load_legacy_json(self):
+        portfolio = Portfolio(9000)
+        portfolio._buy('GME', 10, 100)
+        namespace = self.store.namespace('journal')
+        namespace.store_data(OrderJournal.CHECKPOINT_KEY, json.dumps({
+            'seq': 1,
+            'portfolio': portfolio.to_dict(),
+            'pending': [order('b', 'AMC', 5).to_dict()],
+            'submitted': {'b': '2021-05-03T14:01:00+00:00'},
+            'closed': ['a']
+        }))
+        namespace.store_data('entry/000000000002', json.dumps({'type': 'fill', 'fill': ExecutedOrder('AMC', 5, 10, True, order_id='b').to_dict()}))
+
+        restored = self.journal()
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.portfolio.cash, 7950)
+        self.assertEqual(restored.portfolio.positions['AMC'].qty, 5)
+        self.assertEqual(restored.pending, {})
+        self.assertEqual(restored.seq, 2)
@@ -0,0 +1,121 @@
+import datetime
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from biggygains.trading.performance import PerformanceRecorder
+from biggygains.trading.portfolio import Portfolio
+from biggygains.trading.stock import ExecutedOrder, Order, OrderType
+
+from .test_execution import SimulatedEnvironment
+
+START = datetime.datetime(2021, 5, 10, 10, tzinfo=datetime.timezone.utc)
+
+
+def minute(i):
+    return START + datetime.timedelta(minutes=i)
+
+
+class PerformanceRecorderTests(unittest.TestCase):
+    def record(self, prices, capacity=2):
+        recorder = PerformanceRecorder(capacity)
+        portfolio = Portfolio(1000)
+        recorder.sample(minute(0), portfolio)
+        portfolio._buy('GME', 10, prices[0])
+        recorder.record_fill(minute(1), ExecutedOrder('GME', 10, prices[0], True))
+        for i, price in enumerate(prices):
+            portfolio._update_price('GME', price)
+            recorder.sample(minute(i + 1), portfolio)
+        return recorder
+
+    def test_statistics(self):
+        recorder = self.record([10, 12, 9, 11])
+        np.testing.assert_allclose(recorder.values[:recorder.count], [1000, 1000, 1020, 990, 1010])
+        self.assertAlmostEqual(recorder.max_drawdown(), 30 / 1020)
+        self.assertAlmostEqual(recorder.turnover(), 100 / 1004)
+        self.assertAlmostEqual(recorder.attribution()['GME'], 10)
+        self.assertEqual(recorder.exposure[recorder.count - 1], 110)
+
+        returns = recorder.returns()
+        expected = returns.mean() / returns.std(ddof=1) * np.sqrt(252 * 6.5 * 60)
+        self.assertAlmostEqual(recorder.sharpe(), expected)
+
+    def test_zero_value_returns(self):
+        recorder = PerformanceRecorder(4)
+        for i, cash in enumerate([0, 0, 100, 110]):
+            recorder.sample(minute(i), Portfolio(cash))
+        np.testing.assert_allclose(recorder.returns(), [0, 0, 0.1])
+        self.assertTrue(np.isfinite(recorder.sharpe()))
+
+    def test_shared_timestamps(self):
+        recorder = PerformanceRecorder(4)
+        for cash in [100, 110, 99, 105]:
+            recorder.sample(minute(0), Portfolio(cash))
+        self.assertEqual(recorder.sharpe(), 0.0)
+        self.assertNotEqual(recorder.sharpe(periods_per_year=252), 0.0)
+
+    def test_many_tickers(self):
+        recorder = PerformanceRecorder(1)
+        portfolio = Portfolio(0)
+        for i in range(40):
+            portfolio._buy(f'T{i}', 1, i)
+            recorder.sample(minute(i), portfolio)
+        self.assertEqual(len(recorder.tickers), 40)
+        self.assertEqual(recorder.positions[39, :40].tolist(), list(range(40)))
+
+    def test_export(self):
+        recorder = self.record([10, 12, 9, 11])
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder.save(os.path.join(tmp, 'perf.npz'))
+            loaded = PerformanceRecorder.load(os.path.join(tmp, 'perf.npz'))
+            self.assertEqual(loaded.summary(), recorder.summary())
+            self.assertEqual(loaded.attribution(), recorder.attribution())
+            loaded.sample(minute(10), Portfolio(5))
+            self.assertEqual(loaded.count, 6)
+
+            recorder.to_csv(os.path.join(tmp, 'perf.csv'))
+            with open(os.path.join(tmp, 'perf.csv')) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], 'time,value,cash,exposure,GME')
+            self.assertEqual(len(lines), 6)
+
+    def test_vectorized_speed(self):
+        # Three months of minute samples
+        recorder = PerformanceRecorder()
+        n = 63 * 390
+        recorder.count = n
+        recorder.times = START.timestamp() + np.arange(n) * 60.0
+        recorder.values = 1000 + np.cumsum(np.random.default_rng(0).normal(0, 1, n))
+        start = time.perf_counter()
+        recorder.summary()
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+    def test_environment_records(self):
+        env = SimulatedEnvironment()
+        env.set_performance_recorder(PerformanceRecorder())
+        self.assertTrue(env.initialize(False))
+        env.quote(10, 10.2)
+        env.place_order(Order('GME', OrderType.Market, 10, True))
+        env.trade_interface.update(env)
+        env.quote(11, 11.2)
+        env._record_performance()
+
+        recorder = env.recorder
+        self.assertEqual(recorder.fill_count, 1)
+        self.assertAlmostEqual(recorder.values[0], 100000 - 102 + 111)
+
+    def test_environment_skips_closed_market(self):
+        env = SimulatedEnvironment()
+        env.set_performance_recorder(PerformanceRecorder())
+        self.assertTrue(env.initialize(False))
+        env.quote(10, 10.2)
+        env.trade_interface.interface.market_open = lambda: False
+        env._record_performance()
+        self.assertEqual(env.recorder.count, 0)
+
+        env.trade_interface.interface.market_open = lambda: True
+        env._record_performance()
+        self.assertEqual(env.recorder.count, 1)
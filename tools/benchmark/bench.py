@@ -0,0 +1,260 @@
+import argparse
+import datetime
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+from biggygains.components.sentiment.interface import Sentiment
+from biggygains.components.sentiment.linear import LinearSentimentAnalyzer
+from biggygains.components.sentiment.reddit import RedditSentimentSource
+from biggygains.components.sentiment.stream import Comment, DayComments
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.trading.portfolio import Portfolio, Position
+
+from . import corpus
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. Benchmarks take the shared fixture and return a callable
+    that performs the measured work once. Setup is not timed
+    """
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+"""
+Environment stand in that validates tickers against the synthetic universe
+"""
+class BenchEnvironment(Environment):
+    def __init__(self, tickers):
+        super().__init__()
+        self.tickers = set(tickers)
+        self.datastore = InMemoryDatastore()
+
+    def ticker_exists(self, ticker):
+        return ticker in self.tickers
+
+
+"""
+Shared inputs for a single corpus size
+"""
+class Fixture:
+    def __init__(self, size, tickers, templates, seed, duplicates):
+        self.size = size
+        self.tickers = tickers
+        self.posts = corpus.make_corpus(size, tickers, templates, seed, duplicates)
+        self.env = BenchEnvironment(tickers)
+        self.date = datetime.date.today()
+        self.analyzer = LinearSentimentAnalyzer()
+
+    def source(self, cache_size=0) -> RedditSentimentSource:
+        source = RedditSentimentSource(self.analyzer, None, None, None, cache_size=cache_size)
+        source.env = self.env
+        return source
+
+    def filled_day(self) -> DayComments:
+        day = DayComments(self.date)
+        for i, post in enumerate(self.posts):
+            day.add_comment(self.date, Comment(post.id, post.body, self.tickers[i % len(self.tickers)], i % 3 - 1))
+        return day
+
+    def filled_source(self) -> RedditSentimentSource:
+        source = self.source()
+        source.comments = self.filled_day()
+        day = source.comments.aggregate()
+        source.past_days = [day] * (source._LOOKBACK_DAYS - 1)
+        return source
+
+
+@benchmark('extract_ticker')
+def bench_extract_ticker(fx: Fixture):
+    source = fx.source()
+    def run():
+        for post in fx.posts:
+            source._extract_ticker(post.body)
+    return run
+
+
+@benchmark('analyze_posts')
+def bench_analyze_posts(fx: Fixture):
+    source = fx.source()
+    def run():
+        for post in fx.posts:
+            source._analyze_post(post)
+    return run
+
+
+@benchmark('analyze_posts_cached')
+def bench_analyze_posts_cached(fx: Fixture):
+    def run():
+        source = fx.source(cache_size=10000)
+        for post in fx.posts:
+            source._analyze_post(post)
+    return run
+
+
+@benchmark('day_comments_add')
+def bench_day_comments_add(fx: Fixture):
+    comments = [Comment(post.id, post.body, fx.tickers[i % len(fx.tickers)], 1) for i, post in enumerate(fx.posts)]
+    def run():
+        day = DayComments(fx.date)
+        for comment in comments:
+            day.add_comment(fx.date, comment)
+    return run
+
+
+@benchmark('day_comments_aggregate')
+def bench_day_comments_aggregate(fx: Fixture):
+    day = fx.filled_day()
+    return day.aggregate
+
+
+@benchmark('source_update')
+def bench_source_update(fx: Fixture):
+    source = fx.filled_source()
+    return lambda: source.update(fx.env)
+
+
+@benchmark('persistence_round_trip')
+def bench_persistence_round_trip(fx: Fixture):
+    source = fx.filled_source()
+    restored = fx.source()
+    def run():
+        fx.env.datastore.store_data(source._DATA_PERSIST_KEY, source._serialize())
+        restored._load_from_store(fx.env.datastore.retrieve_data(source._DATA_PERSIST_KEY))
+    return run
+
+
+@benchmark('persistence_round_trip_json')
+def bench_persistence_round_trip_json(fx: Fixture):
+    # Baseline of the dict keyed JSON persistence used before the codec, written and
+    # read the way that code did
+    source = fx.filled_source()
+    def run():
+        fx.env.datastore.store_data(source._DATA_PERSIST_KEY, json.dumps({
+            'past': [{ticker: s.to_dict() for ticker, s in day.items()} for day in source.past_days],
+            'today': source.comments.to_dict()
+        }))
+        data = json.loads(fx.env.datastore.retrieve_data(source._DATA_PERSIST_KEY))
+        past = [{ticker: Sentiment.from_dict(s) for ticker, s in day.items()} for day in data['past']]
+        today = DayComments.from_dict(data['today'])
+        return past, today
+    return run
+
+
+@benchmark('portfolio_value')
+def bench_portfolio_value(fx: Fixture):
+    portfolio = Portfolio(100000)
+    for i, ticker in enumerate(fx.tickers):
+        portfolio._add_position(Position(ticker, i + 1, 10.0, 11.0))
+    return portfolio.value
+
+
+def measure(func, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'best': min(times),
+        'median': statistics.median(times),
+        'repeat': repeat
+    }
+
+
+def run(sizes, ticker_count, names, repeat, seed, corpus_path, duplicates) -> dict:
+    tickers = corpus.make_tickers(ticker_count, seed)
+    templates = corpus.load_templates(corpus_path)
+    results = {}
+    for size in sizes:
+        fx = Fixture(size, tickers, templates, seed, duplicates)
+        for name in names:
+            timing = measure(BENCHMARKS[name](fx), repeat)
+            results.setdefault(name, {})[str(size)] = timing
+            print(f'{name:<24} {size:>10} best {timing["best"] * 1000:10.3f}ms  median {timing["median"] * 1000:10.3f}ms')
+        del fx
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'tickers': ticker_count,
+            'seed': seed,
+            'duplicates': duplicates
+        },
+        'results': results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Returns a list of (name, size, baseline, current, ratio) for every benchmark that
+    is slower than the baseline by more than threshold (0.2 = 20%). Best times are
+    compared since they are the least noisy
+    """
+
+    regressions = []
+    for name, by_size in current['results'].items():
+        for size, timing in by_size.items():
+            base = baseline['results'].get(name, {}).get(size)
+            if not base:
+                continue
+            ratio = timing['best'] / base['best']
+            status = 'SLOWER' if ratio > 1 + threshold else 'ok'
+            print(f'{name:<24} {size:>10} {base["best"] * 1000:10.3f}ms -> {timing["best"] * 1000:10.3f}ms  x{ratio:5.2f}  {status}')
+            if ratio > 1 + threshold:
+                regressions.append((name, size, base['best'], timing['best'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for sentiment ingestion and portfolio paths. Run from the repository root with python -m tools.benchmark.bench')
+    parser.add_argument('--sizes', type=str, default='10000,100000', help='Comma separated corpus sizes. Up to 10000000 is supported given enough memory')
+    parser.add_argument('--tickers', type=int, default=2000, help='Number of tickers in the synthetic universe')
+    parser.add_argument('--only', type=str, default=None, help='Comma separated benchmark names to run. Available: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed repetitions per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthetic corpus generation')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='Fraction of synthetic comments that repeat a recent comment')
+    parser.add_argument('--corpus', type=str, default=corpus.DEFAULT_CORPUS, help='Collected comment file to draw templates from')
+    parser.add_argument('--save', type=str, default=None, help='Write results to this JSON file as a new baseline')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline JSON file to compare results against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown ratio before a benchmark is flagged')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f'Unknown benchmark: {name}')
+
+    results = run(sizes, args.tickers, names, args.repeat, args.seed, args.corpus, args.duplicates)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            f.write(json.dumps(results, indent=2))
+        print(f'Saved baseline to {args.save}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.loads(f.read())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} benchmark(s) regressed by more than {args.threshold * 100:.0f}%')
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
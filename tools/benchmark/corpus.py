@@ -0,0 +1,58 @@
+import json
+import random
+import re
+import string
+import time
+import typing
+
+from biggygains.components.sentiment.stream import Post, VALID_TICKER_LENGTHS
+
+DEFAULT_CORPUS = 'data/comments.json'
+ticker_word = re.compile(r'\b[A-Z]{2,4}\b')
+
+
+def make_tickers(count: int, seed: int = 0) -> typing.List[str]:
+    """
+    Generates a deterministic universe of unique, uppercase ticker symbols
+    """
+
+    rng = random.Random(seed)
+    tickers = set()
+    while len(tickers) < count:
+        length = rng.choice(VALID_TICKER_LENGTHS)
+        tickers.add(''.join(rng.choice(string.ascii_uppercase) for _ in range(length)))
+    return sorted(tickers)
+
+
+def load_templates(path: str = DEFAULT_CORPUS) -> typing.List[str]:
+    """
+    Loads comment bodies from a collected corpus to use as templates for synthetic
+    comments. Upper case words that look like tickers are replaced with a placeholder
+    """
+
+    with open(path, 'r') as f:
+        comments = json.loads(f.read())
+    return [ticker_word.sub('{}', c['body']) for c in comments.values()]
+
+
+def make_corpus(size: int, tickers: typing.List[str], templates: typing.List[str], seed: int = 0, duplicates: float = 0.2) -> typing.List[Post]:
+    """
+    Builds a corpus of size comments by filling templates with tickers drawn from
+    a skewed distribution, so a handful of names dominate like they do on hype days.
+    A duplicates fraction of comments repeat a recent comment, like copy pasta
+    """
+
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(tickers))]
+    drawn = rng.choices(tickers, weights=weights, k=size)
+    now = time.time()
+
+    posts = []
+    for i in range(size):
+        if posts and rng.random() < duplicates:
+            body = posts[rng.randrange(max(0, i - 1000), i)].body
+        else:
+            template = templates[i % len(templates)]
+            body = template.replace('{}', drawn[i]) if '{}' in template else f'{drawn[i]} {template}'
+        posts.append(Post(f'c{i}', body, now))
+    return posts
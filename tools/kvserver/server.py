@@ -0,0 +1,201 @@
+import argparse
+import fnmatch
+import logging
+import socketserver
+import threading
+
+from biggygains.datastore.redis import read_reply
+
+logger = logging.getLogger('KVServer')
+
+
+def _glob(pattern: str) -> str:
+    # Redis escapes glob characters with a backslash while fnmatch uses brackets
+    translated = []
+    escaped = False
+    for c in pattern:
+        if escaped:
+            translated.append(f'[{c}]')
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        else:
+            translated.append(c)
+    return ''.join(translated)
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, Exception):
+        return b'-%s\r\n' % str(value).encode()
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(v) for v in value)
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class CommandError(Exception):
+    pass
+
+
+"""
+Minimal stand in for a Redis server speaking the subset of RESP used by
+RedisDatastore. Data is held in memory only. Useful for tests and for sharing
+state between local bot instances without installing Redis
+"""
+class KVServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, password: str = None):
+        super().__init__((host, port), _Handler)
+        self.password = password
+        self.dbs = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def publish(self, channel: bytes, message: bytes) -> int:
+        with self.lock:
+            handlers = list(self.subscribers.get(channel, ()))
+        for handler in handlers:
+            handler.send([b'message', channel, message])
+        return len(handlers)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.authed = self.server.password is None
+        self.db = 0
+        self.channels = set()
+
+    def send(self, value):
+        with self.write_lock:
+            self.wfile.write(_encode(value))
+            self.wfile.flush()
+
+    def handle(self):
+        try:
+            while True:
+                command = read_reply(self.rfile)
+                if not isinstance(command, list) or not command:
+                    self.send(CommandError('ERR protocol error'))
+                    return
+                name = command[0].decode().upper()
+                if name == 'QUIT':
+                    self.send('OK')
+                    return
+                try:
+                    reply = self.dispatch(name, command[1:])
+                except CommandError as e:
+                    reply = e
+                except (ValueError, IndexError):
+                    reply = CommandError(f'ERR wrong arguments for {name}')
+                self.send(reply)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.server.lock:
+                for channel in self.channels:
+                    self.server.subscribers.get(channel, set()).discard(self)
+
+    def dispatch(self, name, args):
+        if name == 'AUTH':
+            if args[-1].decode() != self.server.password:
+                raise CommandError('WRONGPASS invalid password')
+            self.authed = True
+            return 'OK'
+        if not self.authed:
+            raise CommandError('NOAUTH Authentication required')
+        if name == 'PING':
+            return 'PONG'
+        if name == 'SELECT':
+            self.db = int(args[0])
+            return 'OK'
+        if name == 'SUBSCRIBE':
+            with self.server.lock:
+                for channel in args:
+                    self.server.subscribers.setdefault(channel, set()).add(self)
+                    self.channels.add(channel)
+            return [b'subscribe', args[-1], len(self.channels)]
+        if name == 'PUBLISH':
+            return self.server.publish(args[0], args[1])
+
+        with self.server.lock:
+            data = self.server.dbs.setdefault(self.db, {})
+            if name == 'GET':
+                return data.get(args[0])
+            if name == 'SET':
+                data[args[0]] = args[1]
+                return 'OK'
+            if name == 'MGET':
+                return [data.get(key) for key in args]
+            if name == 'MSET':
+                if not args or len(args) % 2:
+                    raise CommandError('ERR wrong number of arguments for MSET')
+                data.update(zip(args[::2], args[1::2]))
+                return 'OK'
+            if name == 'DEL':
+                return sum(data.pop(key, None) is not None for key in args)
+            if name == 'EXISTS':
+                return sum(key in data for key in args)
+            if name == 'FLUSHDB':
+                data.clear()
+                return 'OK'
+            if name == 'SCAN':
+                return self.scan(data, args)
+        raise CommandError(f'ERR unknown command {name}')
+
+    @staticmethod
+    def scan(data, args):
+        # Cursors are offsets into the sorted key space so keys added during a scan
+        # may be missed or repeated, which Redis also allows
+        cursor = int(args[0])
+        options = {args[i].decode().upper(): args[i + 1] for i in range(1, len(args) - 1, 2)}
+        count = int(options.get('COUNT', 10))
+        pattern = options.get('MATCH')
+        keys = sorted(data)[cursor:cursor + count]
+        following = cursor + count if cursor + count < len(data) else 0
+        if pattern is not None:
+            match = _glob(pattern.decode('latin-1'))
+            keys = [key for key in keys if fnmatch.fnmatchcase(key.decode('latin-1'), match)]
+        return [str(following).encode(), keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs an in memory stand in for a Redis server. Run from the repository root with python -m tools.kvserver.server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=6379, help='Port to listen on')
+    parser.add_argument('--password', type=str, default=None, help='Require clients to AUTH with this password')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s: %(message)s', level=logging.INFO)
+    server = KVServer(args.host, args.port, args.password)
+    logger.info(f'Listening on {args.host}:{server.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
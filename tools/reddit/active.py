@@ -0,0 +1,111 @@
+import collections
+import os
+import sys
+import typing
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../')))
+from biggygains.components.sentiment.interface import SentimentAnalyzer
+
+
+"""
+Orders unlabeled comments so the most informative ones are labeled first. Comments
+are scored in batch with the analyzer, and every labeled comment is fed back to the
+analyzer so the ordering improves as labeling goes on. Remaining comments are
+rescored after every rescore_every labels. Scoring waits until the first next() so
+a warm start doesn't score the pool twice.
+
+Orders:
+    insertion: Corpus order, no scoring
+    uncertainty: Comments the analyzer is least sure about first
+    diversity: Uncertainty weighted by how many of the comment's features have not
+        been seen in a labeled comment yet, so near duplicates sink to the back
+"""
+class ActiveQueue:
+    Insertion = 'insertion'
+    Uncertainty = 'uncertainty'
+    Diversity = 'diversity'
+    ORDERS = [Insertion, Uncertainty, Diversity]
+
+    def __init__(self, comments: typing.Dict[str, dict], analyzer: SentimentAnalyzer, order: str = Uncertainty, rescore_every: int = 10):
+        self.comments = comments
+        self.analyzer = analyzer
+        self.order = order
+        self.rescore_every = rescore_every
+        self.pending = collections.deque(comments)
+        self.seen_features = set()
+        self.since_rescore = 0
+        self.stale = order != ActiveQueue.Insertion
+
+    def warm_start(self, labeled: typing.Dict[str, dict]):
+        """
+        Trains the analyzer on comments that were labeled in a previous session
+        """
+
+        if not labeled:
+            return
+        bodies = [c['body'] for c in labeled.values()]
+        labels = [c['sentiment'] for c in labeled.values()]
+        if hasattr(self.analyzer, 'fit'):
+            self.analyzer.fit(bodies, labels)
+        else:
+            for body, label in zip(bodies, labels):
+                self.analyzer.learn(body, label)
+        self._add_seen(bodies)
+        self.stale = self.order != ActiveQueue.Insertion
+
+    def __len__(self):
+        return len(self.pending)
+
+    def next(self) -> str:
+        """
+        Returns the id of the next comment to label, or None when done
+        """
+
+        if self.stale:
+            self._rescore()
+        if not self.pending:
+            return None
+        return self.pending.popleft()
+
+    def record(self, comment_id: str, label: int):
+        """
+        Updates the analyzer with a newly saved label
+        """
+
+        body = self.comments[comment_id]['body']
+        self.analyzer.learn(body, label)
+        self._add_seen([body])
+        self.since_rescore += 1
+        if self.order != ActiveQueue.Insertion and self.since_rescore >= self.rescore_every:
+            self.stale = True
+
+    def _rescore(self):
+        self.since_rescore = 0
+        self.stale = False
+        if not self.pending:
+            return
+        bodies = [self.comments[cid]['body'] for cid in self.pending]
+        scores = np.array(self.analyzer.uncertainty(bodies), dtype=np.float64)
+        if self.order == ActiveQueue.Diversity:
+            scores *= np.array([self._novelty(body) for body in bodies])
+        ranked = np.argsort(-scores, kind='stable')
+        pending = list(self.pending)
+        self.pending = collections.deque(pending[i] for i in ranked)
+
+    def _features(self, body):
+        if hasattr(self.analyzer, 'features'):
+            return set(self.analyzer.features(body).tolist())
+        return set(body.lower().split())
+
+    def _add_seen(self, bodies):
+        if self.order == ActiveQueue.Diversity:
+            for body in bodies:
+                self.seen_features.update(self._features(body))
+
+    def _novelty(self, body):
+        features = self._features(body)
+        if not features:
+            return 0
+        return len(features - self.seen_features) / len(features)
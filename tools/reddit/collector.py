@@ -1,15 +1,25 @@
 import argparse
-import json
+import logging
 import os
+import sys
+import time
 
 import praw
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from commentlog import CommentLogWriter
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--reddit-key', type=str, default=os.environ.get('REDDIT_KEY'), help='The key id for accessing Reddit data')
     parser.add_argument('--reddit-secret', type=str, default=os.environ.get('REDDIT_SECRET'), help='The key secret for accessing Reddit data')
     parser.add_argument('--reddit-subs', type=str, default='wallstreetbets', help='Subreddits formatted as "sub1+sub2+sub3"')
-    parser.add_argument('output_file', type=str, help='File to read existing comments from and save new comments to')
+    parser.add_argument('--rotate-mb', type=float, default=64, help='Start a new segment file once the current one reaches this size')
+    parser.add_argument('--no-daily-rotation', default=False, action='store_true', help='Do not start a new segment file each day')
+    parser.add_argument('--flush-seconds', type=float, default=5, help='How often to flush comments to disk')
+    parser.add_argument('--status-seconds', type=float, default=30, help='How often to print collection status')
+    parser.add_argument('output_dir', type=str, help='Directory to write comment segments to. Existing segments are appended to and deduplicated against')
     args = parser.parse_args()
 
     if not args.reddit_key:
@@ -26,26 +36,28 @@ def main():
     )
     feed = api.subreddit(args.reddit_subs)
 
-    comments = {}
-
-    try:
-        with open(args.output_file, 'r') as f:
-            comments = json.loads(f.read())
-    except:
-        pass
+    writer = CommentLogWriter(
+        args.output_dir,
+        max_bytes=int(args.rotate_mb * 1024 * 1024),
+        rotate_daily=not args.no_daily_rotation,
+        flush_seconds=args.flush_seconds
+    )
+    writer.open()
 
+    last_status = time.monotonic()
     try:
         for comment in feed.stream.comments():
-            if comment.id not in comments:
-                comments[comment.id] = {
-                    'body': comment.body,
-                    'sentiment': 0
-                }
-            print(f'Captured {len(comments)} unique comments')
+            writer.write({
+                'id': comment.id,
+                'body': comment.body,
+                'created_utc': comment.created_utc
+            })
+            if time.monotonic() - last_status >= args.status_seconds:
+                last_status = time.monotonic()
+                print(f'Captured {writer.written} new comments ({writer.duplicates} duplicates skipped) into {writer.segment}')
     finally:
-        with open(args.output_file, 'w') as f:
-            f.write(json.dumps(comments))
-        print('Wrote file')
+        writer.close()
+        print(f'Closed {writer.segment}. Captured {writer.written} new comments')
 
 
 
@@ -0,0 +1,244 @@
+import collections
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+import typing
+
+logger = logging.getLogger('CommentLog')
+segment_name = re.compile(r'^comments-(\d{8})-(\d{4})\.jsonl$')
+
+
+def read_comments(path: str) -> typing.Iterator[dict]:
+    """
+    Yields comment records from a legacy collector .json file, a single .jsonl file,
+    or a directory of .jsonl segments written by CommentLogWriter. Every record has
+    an id. A torn final line left by a crash is skipped
+    """
+
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.jsonl'):
+                yield from _read_jsonl(os.path.join(path, name))
+    elif path.endswith('.jsonl'):
+        yield from _read_jsonl(path)
+    else:
+        with open(path, 'r') as f:
+            for cid, record in json.loads(f.read()).items():
+                record.setdefault('id', cid)
+                yield record
+
+
+def _read_jsonl(path: str, offset: int = 0) -> typing.Iterator[dict]:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                logger.warning(f'Skipping partially written record at end of {path}')
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+"""
+Bounded set of recently seen comment ids. Reddit ids are base 36 and increase over
+time, so anything at or below the newest id evicted from the window is treated as
+already seen. This keeps dedupe exact for a live stream while using constant memory
+"""
+class RecentIdIndex:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ids = collections.OrderedDict()
+        self.floor = -1
+
+    def seen(self, cid: str) -> bool:
+        if cid in self.ids:
+            return True
+        value = self._value(cid)
+        return value is not None and value <= self.floor
+
+    def add(self, cid: str):
+        self.ids[cid] = None
+        while len(self.ids) > self.capacity:
+            evicted, _ = self.ids.popitem(last=False)
+            value = self._value(evicted)
+            if value is not None:
+                self.floor = max(self.floor, value)
+
+    def to_dict(self):
+        return {'floor': self.floor, 'ids': list(self.ids)}
+
+    def load(self, d):
+        self.floor = d.get('floor', -1)
+        for cid in d.get('ids', []):
+            self.add(cid)
+
+    @staticmethod
+    def _value(cid):
+        try:
+            return int(cid, 36)
+        except ValueError:
+            return None
+
+
+"""
+Append only writer for collected comments. Comments are written as JSON lines to
+segments in a directory, named comments-<YYYYMMDD>-<NNNN>.jsonl. Segments rotate
+when they reach max_bytes or when the date changes. Writes are flushed and synced
+to disk every flush_seconds by a background thread, even while no comments arrive,
+so a crash loses at most that much data. A small index file records recently seen
+ids and the write position so restarts dedupe without reloading previous segments
+"""
+class CommentLogWriter:
+    _INDEX_FILE = 'index.json'
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, rotate_daily: bool = True,
+                 flush_seconds: float = 5, index_size: int = 20000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.flush_seconds = flush_seconds
+        self.index = RecentIdIndex(index_size)
+        self.file = None
+        self.segment = None
+        self.segment_date = None
+        self.last_flush = time.monotonic()
+        self.written = 0
+        self.duplicates = 0
+        self.unflushed = False
+        self.lock = threading.Lock()
+        self.closing = threading.Event()
+        self.flusher = None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, CommentLogWriter._INDEX_FILE)
+        state = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                state = json.loads(f.read())
+            self.index.load(state)
+
+        # Pick up anything written after the index was last saved (ie a crash)
+        segments = self._segments()
+        if segments:
+            latest = segments[-1]
+            offset = state.get('offset', 0) if state.get('segment') == latest else 0
+            path = os.path.join(self.directory, latest)
+            for record in _read_jsonl(path, offset):
+                self.index.add(record['id'])
+            self._truncate_torn_line(path)
+
+        self._open_segment(datetime.date.today())
+        self.closing.clear()
+        self.flusher = threading.Thread(target=self._flush_periodically, name='CommentLogFlusher', daemon=True)
+        self.flusher.start()
+
+    def write(self, record: dict) -> bool:
+        """
+        Appends the record unless its id has already been written. Returns True if
+        the record was written
+        """
+
+        with self.lock:
+            if self.index.seen(record['id']):
+                self.duplicates += 1
+                return False
+
+            today = datetime.date.today()
+            if (self.rotate_daily and today != self.segment_date) or self.file.tell() >= self.max_bytes:
+                self._rotate(today)
+
+            self.file.write(json.dumps(record) + '\n')
+            self.index.add(record['id'])
+            self.written += 1
+            self.unflushed = True
+
+            if time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush()
+            return True
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self.closing.set()
+        if self.flusher:
+            self.flusher.join()
+            self.flusher = None
+        with self.lock:
+            if self.file:
+                self._flush()
+                self.file.close()
+                self.file = None
+
+    def _flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._save_index()
+        self.last_flush = time.monotonic()
+        self.unflushed = False
+
+    def _flush_periodically(self):
+        timeout = self.flush_seconds
+        while not self.closing.wait(timeout):
+            with self.lock:
+                due = self.last_flush + self.flush_seconds - time.monotonic()
+                if self.file and self.unflushed and due <= 0:
+                    self._flush()
+            timeout = due if due > 0 else self.flush_seconds
+
+    def _rotate(self, date: datetime.date):
+        self._flush()
+        self.file.close()
+        self._open_segment(date, force_new=True)
+
+    def _open_segment(self, date: datetime.date, force_new: bool = False):
+        stamp = date.strftime('%Y%m%d')
+        todays = [s for s in self._segments() if segment_name.match(s).group(1) == stamp]
+        number = int(segment_name.match(todays[-1]).group(2)) if todays else 0
+        if todays and (force_new or os.path.getsize(os.path.join(self.directory, todays[-1])) >= self.max_bytes):
+            number += 1
+
+        self.segment = f'comments-{stamp}-{number:04d}.jsonl'
+        self.segment_date = date
+        self.file = open(os.path.join(self.directory, self.segment), 'a', encoding='utf-8')
+        logger.info(f'Writing comments to {self.segment}')
+
+    def _segments(self):
+        return sorted(name for name in os.listdir(self.directory) if segment_name.match(name))
+
+    def _save_index(self):
+        state = self.index.to_dict()
+        state['segment'] = self.segment
+        state['offset'] = self.file.tell()
+        path = os.path.join(self.directory, CommentLogWriter._INDEX_FILE)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(json.dumps(state))
+        os.replace(f'{path}.tmp', path)
+
+    @staticmethod
+    def _truncate_torn_line(path: str):
+        with open(path, 'rb+') as f:
+            data_end = f.seek(0, os.SEEK_END)
+            if data_end == 0:
+                return
+            f.seek(data_end - 1)
+            if f.read(1) == b'\n':
+                return
+            # Walk back to the last complete line
+            pos = data_end - 1
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(pos - step + newline + 1)
+                    return
+                pos -= step
+            f.truncate(0)
@@ -5,10 +5,13 @@ import re
 import sys
 import os
 
-from alpaca_trade_api import REST as Alpaca
-
 sys.path.insert(0, os.path.abspath('../../'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from biggygains.components.sentiment.reddit import RedditSentimentSource
+from biggygains.components.sentiment.linear import LinearSentimentAnalyzer
+from active import ActiveQueue
+from commentlog import read_comments
+from prefilter import prefilter, resolve_symbols
 
 alnum = re.compile('[^a-zA-Z\d\s]+')
 sentiments = [
@@ -59,11 +62,12 @@ class Dialog:
         self.comment_label.config(text=text)
         self.sentiment.set(comment['sentiment'] if 'sentiment' in comment else 0)
 
-        words = alnum.sub('', text).split()
-        tickers = [word for word in words if word.isupper() and len(word) in RedditSentimentSource._VALID_TICKER_LENGTHS]
+        if 'candidates' in comment:
+            tickers = comment['candidates']
+        else:
+            words = alnum.sub('', text).split()
+            tickers = [word for word in words if word.isupper() and len(word) in RedditSentimentSource._VALID_TICKER_LENGTHS]
         self.ticker = tk.StringVar(value=comment['ticker'] if 'ticker' in comment else '_other_')
-        self.other_entry.delete(0, tk.END)
-        self.other_entry.insert(0, self.ticker.get())
 
         for w in self.ticker_frame.winfo_children():
             w.destroy()
@@ -76,6 +80,7 @@ class Dialog:
         radio = tk.Radiobutton(self.ticker_frame, text='Other', variable=self.ticker, value='_other_')
         radio.pack(anchor=tk.W)
         self.other_entry = tk.Entry(self.ticker_frame)
+        self.other_entry.insert(0, self.ticker.get())
         self.other_entry.pack(anchor=tk.W)
         self.ticker_frame.grid(row=1, column=0)
 
@@ -100,76 +105,53 @@ class Dialog:
         self.root.mainloop()
 
 
-class TickerFilter:
-    def __init__(self, key, secret):
-        self.api = Alpaca(key, secret, 'https://paper-api.alpaca.markets')
-        self.cached_tickers = {}
-
-    def ticker_exists(self, ticker):
-        try:
-            if ticker in self.cached_tickers:
-                return self.cached_tickers[ticker]
-            asset = self.api.get_asset(ticker)
-            self.cached_tickers[ticker] = asset.tradable
-            return asset.tradable
-        except:
-            self.cached_tickers[ticker] = False
-            return False
-
-    def filter_pass(self, comment):
-        words = alnum.sub('', comment).split()
-        tickers = [word for word in words if word.isupper() and len(word) in RedditSentimentSource._VALID_TICKER_LENGTHS]
-        for word in words:
-            if self.ticker_exists(word):
-                return True
-        return False
-
-
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('input_file', type=str, help='File to read existing comments from and write labeled comments to')
+    parser.add_argument('input_file', type=str, help='Collected comments to label. May be a .json file, a .jsonl file, or a collector output directory')
+    parser.add_argument('--output', type=str, default=None, help='JSON file to write labeled comments to. Defaults to input_file if it is a .json file')
     parser.add_argument('--alpaca-key', type=str, default=os.environ.get('ALPACA_KEY'), help='The key id for interfacing with Alpaca')
     parser.add_argument('--alpaca-secret', type=str, default=os.environ.get('ALPACA_SECRET'), help='The key secret for interfacing with Alpaca')
     parser.add_argument('--skip-completed', default=False, action='store_true', help='Skips comments already labeled')
     parser.add_argument('--filter-no-ticker', default=False, action='store_true', help='True to filter out comments with no detected tickers')
+    parser.add_argument('--order', type=str, default=ActiveQueue.Uncertainty, choices=ActiveQueue.ORDERS, help='Order to present comments in. Uncertainty and diversity put the most informative comments first')
+    parser.add_argument('--symbols', type=str, default='symbols.json', help='Cached symbol list used by --filter-no-ticker. Fetched from Alpaca if it does not exist')
     args = parser.parse_args()
 
-    ticker_filter = None
+    output = args.output or args.input_file
+    if not output.endswith('.json') or os.path.isdir(output):
+        print('--output is required when input_file is not a .json file')
+        return
+
+    comments = {record['id']: record for record in read_comments(args.input_file)}
+
     if args.filter_no_ticker:
-        if not args.alpaca_key:
-            print('--alpaca-key is required for --filter-no-ticker')
-            return
-        if not args.alpaca_secret:
-            print('--alpaca-secret is required for --filter-no-ticker')
+        symbols = resolve_symbols(args.symbols, args.alpaca_key, args.alpaca_secret)
+        if symbols is None:
+            print('--alpaca-key and --alpaca-secret are required for --filter-no-ticker when the symbol cache does not exist')
             return
-        ticker_filter = TickerFilter(args.alpaca_key, args.alpaca_secret)
+        total = len(comments)
+        comments = prefilter(comments, symbols)
+        print(f'Filtered out {total - len(comments)} comments with no ticker')
 
-    comments = {}
-    with open(args.input_file, 'r') as f:
-        comments = json.loads(f.read())
+    labeled = {cid: c for cid, c in comments.items() if 'ticker' in c}
+    unlabeled = {cid: c for cid, c in comments.items() if cid not in labeled}
+    queue = ActiveQueue(unlabeled if args.skip_completed else comments, LinearSentimentAnalyzer(), args.order)
+    queue.warm_start(labeled)
 
-    remaining = len(comments)
     dialog = Dialog()
-    for comment_id in list(comments.keys()):
-        remaining -= 1
-        
-        if args.skip_completed and 'ticker' in comments[comment_id]:
-            continue
-        if ticker_filter:
-            if not ticker_filter.filter_pass(comments[comment_id]['body']):
-                print(f'Filtering comment with no ticker: {comments[comment_id]["body"]}')
-                comments.pop(comment_id, None)
-                continue
-        
-        dialog.update(comments[comment_id], remaining)
+    while len(queue) > 0:
+        comment_id = queue.next()
+        dialog.update(comments[comment_id], len(queue))
         dialog.prompt()
 
         if dialog.status() == Dialog.Closed:
             break
         if dialog.status() == Dialog.Discarded:
             comments.pop(comment_id, None)
+        if dialog.status() == Dialog.Updated:
+            queue.record(comment_id, comments[comment_id]['sentiment'])
 
-    with open(args.input_file, 'w') as f:
+    with open(output, 'w') as f:
         f.write(json.dumps(comments))
 
 
@@ -0,0 +1,98 @@
+import argparse
+import logging
+import time
+
+from biggygains.components.sentiment.file import read_posts
+from biggygains.components.sentiment.interface import SentimentAnalyzer
+from biggygains.components.sentiment.reddit import RedditSentimentSource
+from biggygains.components.sentiment.replay import ReplayReddit
+from biggygains.datastore.memory import InMemoryDatastore
+from biggygains.environment.interface import Environment
+from biggygains.metrics.registry import MetricsRegistry
+from biggygains.metrics.export import render_prometheus
+from tools.reddit.commentlog import read_comments
+
+
+"""
+Offline environment for load testing. Tickers are validated against the labeled
+tickers in the recorded corpus plus any passed in explicitly
+"""
+class ReplayEnvironment(Environment):
+    def __init__(self, tickers):
+        super().__init__()
+        self.tickers = set(tickers)
+        self.datastore = InMemoryDatastore()
+        self.metrics = MetricsRegistry()
+
+    def ticker_exists(self, ticker):
+        return ticker in self.tickers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays recorded comments through RedditSentimentSource. Run from the repository root with python -m tools.reddit.loadtest')
+    parser.add_argument('input_file', type=str, help='Recorded comments (.json from the collector or .jsonl)')
+    parser.add_argument('--speed', type=float, default=None, help='Replay at recorded timestamps sped up this many times')
+    parser.add_argument('--rate', type=float, default=None, help='Replay at a fixed number of comments per second')
+    parser.add_argument('--workers', type=int, default=2, help='Number of analysis workers in the source')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+    parser.add_argument('--loop', default=False, action='store_true', help='Repeat the recording until the duration elapses')
+    parser.add_argument('--tickers', type=str, default='', help='Extra comma separated tickers to treat as valid')
+    parser.add_argument('--dump-metrics', default=False, action='store_true', help='Print all collected metrics when finished')
+    args = parser.parse_args()
+
+    if args.speed and args.rate:
+        parser.error('Only one of --speed and --rate may be given')
+
+    logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s: %(message)s', level='ERROR')
+
+    posts = list(read_posts(args.input_file))
+    tickers = {t for t in args.tickers.split(',') if t}
+    tickers.update(labeled_tickers(args.input_file))
+
+    env = ReplayEnvironment(tickers)
+    api = ReplayReddit(posts, speed=args.speed, rate=args.rate, loop=args.loop)
+    source = RedditSentimentSource(SentimentAnalyzer(), None, None, 'replay', api=api, workers=args.workers)
+    if not source.initialize(env):
+        print('Failed to initialize source')
+        return
+
+    processed = env.metrics.counter('sentiment_comments_total', source='RedditSentimentSource')
+    lock_wait = env.metrics.histogram('sentiment_lock_wait_seconds', source='RedditSentimentSource')
+    start = time.time()
+    last = (start, 0)
+    peak_depth = 0
+    try:
+        while time.time() - start < args.duration:
+            time.sleep(1)
+            source.update(env)
+            now = time.time()
+            depth = source.queue.qsize()
+            peak_depth = max(peak_depth, depth)
+            print(f'{now - start:6.1f}s  emitted {api.sub.emitted:>9}  processed {processed.value:>9}  '
+                  f'{(processed.value - last[1]) / (now - last[0]):9.0f}/s  queue {depth:>6}')
+            last = (now, processed.value)
+            if not source.listener.is_alive() and depth == 0:
+                break
+    finally:
+        source.running = False
+        elapsed = time.time() - start
+
+    print()
+    print(f'Processed {processed.value} comments in {elapsed:.1f}s ({processed.value / elapsed:.0f}/s)')
+    print(f'Peak queue depth {peak_depth}. A growing queue means the offered rate is not sustainable')
+    if lock_wait.count:
+        print(f'Mean lock wait {lock_wait.sum / lock_wait.count * 1e6:.1f}us over {lock_wait.count} acquisitions')
+    if args.dump_metrics:
+        print(render_prometheus(env.metrics))
+
+
+def labeled_tickers(path):
+    """
+    Returns the set of tickers that comments in a recording were labeled with
+    """
+
+    return {r['ticker'] for r in read_comments(path) if r.get('ticker')}
+
+
+if __name__ == '__main__':
+    main()
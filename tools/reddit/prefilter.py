@@ -0,0 +1,129 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import typing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from biggygains.components.sentiment.stream import VALID_TICKER_LENGTHS
+from commentlog import read_comments
+
+alnum = re.compile(r'[^a-zA-Z\d\s]+')
+_symbols = None
+
+
+def fetch_symbols(key: str, secret: str, endpoint: str = 'https://paper-api.alpaca.markets') -> typing.Set[str]:
+    """
+    Bulk loads every tradable symbol with a single request
+    """
+
+    from biggygains.trading.impl.broker import alpaca_client
+
+    assets = alpaca_client(key, secret, endpoint).call('list_assets', status='active')
+    return {asset.symbol for asset in assets if asset.tradable}
+
+
+def load_symbols(path: str) -> typing.Set[str]:
+    with open(path, 'r') as f:
+        return set(json.loads(f.read()))
+
+
+def save_symbols(path: str, symbols: typing.Set[str]):
+    with open(path, 'w') as f:
+        f.write(json.dumps(sorted(symbols)))
+
+
+def candidate_tickers(body: str, symbols: typing.Set[str]) -> typing.List[str]:
+    """
+    Returns every known symbol mentioned in the comment. Upper case mentions come
+    first, followed by mentions that were not capitalized
+    """
+
+    words = alnum.sub('', body).split()
+    upper = []
+    lower = []
+    for word in words:
+        if len(word) not in VALID_TICKER_LENGTHS:
+            continue
+        ticker = word.upper()
+        if ticker not in symbols or ticker in upper or ticker in lower:
+            continue
+        (upper if word.isupper() else lower).append(ticker)
+    return upper + lower
+
+
+def _init_worker(symbols):
+    global _symbols
+    _symbols = symbols
+
+
+def _worker_candidates(body):
+    return candidate_tickers(body, _symbols)
+
+
+def prefilter(comments: typing.Dict[str, dict], symbols: typing.Set[str], processes: int = None) -> typing.Dict[str, dict]:
+    """
+    Annotates each comment with its candidate tickers and drops comments with none.
+    Work is spread over a process pool since the corpus can be large
+    """
+
+    ids = list(comments.keys())
+    bodies = [comments[cid]['body'] for cid in ids]
+    chunksize = max(1, len(bodies) // ((processes or os.cpu_count() or 1) * 8))
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(symbols,)) as pool:
+        results = pool.map(_worker_candidates, bodies, chunksize=chunksize)
+
+    filtered = {}
+    for cid, candidates in zip(ids, results):
+        if candidates:
+            comment = comments[cid]
+            comment['candidates'] = candidates
+            filtered[cid] = comment
+    return filtered
+
+
+def resolve_symbols(symbols_file: str, key: str, secret: str) -> typing.Set[str]:
+    """
+    Loads symbols from symbols_file if it exists, otherwise fetches them from Alpaca
+    and caches them to symbols_file. Returns None if neither is possible
+    """
+
+    if symbols_file and os.path.exists(symbols_file):
+        return load_symbols(symbols_file)
+    if not key or not secret:
+        return None
+    symbols = fetch_symbols(key, secret)
+    if symbols_file:
+        save_symbols(symbols_file, symbols)
+    return symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Filters a comment corpus down to comments that mention a tradable ticker')
+    parser.add_argument('input_file', type=str, help='Collected comments. May be a .json file, a .jsonl file, or a collector output directory')
+    parser.add_argument('output_file', type=str, help='JSON file to write the filtered comments to')
+    parser.add_argument('--symbols', type=str, default='symbols.json', help='Cached symbol list. Fetched from Alpaca if it does not exist')
+    parser.add_argument('--alpaca-key', type=str, default=os.environ.get('ALPACA_KEY'), help='The key id for interfacing with Alpaca')
+    parser.add_argument('--alpaca-secret', type=str, default=os.environ.get('ALPACA_SECRET'), help='The key secret for interfacing with Alpaca')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes to use. Defaults to the number of cpus')
+    args = parser.parse_args()
+
+    symbols = resolve_symbols(args.symbols, args.alpaca_key, args.alpaca_secret)
+    if symbols is None:
+        print('--alpaca-key and --alpaca-secret are required when the symbol cache does not exist')
+        return
+
+    start = time.time()
+    comments = {record['id']: record for record in read_comments(args.input_file)}
+    filtered = prefilter(comments, symbols, args.processes)
+    with open(args.output_file, 'w') as f:
+        f.write(json.dumps(filtered))
+    print(f'Kept {len(filtered)} of {len(comments)} comments in {time.time() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import json
+import random
+import time
+import typing
+
+from biggygains.components.sentiment.linear import LinearSentimentAnalyzer
+from biggygains.components.sentiment.stream import extract_ticker
+from tools.reddit.commentlog import read_comments
+
+
+def load_labeled(path: str) -> typing.List[dict]:
+    """
+    Returns comments that have been through the labeler. Unlabeled comments carry
+    no ticker key and are skipped
+    """
+
+    return [c for c in read_comments(path) if 'ticker' in c]
+
+
+def split(comments: typing.List[dict], test_fraction: float, seed: int):
+    shuffled = list(comments)
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - test_fraction))
+    return shuffled[:cut], shuffled[cut:]
+
+
+def evaluate_sentiment(model: LinearSentimentAnalyzer, comments: typing.List[dict]) -> dict:
+    bodies = [c['body'] for c in comments]
+    truth = [LinearSentimentAnalyzer.CLASSES[LinearSentimentAnalyzer.class_index(c['sentiment'])] for c in comments]
+
+    start = time.perf_counter()
+    predicted = model.analyze_batch(bodies)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for body in bodies:
+        model.analyze(body)
+    single_seconds = time.perf_counter() - start
+
+    classes = LinearSentimentAnalyzer.CLASSES
+    confusion = {t: {p: 0 for p in classes} for t in classes}
+    for t, p in zip(truth, predicted):
+        confusion[t][p] += 1
+    majority = max(classes, key=lambda c: truth.count(c)) if truth else 0
+
+    return {
+        'count': len(comments),
+        'accuracy': _ratio(sum(t == p for t, p in zip(truth, predicted)), len(truth)),
+        'majority_baseline': _ratio(truth.count(majority), len(truth)),
+        'confusion': confusion,
+        'batch_per_second': _ratio(len(bodies), batch_seconds),
+        'single_per_second': _ratio(len(bodies), single_seconds)
+    }
+
+
+def evaluate_tickers(comments: typing.List[dict], symbols: typing.Set[str]) -> dict:
+    """
+    Precision and recall of ticker extraction against labeled tickers. A prediction
+    is a comment where a ticker was extracted, and it is correct if it matches
+    """
+
+    exists = symbols.__contains__
+    start = time.perf_counter()
+    extracted = [extract_ticker(c['body'], exists) for c in comments]
+    seconds = time.perf_counter() - start
+
+    labeled = [c['ticker'].upper() if c['ticker'] else None for c in comments]
+    correct = sum(1 for e, l in zip(extracted, labeled) if e and e == l)
+    return {
+        'precision': _ratio(correct, sum(1 for e in extracted if e)),
+        'recall': _ratio(correct, sum(1 for l in labeled if l)),
+        'per_second': _ratio(len(comments), seconds)
+    }
+
+
+def _ratio(a, b):
+    return a / b if b else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trains and evaluates a LinearSentimentAnalyzer on labeled comments. Run from the repository root with python -m tools.sentiment.train')
+    parser.add_argument('input_file', type=str, help='Labeled comments written by the labeler')
+    parser.add_argument('--model', type=str, default=None, help='Where to save the trained model (.npz)')
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='Fraction of labeled comments held out for evaluation')
+    parser.add_argument('--epochs', type=int, default=10, help='Training passes over the data')
+    parser.add_argument('--bits', type=int, default=18, help='Number of hash bits for features')
+    parser.add_argument('--learning-rate', type=float, default=0.1, help='Initial SGD learning rate')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the train/test split and shuffling')
+    parser.add_argument('--symbols', type=str, default=None, help='JSON list of valid tickers for extraction metrics. Defaults to the labeled tickers')
+    parser.add_argument('--full', default=False, action='store_true', help='Retrain on all labeled data after evaluating before saving')
+    args = parser.parse_args()
+
+    comments = load_labeled(args.input_file)
+    if len(comments) < 2:
+        print(f'Need at least 2 labeled comments, found {len(comments)}')
+        return
+    train, test = split(comments, args.test_fraction, args.seed)
+
+    if args.symbols:
+        with open(args.symbols, 'r') as f:
+            symbols = set(json.loads(f.read()))
+    else:
+        symbols = {c['ticker'].upper() for c in comments if c['ticker']}
+
+    model = LinearSentimentAnalyzer(args.bits, args.learning_rate)
+    start = time.perf_counter()
+    model.fit([c['body'] for c in train], [c['sentiment'] for c in train], args.epochs, args.seed)
+    train_seconds = time.perf_counter() - start
+
+    sentiment = evaluate_sentiment(model, test)
+    tickers = evaluate_tickers(test, symbols)
+
+    print(f'Trained on {len(train)} comments in {train_seconds:.2f}s, evaluated on {len(test)}')
+    print(f'Sentiment accuracy      {sentiment["accuracy"]:.3f} (majority class baseline {sentiment["majority_baseline"]:.3f})')
+    print('Confusion (rows truth, columns predicted):')
+    for t, row in sentiment['confusion'].items():
+        print(f'    {t:>2}: ' + ' '.join(f'{row[p]:>5}' for p in LinearSentimentAnalyzer.CLASSES))
+    print(f'Ticker precision        {tickers["precision"]:.3f}')
+    print(f'Ticker recall           {tickers["recall"]:.3f}')
+    print(f'Scoring throughput      {sentiment["batch_per_second"]:.0f}/s batched, {sentiment["single_per_second"]:.0f}/s one at a time')
+    print(f'Extraction throughput   {tickers["per_second"]:.0f}/s')
+
+    if args.model:
+        if args.full:
+            model = LinearSentimentAnalyzer(args.bits, args.learning_rate)
+            model.fit([c['body'] for c in comments], [c['sentiment'] for c in comments], args.epochs, args.seed)
+        model.save(args.model)
+        start = time.perf_counter()
+        LinearSentimentAnalyzer.load(args.model)
+        print(f'Saved model to {args.model} (loads in {(time.perf_counter() - start) * 1000:.1f}ms)')
+
+
+if __name__ == '__main__':
+    main()